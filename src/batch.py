@@ -0,0 +1,245 @@
+# StudyTextLab - Headless Batch Mode
+#
+# 사용 예)
+#   python main.py batch --task summarization,keywords --input data/ --out results.jsonl
+#   python main.py batch --task summarization --out results.jsonl --workers 4 --threads 8
+#
+# input 폴더의 TXT/PDF 파일을 모두 읽어 선택한 Task를 실행하고,
+# 문서 하나당 JSON 한 줄을 out 파일에 추가로 기록함.
+# 다시 실행하면 out 파일에 이미 기록된 문서는 건너뜀 (중단 후 이어서 실행).
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from loaders import DATA_DIR, iter_document_paths, load_document
+from pipelines import PipelineRegistry
+from tasks import qa
+from tasks import summarization
+from tasks import translation
+from tasks import sentiment
+from tasks import topic_classification
+from tasks import keywords
+from tasks import grammar
+from tasks.cache import configure_cache
+from workers import WorkerPool, configure_threads, default_threads
+
+
+def _run_summarization(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return summarization.summarize_many(pipelines["summarizer"], texts, max_len=130, min_len=30)
+
+
+def _run_translation(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return translation.run_translation_many(pipelines["translator"], texts)
+
+
+def _run_sentiment(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return sentiment.run_sentiment_many(pipelines["sentiment"], texts)
+
+
+def _run_topic_classification(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return topic_classification.run_topic_classification_many(pipelines["topic_classifier"], texts)
+
+
+def _run_keywords(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return keywords.extract_keywords(texts, top_k=10, embedder=pipelines["embedder"])
+
+
+def _run_grammar_correction(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return [grammar.run_grammar_correction(pipelines["grammar_model"], t) for t in texts]
+
+
+def _run_qa(pipelines: PipelineRegistry, texts: list[str], args: argparse.Namespace) -> list:
+    return [
+        qa.run_qa(pipelines["qa"], t, args.question, embedder=pipelines["embedder"])
+        for t in texts
+    ]
+
+
+# task 이름 -> (문서 목록을 받아 결과 목록을 돌려주는 함수)
+BATCH_TASKS: dict[str, Callable[[PipelineRegistry, list[str], argparse.Namespace], list]] = {
+    "summarization": _run_summarization,
+    "translation": _run_translation,
+    "sentiment": _run_sentiment,
+    "topic_classification": _run_topic_classification,
+    "keywords": _run_keywords,
+    "grammar_correction": _run_grammar_correction,
+    "qa": _run_qa,
+}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="TXT/PDF 폴더 전체에 NLP Task를 실행하고 결과를 JSONL로 저장합니다.",
+    )
+    parser.add_argument(
+        "--task",
+        required=True,
+        help="쉼표로 구분한 Task 목록: " + ", ".join(BATCH_TASKS),
+    )
+    parser.add_argument("--input", type=Path, default=DATA_DIR, help="TXT/PDF 파일이 있는 폴더 (기본: data/)")
+    parser.add_argument("--out", type=Path, required=True, help="결과를 기록할 JSONL 파일")
+    parser.add_argument("--batch-size", type=int, default=8, help="한 번에 모델에 넣을 문서 수 (기본: 8)")
+    parser.add_argument("--question", default="", help="qa Task에서 모든 문서에 던질 질문")
+    parser.add_argument("--cache-dir", type=Path, default=None, help="결과 캐시를 디스크에도 저장할 폴더")
+    parser.add_argument("--workers", type=int, default=1, help="동시에 실행할 worker 프로세스 수 (기본: 1)")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="worker마다 PyTorch가 쓸 CPU 스레드 수 (기본: CPU 코어 수 / workers)",
+    )
+    args = parser.parse_args(argv)
+
+    args.tasks = [t.strip() for t in args.task.split(",") if t.strip()]
+    unknown = [t for t in args.tasks if t not in BATCH_TASKS]
+    if unknown:
+        parser.error(f"알 수 없는 Task: {', '.join(unknown)}")
+    if "qa" in args.tasks and not args.question.strip():
+        parser.error("qa Task에는 --question이 필요합니다.")
+    if args.workers < 1:
+        parser.error("--workers는 1 이상이어야 합니다.")
+    if args.threads is None:
+        args.threads = default_threads(args.workers)
+    return args
+
+
+def _completed_paths(out_path: Path) -> set[str]:
+    """이미 out 파일에 기록된 문서 경로 목록. (중단으로 잘린 마지막 줄은 무시)"""
+    done: set[str] = set()
+    if not out_path.exists():
+        return done
+    with out_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["path"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return done
+
+
+def _ends_with_newline(path: Path) -> bool:
+    if not path.exists() or path.stat().st_size == 0:
+        return True
+    with path.open("rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _run_task(
+    name: str,
+    pipelines: PipelineRegistry,
+    texts: list[str],
+    args: argparse.Namespace,
+) -> list[Any]:
+    """배치로 실행하고, 실패하면 문서별로 다시 실행해서 실패한 문서만 error로 남김."""
+    runner = BATCH_TASKS[name]
+    try:
+        return runner(pipelines, texts, args)
+    except Exception:
+        results = []
+        for text in texts:
+            try:
+                results.append(runner(pipelines, [text], args)[0])
+            except Exception as e:
+                results.append({"error": str(e)})
+        return results
+
+
+def process_documents(
+    pipelines: PipelineRegistry,
+    input_dir: Path,
+    paths: list[Path],
+    args: argparse.Namespace,
+) -> list[dict]:
+    """문서 묶음을 읽어 선택한 Task를 모두 실행하고 문서별 기록(dict) 목록을 반환."""
+    records: list[dict] = []
+    texts: list[str] = []
+    for path in paths:
+        record: dict[str, Any] = {"path": path.relative_to(input_dir).as_posix()}
+        try:
+            text = load_document(path)
+        except Exception as e:
+            record["error"] = f"파일을 읽지 못했습니다: {e}"
+            text = ""
+        record["chars"] = len(text)
+        record["tasks"] = {}
+        records.append(record)
+        texts.append(text)
+
+    loaded = [j for j, r in enumerate(records) if "error" not in r]
+    for name in args.tasks:
+        results = _run_task(name, pipelines, [texts[j] for j in loaded], args)
+        for j, result in zip(loaded, results):
+            records[j]["tasks"][name] = result
+    return records
+
+
+def _serial_records(input_dir: Path, todo: list[Path], args: argparse.Namespace) -> Iterator[list[dict]]:
+    configure_threads(args.threads)
+    pipelines = PipelineRegistry()
+    for i in range(0, len(todo), max(1, args.batch_size)):
+        yield process_documents(pipelines, input_dir, todo[i:i + max(1, args.batch_size)], args)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    input_dir: Path = args.input
+    out_path: Path = args.out
+    if not input_dir.is_dir():
+        print(f"[ERROR] 입력 폴더가 없습니다: {input_dir}", file=sys.stderr)
+        return 1
+
+    paths = iter_document_paths(input_dir)
+    done = _completed_paths(out_path)
+    todo = [p for p in paths if p.relative_to(input_dir).as_posix() not in done]
+    print(
+        f"[INFO] 문서 {len(paths)}개 중 {len(paths) - len(todo)}개는 이미 처리됨, {len(todo)}개 처리 시작",
+        file=sys.stderr,
+    )
+
+    if args.cache_dir is not None:
+        configure_cache(disk_dir=args.cache_dir)
+
+    if args.workers > 1:
+        # 문서 묶음을 여러 프로세스가 공유 큐에서 가져가며 처리 (완료 순서대로 기록)
+        pool = WorkerPool(args.workers, args.threads, args)
+        batches = pool.run(input_dir, todo)
+    else:
+        pool = None
+        batches = _serial_records(input_dir, todo, args)
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    needs_newline = not _ends_with_newline(out_path)
+    processed = 0
+    start = time.perf_counter()
+
+    with out_path.open("a", encoding="utf-8") as out:
+        if needs_newline:
+            out.write("\n")
+
+        for records in batches:
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+            processed += len(records)
+            elapsed = time.perf_counter() - start
+            print(f"[INFO] {processed}/{len(todo)} 문서 완료 ({elapsed:.1f}s)", file=sys.stderr)
+
+    if pool is not None:
+        for line in pool.report_lines():
+            print(line, file=sys.stderr)
+        if processed < len(todo):
+            print(f"[WARN] {len(todo) - processed}개 문서가 처리되지 않았습니다. 다시 실행하면 이어서 처리합니다.", file=sys.stderr)
+            return 1
+    return 0
+
+
+def main(argv: list[str]) -> int:
+    return run_batch(parse_args(argv))
@@ -0,0 +1,475 @@
+# StudyTextLab - Benchmark
+#
+# 사용 예)
+#   python main.py benchmark --mode stub --save benchmarks/stub.json
+#   python main.py benchmark --mode stub --compare benchmarks/stub.json --threshold 0.2
+#   python main.py benchmark --mode real --task summarization,qa --size short,page
+#   python main.py benchmark --mode real --task topic_classification_fast --tiers
+#
+# 각 Task 함수를 길이가 다른 합성 입력(short / page / long / pdf)으로 여러 번 실행해
+# p50/p95 지연 시간, 처리량, 최대 RSS, 모델 로드 시간을 측정.
+#   stub : 모델 대신 같은 인터페이스의 가짜 파이프라인을 사용 (다운로드 없음, 수 초 안에 끝남).
+#          모델 밖의 우리 코드(청크 분할, 배치 구성, 결과 정리 등) 오버헤드 회귀를 잡는 용도.
+#   real : 실제 모델로 측정.
+# --save로 결과를 JSON baseline으로 저장하고, --compare로 baseline과 p50을 비교해
+# threshold 이상 느려진 항목이 있으면 종료 코드 1을 반환.
+# --tiers를 주면 크기별로 주제 분류 accurate / fast tier의 문서당 지연 시간과 top label 일치율도 비교.
+
+import argparse
+import functools
+import hashlib
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+from keybert.backend import BaseEmbedder
+
+from pipelines import PipelineRegistry
+from tasks import qa
+from tasks import summarization
+from tasks import translation
+from tasks import sentiment
+from tasks import topic_classification
+from tasks import keywords
+from tasks import similarity
+from tasks import grammar
+from tasks import report_pdf_analysis
+from tasks.cache import configure_cache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SIZES = ("short", "page", "long", "pdf")
+
+# 입력 크기별 단어 수 (pdf는 page 크기 페이지 여러 장)
+_SIZE_WORDS = {"short": 30, "page": 500, "long": 5000}
+_PDF_PAGES = 10
+
+_DEFAULT_REPEATS = {"stub": 5, "real": 3}
+
+_VOCAB = (
+    "the student lecture note study exam science history economy market policy energy climate "
+    "research data model network language learning method result analysis theory experiment "
+    "school university teacher class project report chapter question answer problem solution "
+    "government public health system technology computer software design process change growth "
+    "important different new large small early recent local global social cultural natural "
+    "explain describe compare improve reduce increase develop measure support discuss show"
+).split()
+
+_QUESTION = "What did the report explain?"
+
+
+# ---- 합성 입력 ----
+
+def synthetic_text(n_words: int, seed: int) -> str:
+    """seed마다 다른 (캐시에 걸리지 않는) 영어 문장들. 6~8문장마다 문단을 나눔."""
+    rng = random.Random(seed)
+    sentences: list[str] = []
+    words = 0
+    while words < n_words:
+        n = rng.randint(8, 20)
+        sentence = " ".join(rng.choice(_VOCAB) for _ in range(n))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        words += n
+    paragraphs = [" ".join(sentences[i:i + 7]) for i in range(0, len(sentences), 7)]
+    return "\n\n".join(paragraphs)
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: Path, pages: list[str], line_chars: int = 90) -> None:
+    """페이지마다 텍스트를 줄 단위로 적은 최소한의 PDF를 만듦 (Helvetica, A4)."""
+    objects: list[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    add(b"<< /Type /Catalog /Pages 2 0 R >>")
+    add(b"")  # Pages: 페이지 번호를 알고 나서 채움
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids: list[int] = []
+    for text in pages:
+        lines: list[str] = []
+        for para in text.split("\n"):
+            words, current = para.split(), ""
+            for w in words:
+                if current and len(current) + 1 + len(w) > line_chars:
+                    lines.append(current)
+                    current = w
+                else:
+                    current = f"{current} {w}" if current else w
+            lines.append(current)
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"] + [f"({_pdf_escape(line)}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font, content)
+        ))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+# ---- stub 파이프라인 ----
+
+class _StubTokenizer:
+    """공백 단위 토큰. transformers tokenizer처럼 {"input_ids": ...}를 돌려줌."""
+
+    model_max_length = 512
+
+    def __call__(self, texts: Any, add_special_tokens: bool = True, **kwargs: Any) -> dict:
+        extra = 2 if add_special_tokens else 0
+        if isinstance(texts, str):
+            return {"input_ids": list(range(len(texts.split()) + extra))}
+        return {"input_ids": [list(range(len(t.split()) + extra)) for t in texts]}
+
+
+class _StubModel:
+    def __init__(self, name: str):
+        self.name_or_path = name
+
+
+def _first_words(text: str, n: int) -> str:
+    return " ".join(text.split()[:n])
+
+
+def _stable_score(text: str) -> float:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+class StubPipeline:
+    """transformers pipeline과 같은 호출 형식으로 즉시 결과를 돌려주는 가짜 파이프라인."""
+
+    def __init__(self, task: str):
+        self.task = task
+        self.tokenizer = _StubTokenizer()
+        self.model = _StubModel(f"stub/{task}")
+
+    def _one(self, text: str, **kwargs: Any) -> Any:
+        if self.task == "summarization":
+            return [{"summary_text": _first_words(text, int(kwargs.get("max_length") or 60) // 2)}]
+        if self.task == "translation":
+            return [{"translation_text": text}]
+        if self.task == "sentiment-analysis":
+            score = _stable_score(text)
+            return [{"label": "POSITIVE" if score >= 0.5 else "NEGATIVE", "score": max(score, 1 - score)}]
+        if self.task == "zero-shot-classification":
+            labels = list(kwargs["candidate_labels"])
+            scores = sorted((_stable_score(text + label) for label in labels), reverse=True)
+            total = sum(scores) or 1.0
+            return {"labels": labels, "scores": [s / total for s in scores]}
+        if self.task == "text2text-generation":
+            return [{"generated_text": text[len("gec: "):] if text.startswith("gec: ") else text}]
+        raise ValueError(self.task)
+
+    def __call__(self, inputs: Any = None, **kwargs: Any) -> Any:
+        if self.task == "question-answering":
+            contexts = kwargs["context"]
+            single = isinstance(contexts, str)
+            out = []
+            for c in ([contexts] if single else contexts):
+                answer = _first_words(c, 3)
+                out.append({"answer": answer, "score": _stable_score(c), "start": 0, "end": len(answer)})
+            return out[0] if single else out
+        if isinstance(inputs, str):
+            return self._one(inputs, **kwargs)
+        out = [self._one(t, **kwargs) for t in inputs]
+        # list 입력일 때 pipeline은 입력마다 list[dict] 대신 dict를 주는 Task가 있음
+        if self.task in ("summarization", "translation", "sentiment-analysis"):
+            out = [o[0] for o in out]
+        return out
+
+
+class StubEmbedder(BaseEmbedder):
+    """단어 해시를 더한 384차원 벡터. SentenceTransformer.encode와 같은 형식."""
+
+    dim = 384
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.tokenizer = _StubTokenizer()
+        self.model = _StubModel("stub/embedder")
+
+    def _vector(self, text: str) -> np.ndarray:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in text.lower().split():
+            v[zlib.crc32(w.encode("utf-8")) % self.dim] += 1.0
+        return v
+
+    def encode(self, sentences: Any, normalize_embeddings: bool = False, **kwargs: Any) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        m = np.stack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+        if normalize_embeddings and len(m):
+            m = m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+        return m[0] if single else m
+
+    def embed(self, documents: list[str], verbose: bool = False) -> np.ndarray:
+        # KeyBERT backend 인터페이스
+        return self.encode(documents)
+
+
+def stub_loaders() -> dict[str, Callable[[], Any]]:
+    return {
+        "qa": lambda: StubPipeline("question-answering"),
+        "summarizer": lambda: StubPipeline("summarization"),
+        "translator": lambda: StubPipeline("translation"),
+        "sentiment": lambda: StubPipeline("sentiment-analysis"),
+        "topic_classifier": lambda: StubPipeline("zero-shot-classification"),
+        "embedder": StubEmbedder,
+        "grammar_model": lambda: StubPipeline("text2text-generation"),
+    }
+
+
+# ---- 측정 대상 ----
+
+def _pdf_analysis(p: PipelineRegistry, pdf_path: str) -> Any:
+    return report_pdf_analysis.analyze_pdf(
+        summarizer=p["summarizer"],
+        topic_classifier=p["topic_classifier"],
+        keyword_extractor=functools.partial(keywords.extract_keywords, embedder=p["embedder"]),
+        pdf_path=pdf_path,
+    )
+
+
+# task 이름 -> (사용하는 모델, 입력 1개를 받아 실행하는 함수, 입력 종류 "text" 또는 "pdf")
+BENCH_TASKS: dict[str, tuple[tuple[str, ...], Callable[[PipelineRegistry, str], Any], str]] = {
+    "summarization": (("summarizer",), lambda p, t: summarization.run_summarization(p["summarizer"], t), "text"),
+    "translation": (("translator",), lambda p, t: translation.run_translation(p["translator"], t), "text"),
+    "sentiment": (("sentiment",), lambda p, t: sentiment.run_sentiment(p["sentiment"], t), "text"),
+    "topic_classification": (
+        ("topic_classifier",),
+        lambda p, t: topic_classification.run_topic_classification(p["topic_classifier"], t),
+        "text",
+    ),
+    "topic_classification_fast": (
+        ("embedder",),
+        lambda p, t: topic_classification.run_topic_classification(None, t, tier="fast", embedder=p["embedder"]),
+        "text",
+    ),
+    "keywords": (("embedder",), lambda p, t: keywords.extract_keywords(t, embedder=p["embedder"]), "text"),
+    "qa": (("qa", "embedder"), lambda p, t: qa.run_qa(p["qa"], t, _QUESTION, embedder=p["embedder"]), "text"),
+    "similarity": (
+        ("embedder",),
+        lambda p, t: similarity.compute_similarity(p["embedder"], t, t[: len(t) // 2]),
+        "text",
+    ),
+    "grammar_correction": (
+        ("grammar_model",),
+        lambda p, t: grammar.run_grammar_correction(p["grammar_model"], t),
+        "text",
+    ),
+    "pdf_extract": ((), lambda p, path: report_pdf_analysis.extract_text_from_pdf_path(path), "pdf"),
+    "pdf_analysis": (("summarizer", "topic_classifier", "embedder"), _pdf_analysis, "pdf"),
+}
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 byte 단위
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    # nearest-rank
+    ordered = sorted(values)
+    rank = max(1, int(np.ceil(q / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _make_input(kind: str, size: str, seed: int, workdir: Path) -> str:
+    if kind == "pdf":
+        path = workdir / f"bench_{seed}.pdf"
+        write_text_pdf(path, [synthetic_text(_SIZE_WORDS["page"], seed * 100 + i) for i in range(_PDF_PAGES)])
+        return str(path)
+    if size == "pdf":
+        # 텍스트 Task의 pdf 크기 = PDF 한 권 분량의 텍스트
+        return synthetic_text(_SIZE_WORDS["page"] * _PDF_PAGES, seed)
+    return synthetic_text(_SIZE_WORDS[size], seed)
+
+
+def run_benchmark(
+    mode: str = "stub",
+    tasks: list[str] | None = None,
+    sizes: list[str] | None = None,
+    repeats: int | None = None,
+    tiers: bool = False,
+) -> dict:
+    """선택한 Task x 크기 조합을 repeats번씩 실행한 결과. tiers면 주제 분류 tier 비교(topic_tiers)도 포함."""
+    tasks = tasks or list(BENCH_TASKS)
+    sizes = sizes or list(SIZES)
+    repeats = max(1, repeats or _DEFAULT_REPEATS[mode])
+
+    if mode == "stub":
+        pipelines = PipelineRegistry(loaders=stub_loaders(), unloaders={}, budget_mb=0)
+    else:
+        pipelines = PipelineRegistry()
+
+    results: dict[str, dict] = {}
+    topic_tiers: dict[str, dict] | None = None
+    try:
+        with tempfile.TemporaryDirectory(prefix="studytextlab-bench-") as tmp:
+            workdir = Path(tmp)
+            for task in tasks:
+                models, fn, kind = BENCH_TASKS[task]
+                for name in models:
+                    pipelines[name]  # 로드 시간은 지연 시간에서 빼고 따로 기록
+                task_sizes = ["pdf"] if kind == "pdf" else sizes
+                for size in task_sizes:
+                    if size not in sizes:
+                        continue
+                    # 매번 다른 입력을 써서 결과 캐시/memo에 걸리지 않게 함 (warm-up 1회 포함)
+                    inputs = [_make_input(kind, size, seed, workdir) for seed in range(repeats + 1)]
+                    fn(pipelines, inputs[0])
+                    latencies: list[float] = []
+                    for item in inputs[1:]:
+                        start = time.perf_counter()
+                        fn(pipelines, item)
+                        latencies.append(time.perf_counter() - start)
+                    total = sum(latencies)
+                    chars = sum(len(x) if kind == "text" else Path(x).stat().st_size for x in inputs[1:])
+                    status = pipelines.status()
+                    results[f"{task}/{size}"] = {
+                        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+                        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+                        "mean_ms": round(total / len(latencies) * 1000, 3),
+                        "calls_per_sec": round(len(latencies) / total, 2) if total else None,
+                        "chars_per_sec": round(chars / total, 1) if total else None,
+                        "peak_rss_mb": _peak_rss_mb(),
+                        "model_load_sec": {m: status[m].get("load_time") for m in models},
+                        "repeats": len(latencies),
+                    }
+                    print(f"[INFO] {task}/{size}: p50 {results[f'{task}/{size}']['p50_ms']}ms", file=sys.stderr)
+            if tiers:
+                topic_tiers = _compare_topic_tiers(pipelines, sizes, repeats, workdir)
+    finally:
+        if mode == "stub":
+            # KeyBERT가 stub embedder를 잡고 있으므로 버림
+            keywords.unload_kw_model()
+
+    report = {
+        "mode": mode,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "results": results,
+    }
+    if topic_tiers is not None:
+        report["topic_tiers"] = topic_tiers
+    return report
+
+
+def _compare_topic_tiers(
+    pipelines: PipelineRegistry, sizes: list[str], repeats: int, workdir: Path
+) -> dict[str, dict]:
+    """크기별로 repeats개의 합성 텍스트에 topic_classification.benchmark_tiers를 실행한 결과."""
+    classifier, embedder = pipelines["topic_classifier"], pipelines["embedder"]
+    out: dict[str, dict] = {}
+    for size in sizes:
+        texts = [_make_input("text", size, seed, workdir) for seed in range(repeats)]
+        out[size] = topic_classification.benchmark_tiers(classifier, embedder, texts)
+        print(f"[INFO] topic tiers/{size}: speedup {out[size].get('speedup')}x, "
+              f"top1 agreement {out[size].get('top1_agreement')}", file=sys.stderr)
+    return out
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """baseline보다 p50이 threshold(비율) 이상 느려진 항목 목록."""
+    regressions = []
+    for key, now in current["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if not before or not before.get("p50_ms"):
+            continue
+        ratio = now["p50_ms"] / before["p50_ms"]
+        if ratio > 1 + threshold:
+            regressions.append({
+                "case": key,
+                "baseline_p50_ms": before["p50_ms"],
+                "p50_ms": now["p50_ms"],
+                "slowdown": round(ratio, 2),
+            })
+    return regressions
+
+
+def _split(value: str | None) -> list[str] | None:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py benchmark",
+        description="Task별 지연 시간/처리량/메모리를 측정하고 baseline과 비교합니다.",
+    )
+    parser.add_argument("--mode", choices=("stub", "real"), default="stub", help="stub: 가짜 모델 (기본), real: 실제 모델")
+    parser.add_argument("--task", default=None, help="쉼표로 구분한 Task 목록 (기본: 전체): " + ", ".join(BENCH_TASKS))
+    parser.add_argument("--size", default=None, help="쉼표로 구분한 입력 크기 (기본: 전체): " + ", ".join(SIZES))
+    parser.add_argument("--repeats", type=int, default=None, help="크기별 반복 횟수 (기본: stub 5, real 3)")
+    parser.add_argument("--save", type=Path, default=None, help="결과를 baseline JSON으로 저장")
+    parser.add_argument("--compare", type=Path, default=None, help="비교할 baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="회귀로 볼 p50 증가 비율 (기본: 0.2 = 20%%)")
+    parser.add_argument("--tiers", action="store_true", help="주제 분류 accurate / fast tier 비교(topic_tiers)도 실행")
+    args = parser.parse_args(argv)
+
+    args.tasks = _split(args.task)
+    args.sizes = _split(args.size)
+    unknown = [t for t in args.tasks or [] if t not in BENCH_TASKS] + [s for s in args.sizes or [] if s not in SIZES]
+    if unknown:
+        parser.error(f"알 수 없는 Task/크기: {', '.join(unknown)}")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # 측정 중에는 결과 캐시를 끄고, PDF 페이지 캐시는 임시 폴더에 둠
+    configure_cache(max_entries=0)
+    page_cache = Path(tempfile.mkdtemp(prefix="studytextlab-bench-cache-"))
+    report_pdf_analysis.PAGE_CACHE_PATH = page_cache / "pdf_pages.sqlite3"
+
+    report = run_benchmark(args.mode, args.tasks, args.sizes, args.repeats, tiers=args.tiers)
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if baseline.get("mode") != report["mode"]:
+            print(f"[WARN] baseline 모드({baseline.get('mode')})가 현재 모드({report['mode']})와 다릅니다.", file=sys.stderr)
+        report["regressions"] = compare(report, baseline, args.threshold)
+        report["threshold"] = args.threshold
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.save is not None:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
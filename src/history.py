@@ -1,50 +1,253 @@
 # StudyTextLab - History Manager
+#
+# 실행 기록은 history/history.sqlite3 에 저장.
+# - runs  : 실행 1건당 1행 (task, timestamp 인덱스)
+# - texts : 입력 텍스트 원문. 내용 해시로 저장해서 같은 문서는 한 번만 저장
+# 예전 방식의 history/*.json 파일은 처음 열 때 한 번 가져옴.
 
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
+import hashlib
 import json
-from typing import Any
+import sqlite3
+import threading
+from typing import Any, Callable
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 HISTORY_DIR = ROOT_DIR / "history"
 HISTORY_DIR.mkdir(exist_ok=True)
+HISTORY_DB = HISTORY_DIR / "history.sqlite3"
 
+# 이 길이 이상의 입력 문자열은 texts 테이블에 따로 저장하고 참조만 남김
+_DEDUP_MIN_CHARS = 64
+_TEXT_REF = "$text"
 
-def save_history(task_name: str, input_data: dict, output_data: dict | list | Any) -> None:
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    input TEXT NOT NULL,
+    output TEXT NOT NULL,
+    legacy_name TEXT UNIQUE,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_task_id ON runs (task, id);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp);
+CREATE TABLE IF NOT EXISTS texts (
+    hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    conn = sqlite3.connect(str(HISTORY_DB))
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                conn.executescript(_SCHEMA)
+                _migrate(conn)
+                _initialized = True
+                _import_legacy_once(conn)
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    # 이전 버전 DB에는 metrics 열이 없음
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+    if "metrics" not in columns:
+        conn.execute("ALTER TABLE runs ADD COLUMN metrics TEXT")
+        conn.commit()
+
+
+def _store_texts(conn: sqlite3.Connection, data: Any) -> Any:
+    """긴 문자열을 texts 테이블로 옮기고 {"$text": hash} 참조로 바꿈."""
+    if isinstance(data, str) and len(data) >= _DEDUP_MIN_CHARS:
+        h = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        conn.execute("INSERT OR IGNORE INTO texts (hash, text) VALUES (?, ?)", (h, data))
+        return {_TEXT_REF: h}
+    if isinstance(data, dict):
+        return {k: _store_texts(conn, v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_store_texts(conn, v) for v in data]
+    return data
+
+
+def _resolve_texts(conn: sqlite3.Connection, data: Any) -> Any:
+    if isinstance(data, dict):
+        if set(data) == {_TEXT_REF}:
+            row = conn.execute("SELECT text FROM texts WHERE hash = ?", (data[_TEXT_REF],)).fetchone()
+            return row[0] if row else ""
+        return {k: _resolve_texts(conn, v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_resolve_texts(conn, v) for v in data]
+    return data
+
+
+def _insert_run(
+    conn: sqlite3.Connection,
+    task_name: str,
+    ts: str,
+    input_data: Any,
+    output_data: Any,
+    legacy_name: str | None = None,
+    metrics: dict | Callable[[], dict] | None = None,
+) -> int:
+    stored_input = json.dumps(_store_texts(conn, input_data), ensure_ascii=False)
+    stored_output = json.dumps(output_data, ensure_ascii=False)
+    if callable(metrics):
+        metrics = metrics()
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO runs (task, timestamp, input, output, legacy_name, metrics) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            task_name,
+            ts,
+            stored_input,
+            stored_output,
+            legacy_name,
+            json.dumps(metrics, ensure_ascii=False, default=str) if metrics is not None else None,
+        ),
+    )
+    # legacy_name 중복으로 무시된 경우 0
+    return int(cur.lastrowid) if cur.rowcount else 0
+
+
+def save_history(
+    task_name: str,
+    input_data: dict,
+    output_data: dict | list | Any,
+    metrics: dict | Callable[[], dict] | None = None,
+) -> int:
     """
-    Task 실행 결과를 JSON 파일로 저장.
-    파일 이름: YYYYMMDD_HHMMSS_taskname.json
+    Task 실행 결과를 history DB에 저장하고 기록 ID를 반환.
+    입력 텍스트는 내용 해시로 한 번만 저장됨.
+    metrics: 실행 시간/토큰 수 등 계측 결과 (tasks.instrumentation).
+      함수를 넘기면 입력 텍스트를 저장한 뒤, 기록 행을 넣기 직전에 불러서 그 결과를 같이 넣음
+      (저장에 걸린 시간을 metrics에 넣을 때).
     """
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{ts}_{task_name}.json"
-    path = HISTORY_DIR / filename
+    with _connect() as conn:
+        run_id = _insert_run(conn, task_name, ts, input_data, output_data, metrics=metrics)
+    conn.close()
+    return run_id
+
 
-    payload = {
-        "task": task_name,
-        "timestamp": ts,
-        "input": input_data,
-        "output": output_data,
-    }
+def _ts_bound(value: date | datetime | str, end: bool) -> str:
+    # date/datetime/"YYYYMMDD"/"YYYY-MM-DD" 를 "YYYYMMDD_HHMMSS" 형식 비교 값으로 바꿈
+    if isinstance(value, datetime):
+        return value.strftime("%Y%m%d_%H%M%S")
+    if isinstance(value, date):
+        value = value.strftime("%Y%m%d")
+    value = value.replace("-", "")
+    if len(value) == 8:
+        return value + ("_235959" if end else "_000000")
+    return value
 
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
 
+def list_history(
+    limit: int = 20,
+    before_id: int | None = None,
+    task: str | None = None,
+    date_from: date | datetime | str | None = None,
+    date_to: date | datetime | str | None = None,
+) -> list[dict]:
+    """
+    최신 기록부터 limit개를 반환 (id, task, timestamp).
+    다음 페이지는 마지막 항목의 id를 before_id로 넘겨서 조회.
+    """
+    where = []
+    params: list[Any] = []
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    if task:
+        where.append("task = ?")
+        params.append(task)
+    if date_from is not None:
+        where.append("timestamp >= ?")
+        params.append(_ts_bound(date_from, end=False))
+    if date_to is not None:
+        where.append("timestamp <= ?")
+        params.append(_ts_bound(date_to, end=True))
 
-def list_history_files() -> list[str]:
-    """history/ 폴더에 저장된 JSON 파일 이름 목록을 반환."""
-    files = sorted(HISTORY_DIR.glob("*.json"))
-    return [f.name for f in files]
+    sql = "SELECT id, task, timestamp FROM runs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
 
+    conn = _connect()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [{"id": r[0], "task": r[1], "timestamp": r[2]} for r in rows]
 
-def load_history_file(filename: str) -> dict:
-    """주어진 JSON 히스토리 파일을 읽어서 dict로 반환."""
-    path = HISTORY_DIR / filename
-    if not path.exists():
-        return {"error": "해당 히스토리 파일이 존재하지 않습니다."}
 
-    with path.open("r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            return {"error": "히스토리 파일을 읽는 중 JSON 파싱 에러가 발생했습니다."}
-    return data
+def load_history(run_id: int) -> dict:
+    """주어진 ID의 기록을 dict로 반환."""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            "SELECT id, task, timestamp, input, output, metrics FROM runs WHERE id = ?",
+            (run_id,),
+        ).fetchone()
+        if row is None:
+            return {"error": "해당 히스토리가 존재하지 않습니다."}
+        entry = {
+            "id": row[0],
+            "task": row[1],
+            "timestamp": row[2],
+            "input": _resolve_texts(conn, json.loads(row[3])),
+            "output": json.loads(row[4]),
+        }
+        if row[5]:
+            entry["metrics"] = json.loads(row[5])
+        return entry
+    finally:
+        conn.close()
+
+
+def import_legacy_history(conn: sqlite3.Connection | None = None) -> int:
+    """
+    예전 방식의 history/*.json 파일을 DB로 가져옴. 가져온 파일 수를 반환.
+    같은 파일은 두 번 가져오지 않음 (파일 이름 기준).
+    """
+    own = conn is None
+    if own:
+        conn = _connect()
+    count = 0
+    try:
+        for path in sorted(HISTORY_DIR.glob("*.json")):
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if not isinstance(data, dict):
+                continue
+            task_name = data.get("task") or path.stem.split("_", 2)[-1]
+            ts = data.get("timestamp") or "_".join(path.stem.split("_", 2)[:2])
+            if _insert_run(conn, task_name, ts, data.get("input", {}), data.get("output"), path.name):
+                count += 1
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
+    return count
+
+
+def _import_legacy_once(conn: sqlite3.Connection) -> None:
+    row = conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone()
+    if row is None:
+        import_legacy_history(conn)
@@ -0,0 +1,105 @@
+# StudyTextLab - Import Budget
+#
+# 사용 예)
+#   python main.py import-budget
+#   python main.py import-budget --budget-ms 300 --top 20
+#
+# 새 Python 프로세스에서 `python -X importtime -c "import main"`을 실행해
+# 메뉴가 뜨기 전까지의 import 시간을 재고, 무거운 라이브러리(torch, transformers 등)가
+# import 단계에서 읽히지 않았는지 확인.
+# 예산을 넘거나 무거운 라이브러리가 읽혔으면 종료 코드 1을 반환 (CI 등에서 회귀 검사용).
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# Task를 실제로 실행할 때만 읽어야 하는 라이브러리
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "keybert", "sklearn", "pypdf")
+
+_DEFAULT_BUDGET_MS = 500
+_DEFAULT_RUNS = 3
+
+
+def measure_import(module: str = "main") -> dict:
+    """새 프로세스에서 module을 import하고 -X importtime 결과를 정리."""
+    code = (
+        "import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} 실패:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    total_us = None
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+        if name.strip() == module and not name.startswith("  "):
+            total_us = int(cumulative_us)
+
+    return {
+        "module": module,
+        "total_ms": round((total_us or 0) / 1000, 1),
+        "heavy_loaded": json.loads(proc.stdout.strip().splitlines()[-1]),
+        "entries": entries,
+    }
+
+
+def check_budget(budget_ms: float, runs: int = _DEFAULT_RUNS, top: int = 10) -> dict:
+    """runs번 측정한 것 중 가장 빠른 결과로 예산을 확인 (첫 실행의 .pyc 생성 등 잡음을 뺌)."""
+    results = [measure_import() for _ in range(max(1, runs))]
+    best = min(results, key=lambda r: r["total_ms"])
+    slowest = sorted(best["entries"], key=lambda e: e[1], reverse=True)[:top]
+    return {
+        "import_ms": best["total_ms"],
+        "budget_ms": budget_ms,
+        "runs_ms": [r["total_ms"] for r in results],
+        "heavy_loaded": best["heavy_loaded"],
+        "slowest_self_ms": [{"module": name, "ms": round(self_us / 1000, 1)} for name, self_us, _c in slowest],
+        "ok": best["total_ms"] <= budget_ms and not best["heavy_loaded"],
+    }
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py import-budget",
+        description="메뉴가 뜨기 전 import 시간과 무거운 라이브러리 import 여부를 확인합니다.",
+    )
+    parser.add_argument("--budget-ms", type=float, default=_DEFAULT_BUDGET_MS,
+                        help=f"import main에 허용할 시간 (기본: {_DEFAULT_BUDGET_MS}ms)")
+    parser.add_argument("--runs", type=int, default=_DEFAULT_RUNS, help=f"측정 횟수 (기본: {_DEFAULT_RUNS})")
+    parser.add_argument("--top", type=int, default=10, help="self 시간이 긴 모듈을 몇 개 보여 줄지 (기본: 10)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    report = check_budget(args.budget_ms, args.runs, args.top)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report["heavy_loaded"]:
+        print(f"[ERROR] import 단계에서 무거운 라이브러리를 읽었습니다: {', '.join(report['heavy_loaded'])}",
+              file=sys.stderr)
+    if report["import_ms"] > args.budget_ms:
+        print(f"[ERROR] import 시간 {report['import_ms']}ms가 예산 {args.budget_ms}ms를 넘었습니다.", file=sys.stderr)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,194 @@
 # StudyTextLab - Loaders
 
+import codecs
+import mmap
+import os
 from pathlib import Path
+from typing import Iterator
+
+from tasks.document import Document
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT_DIR / "data"
 
+# 이보다 큰 TXT 파일은 한 번에 읽지 않고 memory map으로 나눠 읽음 (STUDYTEXTLAB_LARGE_FILE_MB)
+LARGE_FILE_BYTES = int(float(os.environ.get("STUDYTEXTLAB_LARGE_FILE_MB", 16)) * 1024 * 1024)
+
+# 인코딩 판별에 쓰는 앞부분 크기 / 미리보기에 쓰는 앞부분 크기
+_SAMPLE_BYTES = 64 * 1024
+_PREVIEW_BYTES = 4 * 1024
+# 큰 파일을 나눠 읽는 단위와, 큰 파일에서 Document로 만들어 둘 앞부분 글자 수
+_CHUNK_BYTES = 1024 * 1024
+_HEAD_CHARS = 1_000_000
+
+# BOM이 없을 때 차례로 시도할 인코딩 (latin-1은 어떤 바이트든 읽을 수 있는 마지막 대안)
+_FALLBACK_ENCODINGS = ("utf-8", "cp949", "latin-1")
+# utf-8 / cp949로 읽을 때 깨지는 글자가 이 비율을 넘으면 latin-1로 읽음
+_MAX_REPLACED_RATIO = 0.01
+# utf-32 BOM이 utf-16 BOM으로 시작하므로 utf-32를 먼저 확인
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _bom_encoding(data: bytes) -> str | None:
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding
+    return None
+
+
+def _normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _least_damaged(data: bytes) -> str:
+    """utf-8 / cp949 중 U+FFFD로 바뀌는 글자가 가장 적은 인코딩. 둘 다 많이 깨지면 latin-1."""
+    counts = {enc: data.decode(enc, errors="replace").count("\ufffd") for enc in _FALLBACK_ENCODINGS[:-1]}
+    best = min(counts, key=counts.get)
+    return best if counts[best] <= len(data) * _MAX_REPLACED_RATIO else "latin-1"
+
 
-def load_text_from_user() -> str:
+def detect_encoding(sample: bytes) -> str:
+    """
+    파일 앞부분으로 인코딩을 추정: BOM이 있으면 그 인코딩,
+    없으면 utf-8 → cp949 순서로 앞부분을 오류 없이 읽을 수 있는 첫 인코딩,
+    둘 다 안 되면 깨지는 글자가 적은 쪽 (많이 깨지면 latin-1).
+    """
+    bom = _bom_encoding(sample)
+    if bom is not None:
+        return bom
+    for encoding in _FALLBACK_ENCODINGS[:-1]:
+        # 앞부분 끝에서 잘린 멀티바이트 문자는 오류로 보지 않도록 incremental decoder 사용
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return _least_damaged(sample)
+
+
+def decode_text(data: bytes, encoding: str | None = None) -> str:
+    """
+    bytes를 텍스트로. 줄바꿈은 \n으로 통일.
+    인코딩을 주지 않았고 BOM도 없으면 utf-8 → cp949 순서로 전체를 오류 없이 읽을 수 있는지 확인
+    (앞부분이 ASCII뿐인 cp949 파일을 utf-8로 잘못 고르지 않도록).
+    둘 다 안 되면 깨지는 글자가 가장 적은 인코딩으로 읽고, 읽을 수 없는 바이트는 U+FFFD로 바꿈.
+    """
+    if encoding is None:
+        encoding = _bom_encoding(data)
+    if encoding is None:
+        for candidate in _FALLBACK_ENCODINGS[:-1]:
+            try:
+                return _normalize_newlines(data.decode(candidate))
+            except UnicodeDecodeError:
+                continue
+        encoding = _least_damaged(data)
+    return _normalize_newlines(data.decode(encoding, errors="replace"))
+
+
+class LargeTextFile:
+    """
+    메모리에 한 번에 올리지 않는 큰 텍스트 파일.
+    파일을 memory map으로 열어 필요한 부분만 읽으므로, 파일 크기와 관계없이
+    미리보기는 앞 몇 KB, 나눠 읽기는 청크 하나 크기만큼의 메모리만 씀.
+    인코딩은 앞부분으로 정하고, 나눠 읽다가 그 인코딩으로 읽을 수 없는 바이트가 나오면
+    그때까지 ASCII뿐이었던 utf-8 판별은 cp949로 바꾸고, 그 외에는 U+FFFD로 바꾼 글자 수를 replaced_chars에 셈 (마지막으로 읽은 범위 기준).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        with self.path.open("rb") as f:
+            self.encoding = detect_encoding(f.read(_SAMPLE_BYTES))
+        self.replaced_chars = 0
+
+    def __repr__(self) -> str:
+        return f"LargeTextFile({self.path.name!r}, {self.size / 1024 / 1024:.1f}MB, {self.encoding})"
+
+    def _blocks(self, chunk_bytes: int) -> Iterator[tuple[bytes, bool]]:
+        # (바이트 블록, 마지막 블록인지)
+        with self.path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for pos in range(0, len(mm), chunk_bytes):
+                yield mm[pos:pos + chunk_bytes], pos + chunk_bytes >= len(mm)
+
+    def preview(self, max_bytes: int = _PREVIEW_BYTES) -> str:
+        """앞 max_bytes만 읽어서 디코딩한 텍스트."""
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        for block, _last in self._blocks(max_bytes):
+            return decoder.decode(block, final=False).replace("\r\n", "\n").replace("\r", "\n")
+        return ""
+
+    def iter_chunks(self, chunk_bytes: int = _CHUNK_BYTES) -> Iterator[str]:
+        """
+        파일 내용을 약 chunk_bytes 단위의 텍스트 조각으로 차례로 돌려줌.
+        조각은 줄 경계에서 끊고 (한 줄이 chunk_bytes보다 길면 그대로 끊음),
+        블록 경계에서 잘린 멀티바이트 문자는 incremental decoder가 다음 블록과 이어 붙임.
+        """
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        strict = True
+        ascii_only = True
+        replaced = 0
+        carry = ""
+        for block, last in self._blocks(chunk_bytes):
+            if strict:
+                # 실패하면 이전 블록에서 넘어온 (잘린 멀티바이트) 바이트와 함께 다시 읽음
+                pending = decoder.getstate()[0]
+                try:
+                    decoded = decoder.decode(block, final=last)
+                except UnicodeDecodeError:
+                    decoder, decoded = self._recover(pending + block, last, ascii_only)
+                    strict = decoder.errors == "strict"
+                    replaced += decoded.count("\ufffd")
+                else:
+                    ascii_only = ascii_only and decoded.isascii()
+            else:
+                decoded = decoder.decode(block, final=last)
+                replaced += decoded.count("\ufffd")
+            self.replaced_chars = replaced
+            text = carry + decoded
+            cut = len(text) if last else text.rfind("\n") + 1
+            if cut <= 0:
+                cut = len(text)
+            piece, carry = text[:cut], text[cut:]
+            # 조각은 \n 뒤에서 끊으므로 \r\n이 두 조각으로 나뉘지 않음
+            piece = piece.replace("\r\n", "\n").replace("\r", "\n")
+            if piece.strip():
+                yield piece
+        if carry.strip():
+            yield carry.replace("\r\n", "\n").replace("\r", "\n")
+
+    def _recover(self, data: bytes, last: bool, ascii_only: bool) -> tuple[codecs.IncrementalDecoder, str]:
+        """지금 인코딩으로 읽을 수 없는 블록을 만났을 때 (새 decoder, 블록 텍스트)."""
+        if self.encoding == "utf-8" and ascii_only:
+            # 앞부분이 ASCII뿐이라 utf-8로 판별했을 수 있음: 지금까지 읽은 내용은 cp949로도 같음
+            decoder = codecs.getincrementaldecoder("cp949")()
+            try:
+                decoded = decoder.decode(data, final=last)
+                self.encoding = "cp949"
+                return decoder, decoded
+            except UnicodeDecodeError:
+                pass
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        return decoder, decoder.decode(data, final=last)
+
+    def head(self, max_chars: int = _HEAD_CHARS) -> Document:
+        """앞부분 max_chars 글자까지를 Document로 (전체가 필요 없는 Task용)."""
+        parts: list[str] = []
+        n = 0
+        for piece in self.iter_chunks():
+            parts.append(piece[:max_chars - n])
+            n += len(parts[-1])
+            if n >= max_chars:
+                break
+        return Document("".join(parts), source=str(self.path))
+
+
+def load_text_from_user() -> Document:
     """
     여러 줄 텍스트를 입력받음.
     (Ctrl+D / Ctrl+Z+Enter 로 종료)
@@ -20,14 +202,38 @@ def load_text_from_user() -> str:
             lines.append(line)
     except EOFError:
         pass
-    text = "\n".join(lines).strip()
-    return text
+    return Document("\n".join(lines).strip(), source="input")
+
+
+def load_text_from_txt_file(path: Path) -> Document:
+    """
+    주어진 TXT 파일 경로에서 텍스트를 읽어옴.
+    인코딩은 파일 전체를 읽을 수 있는지로 판별하고, 읽을 수 없는 바이트가 있어도 실패하지 않음 (U+FFFD로 바꿈).
+    """
+    return Document(decode_text(path.read_bytes()), source=str(path))
+
+
+def open_text_file(path: Path) -> Document | LargeTextFile:
+    """LARGE_FILE_BYTES보다 큰 파일은 LargeTextFile로, 그 외는 Document로 읽음."""
+    if path.stat().st_size > LARGE_FILE_BYTES:
+        return LargeTextFile(path)
+    return load_text_from_txt_file(path)
+
+
+def iter_document_paths(input_dir: Path) -> list[Path]:
+    """input_dir 아래(하위 폴더 포함)의 .txt / .pdf 파일 목록을 정렬해서 반환."""
+    return sorted(
+        p for p in input_dir.rglob("*")
+        if p.is_file() and p.suffix.lower() in (".txt", ".pdf")
+    )
 
 
-def load_text_from_txt_file(path: Path) -> str:
-    """주어진 TXT 파일 경로에서 텍스트를 읽어옴."""
-    with path.open("r", encoding="utf-8") as f:
-        return f.read()
+def load_document(path: Path) -> Document:
+    """TXT는 그대로 읽고, PDF는 페이지 텍스트를 추출해서 반환."""
+    if path.suffix.lower() == ".pdf":
+        from tasks.report_pdf_analysis import extract_text_from_pdf_path
+        return Document(extract_text_from_pdf_path(str(path)), source=str(path))
+    return load_text_from_txt_file(path)
 
 
 def select_txt_file_interactive() -> Path | None:
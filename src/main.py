@@ -1,5 +1,10 @@
 # StudyTextLab - Main Entry
 
+import functools
+import sys
+import time
+from pathlib import Path
+
 from ui import (
     print_header,
     print_main_menu,
@@ -10,18 +15,24 @@ from ui import (
     print_info,
     print_result_block,
     print_history_list,
+    print_model_status,
 )
 from loaders import (
+    DATA_DIR,
+    LargeTextFile,
+    load_document,
     load_text_from_user,
-    load_text_from_txt_file,
+    open_text_file,
     select_txt_file_interactive,
     select_pdf_file_interactive,
 )
 from history import (
     save_history,
-    list_history_files,
-    load_history_file,
+    list_history,
+    load_history,
 )
+from pipelines import PipelineRegistry, prewarm_order_from_env
+from speculation import Speculator
 
 # ---- 팀원들이 구현한 Task 모듈 ----
 from tasks import qa
@@ -33,42 +44,125 @@ from tasks import keywords
 from tasks import similarity
 from tasks import grammar
 from tasks import report_pdf_analysis
+from tasks.cache import get_cache, get_chunk_cache, model_name_of
+from tasks.document import Document
+from tasks.instrumentation import RunTrace, stage, trace
 
 
 def pause():
     input("\n(스크린샷 촬영 후 Enter를 누르면 메뉴로 돌아갑니다...) ")
 
 
-def init_pipelines():
+HISTORY_PAGE_SIZE = 20
+
+
+def browse_history() -> None:
+    """히스토리를 페이지 단위로 보여주고, 선택한 기록을 출력."""
+    task_filter: str | None = None
+    before_id: int | None = None
+    while True:
+        entries = list_history(limit=HISTORY_PAGE_SIZE, before_id=before_id, task=task_filter)
+        if not entries:
+            print_error("저장된 히스토리가 없습니다." if before_id is None else "더 이상 히스토리가 없습니다.")
+            pause()
+            return
+
+        print_history_list(entries)
+        choice = input("번호: 열기 / N: 다음 페이지 / F <task>: task로 필터 / 엔터: 취소 > ").strip()
+        if not choice:
+            return
+        if choice.lower() == "n":
+            before_id = entries[-1]["id"]
+            continue
+        if choice.lower().startswith("f"):
+            task_filter = choice[1:].strip() or None
+            before_id = None
+            continue
+
+        try:
+            idx = int(choice) - 1
+            if idx < 0 or idx >= len(entries):
+                raise ValueError
+        except ValueError:
+            print_error("잘못된 번호입니다.")
+            pause()
+            return
+
+        data = load_history(entries[idx]["id"])
+        print_result_block("History Detail", data)
+        pause()
+        return
+
+
+def save_traced(task_name: str, input_data: dict, output_data, run: RunTrace) -> int:
+    """
+    계측 결과(metrics)와 함께 history에 한 번에 저장.
+    history_write 단계는 DB 연결과 입력 텍스트 저장 / 직렬화 시간 (마지막 행 insert와 commit은 빠짐).
+    """
+    start = time.perf_counter()
+
+    def final_metrics() -> dict:
+        run.add_stage("history_write", time.perf_counter() - start)
+        return run.metrics()
+
+    return save_history(task_name, input_data, output_data, metrics=final_metrics)
+
+
+def text_input(text: str, large_file: LargeTextFile | None) -> dict:
+    """history에 저장할 입력. 큰 파일 전체를 처리한 Task는 내용 대신 파일 경로를 저장."""
+    if large_file is None:
+        return {"text": text}
+    return {"file": str(large_file.path), "size": large_file.size, "encoding": large_file.encoding}
+
+
+def corpus_doc_id(text: Document) -> str | None:
+    """data/ 폴더에서 불러온 텍스트면 코퍼스 색인의 doc id (data/ 기준 상대 경로)."""
+    if not text.source:
+        return None
+    try:
+        return Path(text.source).resolve().relative_to(DATA_DIR.resolve()).as_posix()
+    except (ValueError, OSError):
+        return None
+
+
+def init_pipelines() -> PipelineRegistry:
     """
-    프로그램 시작 시 한 번만 호출해서
-    각 Task 모듈의 모델/파이프라인을 미리 로드.
+    각 Task 모듈의 모델/파이프라인은 처음 사용할 때 로드.
+    메뉴에서 대기하는 동안 백그라운드 스레드가 우선순위 순서대로 미리 로드.
+    (STUDYTEXTLAB_PREWARM 환경 변수로 순서 지정, "none"이면 끔)
     """
-    print_info("Loading NLP pipelines... (this may take a while on first run)")
-
-    pipelines = {}
-    pipelines["qa"] = qa.load_qa_pipeline()
-    pipelines["summarizer"] = summarization.load_summarizer()
-    pipelines["translator"] = translation.load_translator()
-    pipelines["sentiment"] = sentiment.load_sentiment_model()
-    pipelines["topic_classifier"] = topic_classification.load_topic_classifier()
-    pipelines["embedder"] = similarity.load_embedder()
-    pipelines["grammar_model"] = grammar.load_grammar_model()
-
-    print_info("All pipelines loaded successfully.\n")
-    pause()
+    pipelines = PipelineRegistry()
+    pipelines.start_prewarm(prewarm_order_from_env())
+    print_info("NLP 모델은 처음 사용할 때 로드됩니다. (백그라운드에서 미리 로드 중)")
     return pipelines
 
 
 def main():
     pipelines = init_pipelines()
-
-    current_text: str = ""
+    # STUDYTEXTLAB_SPECULATE가 켜져 있으면 텍스트를 불러온 뒤 자주 쓰는 Task를 백그라운드에서 미리 실행
+    speculator = Speculator(pipelines)
+
+    # 불러온 텍스트는 Document: 문장 분할 / 토큰화 / 청크 / 임베딩을 Task 사이에 재사용
+    current_text: Document = Document()
+    # 큰 TXT 파일은 memory map으로 열어 두고, current_text에는 앞부분만 둠
+    # (요약 / 감성 / 키워드는 파일 전체를 조각으로 나눠 처리)
+    current_file: LargeTextFile | None = None
     second_text: str = ""
+    # 표절 검사용 data/ 코퍼스 색인 (처음 검사할 때 열고 세션 동안 재사용)
+    corpus_index: similarity.CorpusIndex | None = None
 
     while True:
         print_header("StudyTextLab - AI Text Lab for Students")
-        print_current_text_preview(current_text)
+        if current_file is None:
+            print_current_text_preview(current_text)
+        else:
+            print_current_text_preview(
+                current_file.preview(),
+                note=f"큰 파일 {current_file.path.name} {current_file.size / 1024 / 1024:.0f}MB, "
+                     f"{current_file.encoding} - 요약/감성/키워드는 전체, 그 외는 앞 {len(current_text):,}자"
+                     + (f" (읽을 수 없는 글자 {current_file.replaced_chars:,}개는 �로 표시)"
+                        if current_file.replaced_chars else ""),
+            )
         print_main_menu()
 
         cmd = prompt_command()
@@ -77,12 +171,18 @@ def main():
         # 텍스트 관련 메뉴
         # ==========================
         if cmd == "q":
+            speculator.cancel()
+            if speculator.enabled:
+                stats = speculator.stats()
+                print_info(f"미리 계산한 결과 {stats['results_stored']}개 중 {stats['results_used']}개를 사용했습니다.")
             print_info("프로그램을 종료합니다. 이용해 주셔서 감사합니다!")
             pause()
             break
 
         elif cmd == "t":
             current_text = load_text_from_user()
+            current_file = None
+            speculator.submit(current_text)
             print_info("현재 텍스트가 업데이트되었습니다.")
             pause()
 
@@ -92,40 +192,44 @@ def main():
                 print_error("선택된 파일이 없습니다.")
                 pause()
                 continue
-            current_text = load_text_from_txt_file(path)
+            loaded = open_text_file(path)
+            if isinstance(loaded, LargeTextFile):
+                current_file = loaded
+                current_text = loaded.head()
+            else:
+                current_file = None
+                current_text = loaded
+            if current_file is None:
+                speculator.submit(current_text)
+            else:
+                # 큰 파일은 Task를 고를 때 파일 전체를 조각으로 처리하므로 미리 실행하지 않음
+                speculator.cancel()
             print_info(f"텍스트 파일을 로드했습니다: {path.name}")
             pause()
 
         elif cmd == "c":
-            current_text = ""
+            current_text = Document()
+            current_file = None
+            speculator.cancel()
             print_info("현재 텍스트를 초기화했습니다.")
             pause()
 
+        elif cmd == "s":
+            print_model_status(pipelines.status())
+            print_result_block("Model Memory", pipelines.memory())
+            print_result_block("Result Cache", get_cache().stats())
+            print_result_block("Chunk Cache", get_chunk_cache().stats())
+            if speculator.enabled:
+                print_result_block("Speculation", speculator.stats())
+            if current_text:
+                print_result_block("Current Document", current_text.memo_stats())
+            pause()
+
         # ==========================
         # 히스토리 관련 메뉴
         # ==========================
         elif cmd == "h":
-            history_files = list_history_files()
-            if not history_files:
-                print_error("저장된 히스토리가 없습니다.")
-                pause()
-                continue
-            print_history_list(history_files)
-            choice = input("열어볼 히스토리 번호를 입력하세요 (엔터: 취소): ").strip()
-            if not choice:
-                continue
-            try:
-                idx = int(choice) - 1
-                if idx < 0 or idx >= len(history_files):
-                    raise ValueError
-            except ValueError:
-                print_error("잘못된 번호입니다.")
-                pause()
-                continue
-
-            data = load_history_file(history_files[idx])
-            print_result_block("History Detail", data)
-            pause()
+            browse_history()
 
         # ==========================
         # Q&A
@@ -136,9 +240,17 @@ def main():
                 pause()
                 continue
             question = prompt_question()
-            result = qa.run_qa(pipelines["qa"], current_text, question)
+            with trace("qa", text=current_text) as run, pipelines.using("qa", "embedder"):
+                run.set_model(pipelines["qa"])
+                result = qa.run_qa(
+                    pipelines["qa"],
+                    current_text,
+                    question,
+                    embedder=pipelines["embedder"],
+                )
+                run.set_output(result)
             print_result_block("Q&A Result", result)
-            save_history("qa", {"context": current_text, "question": question}, result)
+            save_traced("qa", {"context": current_text, "question": question}, result, run)
             pause()
 
         # ==========================
@@ -149,14 +261,26 @@ def main():
                 print_error("먼저 텍스트를 입력하거나 파일을 로드하세요.")
                 pause()
                 continue
-            summary = summarization.run_summarization(
-                pipelines["summarizer"],
-                current_text,
-                max_len=60,
-                min_len=20,
-            )
+            speculator.claim("summary")
+            with trace("summarization", text=current_text) as run, pipelines.using("summarizer"):
+                run.set_model(pipelines["summarizer"])
+                if current_file is not None:
+                    summary = summarization.summarize_stream(
+                        pipelines["summarizer"],
+                        current_file.iter_chunks(),
+                        max_len=60,
+                        min_len=20,
+                    )
+                else:
+                    summary = summarization.run_summarization(
+                        pipelines["summarizer"],
+                        current_text,
+                        max_len=60,
+                        min_len=20,
+                    )
+                run.set_output(summary)
             print_result_block("Summarization Result", {"summary": summary})
-            save_history("summarization", {"text": current_text}, {"summary": summary})
+            save_traced("summarization", text_input(current_text, current_file), {"summary": summary}, run)
             pause()
 
         # ==========================
@@ -167,9 +291,14 @@ def main():
                 print_error("먼저 텍스트를 입력하거나 파일을 로드하세요.")
                 pause()
                 continue
-            translated = translation.run_translation(pipelines["translator"], current_text)
+            direction = input("번역 방향 (엔터: 한→영 / E: 영→한): ").strip().lower()
+            translator_name = "translator_en_ko" if direction == "e" else "translator"
+            with trace("translation", text=current_text) as run, pipelines.using(translator_name):
+                translator = run.set_model(pipelines[translator_name])
+                translated = translation.run_translation(translator, current_text)
+                run.set_output(translated)
             print_result_block("Translation Result", {"translated": translated})
-            save_history("translation", {"text": current_text}, {"translated": translated})
+            save_traced("translation", {"text": current_text}, {"translated": translated}, run)
             pause()
 
         # ==========================
@@ -180,9 +309,16 @@ def main():
                 print_error("먼저 텍스트를 입력하거나 파일을 로드하세요.")
                 pause()
                 continue
-            result = sentiment.run_sentiment(pipelines["sentiment"], current_text)
+            speculator.claim("sentiment")
+            with trace("sentiment", text=current_text) as run, pipelines.using("sentiment"):
+                run.set_model(pipelines["sentiment"])
+                if current_file is not None:
+                    result = sentiment.run_sentiment_stream(pipelines["sentiment"], current_file.iter_chunks())
+                else:
+                    result = sentiment.run_sentiment(pipelines["sentiment"], current_text)
+                run.set_output(result)
             print_result_block("Sentiment Result", {"sentiment": result})
-            save_history("sentiment", {"text": current_text}, {"result": result})
+            save_traced("sentiment", text_input(current_text, current_file), {"result": result}, run)
             pause()
 
         # ==========================
@@ -193,12 +329,28 @@ def main():
                 print_error("먼저 텍스트를 입력하거나 파일을 로드하세요.")
                 pause()
                 continue
-            result = topic_classification.run_topic_classification(
-                pipelines["topic_classifier"],
-                current_text,
-            )
+            tier_choice = input("분류 방식 (엔터: 정확-MNLI / F: 빠름-임베딩): ").strip().lower()
+            if tier_choice == "f":
+                speculator.claim("embeddings")
+                with trace("topic_classification", text=current_text) as run, pipelines.using("embedder"):
+                    run.set_model(pipelines["embedder"])
+                    result = topic_classification.run_topic_classification(
+                        None,
+                        current_text,
+                        tier="fast",
+                        embedder=pipelines["embedder"],
+                    )
+                    run.set_output(result)
+            else:
+                with trace("topic_classification", text=current_text) as run, pipelines.using("topic_classifier"):
+                    run.set_model(pipelines["topic_classifier"])
+                    result = topic_classification.run_topic_classification(
+                        pipelines["topic_classifier"],
+                        current_text,
+                    )
+                    run.set_output(result)
             print_result_block("Topic Classification Result", result)
-            save_history("topic_classification", {"text": current_text}, result)
+            save_traced("topic_classification", {"text": current_text}, result, run)
             pause()
 
         # ==========================
@@ -209,9 +361,18 @@ def main():
                 print_error("먼저 텍스트를 입력하거나 파일을 로드하세요.")
                 pause()
                 continue
-            result = keywords.extract_keywords(current_text, top_k=10)
+            speculator.claim("keywords")
+            with trace("keywords", text=current_text) as run, pipelines.using("embedder"):
+                run.set_model(pipelines["embedder"])
+                if current_file is not None:
+                    result = keywords.extract_keywords_stream(
+                        current_file.iter_chunks(), top_k=10, embedder=pipelines["embedder"]
+                    )
+                else:
+                    result = keywords.extract_keywords(current_text, top_k=10, embedder=pipelines["embedder"])
+                run.set_output(result)
             print_result_block("Keyword Extraction Result", {"keywords": result})
-            save_history("keywords", {"text": current_text}, {"keywords": result})
+            save_traced("keywords", text_input(current_text, current_file), {"keywords": result}, run)
             pause()
 
         # ==========================
@@ -224,19 +385,58 @@ def main():
                 continue
             print_info("비교할 두 번째 텍스트를 입력합니다.")
             second_text = load_text_from_user()
-            sim_result = similarity.compute_similarity(
-                pipelines["embedder"],
-                current_text,
-                second_text,
-            )
+            with trace("similarity", text=current_text) as run, pipelines.using("embedder"):
+                run.set_model(pipelines["embedder"])
+                sim_result = similarity.compute_similarity(
+                    pipelines["embedder"],
+                    current_text,
+                    second_text,
+                )
+                run.set_output(sim_result)
             print_result_block("Similarity Result", sim_result)
-            save_history(
+            save_traced(
                 "similarity",
                 {"text_a": current_text, "text_b": second_text},
                 sim_result,
+                run,
             )
             pause()
 
+        # ==========================
+        # Corpus Plagiarism Check
+        # ==========================
+        elif cmd == "9":
+            if not current_text.strip():
+                print_error("먼저 검사할 텍스트를 입력하거나 파일을 로드하세요. (T 또는 F)")
+                pause()
+                continue
+            print_info("data/ 폴더 문서 색인을 확인하는 중... (바뀐 파일만 다시 임베딩)")
+            with trace("plagiarism_search", text=current_text) as run, pipelines.using("embedder"):
+                embedder = run.set_model(pipelines["embedder"])
+                if corpus_index is None or corpus_index.model_name != model_name_of(embedder):
+                    # 처음이거나 embedder가 다른 백엔드로 다시 로드됨 (색인도 그 모델 기준으로 다시 만듦)
+                    corpus_index = similarity.CorpusIndex(embedder)
+                else:
+                    # 메모리 한도 때문에 embedder가 다시 로드되었을 수 있으므로 지금 객체를 사용
+                    corpus_index.embedder = embedder
+                index = corpus_index
+                with stage("index_update"):
+                    changes = index.update_from_directory(DATA_DIR, load_document)
+                # data/ 에서 불러온 파일이면 자기 자신은 결과에서 뺌
+                own_id = corpus_doc_id(current_text)
+                with stage("query"):
+                    matches = index.query(current_text, top_k=5, exclude=[own_id] if own_id else [])
+                for m in matches:
+                    # 문서 쪽 청크 원문을 보여주기 위해 상위 문서만 다시 읽음
+                    doc_text = load_document(DATA_DIR / m["doc_id"])
+                    for pair in m["matches"]:
+                        pair["doc_chunk"] = doc_text[pair["doc_start"]:pair["doc_end"]]
+                result = {"index": {**index.stats(), **changes}, "matches": matches}
+                run.set_output(result)
+            print_result_block("Corpus Plagiarism Result", result)
+            save_traced("plagiarism_search", {"text": current_text}, result, run)
+            pause()
+
         # ==========================
         # Grammar Correction
         # ==========================
@@ -245,15 +445,19 @@ def main():
                 print_error("먼저 텍스트를 입력하거나 파일을 로드하세요.")
                 pause()
                 continue
-            corrected = grammar.run_grammar_correction(
-                pipelines["grammar_model"],
-                current_text,
-            )
+            with trace("grammar_correction", text=current_text) as run, pipelines.using("grammar_model"):
+                run.set_model(pipelines["grammar_model"])
+                corrected = grammar.run_grammar_correction(
+                    pipelines["grammar_model"],
+                    current_text,
+                )
+                run.set_output(corrected)
             print_result_block("Grammar Correction Result", corrected)
-            save_history(
+            save_traced(
                 "grammar_correction",
                 {"original": current_text},
                 corrected,
+                run,
             )
             pause()
 
@@ -267,14 +471,17 @@ def main():
                 pause()
                 continue
 
-            report = report_pdf_analysis.analyze_pdf(
-                summarizer=pipelines["summarizer"],
-                topic_classifier=pipelines["topic_classifier"],
-                keyword_extractor=keywords.extract_keywords,
-                pdf_path=str(pdf_path),
-            )
+            with trace("pdf_analysis") as run, pipelines.using("summarizer", "topic_classifier", "embedder"):
+                run.set_model(pipelines["summarizer"])
+                report = report_pdf_analysis.analyze_pdf(
+                    summarizer=pipelines["summarizer"],
+                    topic_classifier=pipelines["topic_classifier"],
+                    keyword_extractor=functools.partial(keywords.extract_keywords, embedder=pipelines["embedder"]),
+                    pdf_path=str(pdf_path),
+                )
+                run.set_output(report)
             print_result_block("PDF Smart Analysis Report", report)
-            save_history("pdf_analysis", {"pdf_path": str(pdf_path)}, report)
+            save_traced("pdf_analysis", {"pdf_path": str(pdf_path)}, report, run)
             pause()
 
         else:
@@ -283,4 +490,20 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # 메뉴 없이 폴더 전체를 처리하는 batch 모드
+        from batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        # Task별 성능 측정 / baseline 비교
+        from benchmark import main as benchmark_main
+        sys.exit(benchmark_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "service":
+        # 로컬 HTTP JSON API
+        from service import main as service_main
+        sys.exit(service_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "import-budget":
+        # 시작 시 import 시간 / 무거운 라이브러리 import 여부 확인
+        from import_budget import main as import_budget_main
+        sys.exit(import_budget_main(sys.argv[2:]))
     main()
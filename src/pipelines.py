@@ -0,0 +1,352 @@
+# StudyTextLab - Pipeline Registry
+
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Iterator
+
+from tasks import qa
+from tasks import summarization
+from tasks import translation
+from tasks import sentiment
+from tasks import topic_classification
+from tasks import similarity
+from tasks import grammar
+from tasks import keywords
+from tasks.instrumentation import stage
+
+# 모델 로드 상태
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+LOADED = "loaded"
+FAILED = "failed"
+
+# 메뉴에서 대기하는 동안 미리 로드할 순서 (가볍고 자주 쓰는 모델 우선)
+DEFAULT_PREWARM_ORDER: list[str] = [
+    "qa",
+    "sentiment",
+    "embedder",
+    "summarizer",
+    "translator",
+    "topic_classifier",
+    "grammar_model",
+]
+
+# 각 Task 모듈의 load_* 함수
+DEFAULT_LOADERS: dict[str, Callable[[], Any]] = {
+    "qa": qa.load_qa_pipeline,
+    "summarizer": summarization.load_summarizer,
+    "translator": translation.load_translator,
+    # 영→한 (opus-mt-tc-big)은 크기가 커서 별도 항목으로 두고 메모리 한도 안에서 관리
+    "translator_en_ko": lambda: translation.load_translator_for("en-ko"),
+    "sentiment": sentiment.load_sentiment_model,
+    "topic_classifier": topic_classification.load_topic_classifier,
+    "embedder": similarity.load_embedder,
+    "grammar_model": grammar.load_grammar_model,
+}
+
+
+def _unload_embedder() -> None:
+    # embedder를 참조하는 KeyBERT / 색인 / prototype도 같이 버려야 메모리가 실제로 풀림
+    similarity.unload_embedder()
+    keywords.unload_kw_model()
+    qa.clear_passage_index()
+    topic_classification.clear_prototypes()
+
+
+# 각 Task 모듈의 unload 함수 (모듈 전역 singleton을 비움). 번역 모델은 registry만 들고 있어서 없음
+DEFAULT_UNLOADERS: dict[str, Callable[[], None]] = {
+    "qa": qa.unload_qa_pipeline,
+    "summarizer": summarization.unload_summarizer,
+    "sentiment": sentiment.unload_sentiment_model,
+    "topic_classifier": topic_classification.unload_topic_classifier,
+    "embedder": _unload_embedder,
+    "grammar_model": grammar.unload_grammar_model,
+}
+
+_MB = 1024 * 1024
+
+
+def prewarm_order_from_env() -> list[str] | None:
+    """
+    STUDYTEXTLAB_PREWARM 환경 변수에서 prewarm 순서를 읽음.
+    예) "qa,summarizer"  /  "none" 이면 prewarm 하지 않음.
+    설정이 없으면 None (기본 순서 사용).
+    """
+    raw = os.environ.get("STUDYTEXTLAB_PREWARM")
+    if raw is None:
+        return None
+    raw = raw.strip().lower()
+    if raw in ("", "0", "none", "off"):
+        return []
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+
+def memory_budget_from_env() -> float | None:
+    """
+    STUDYTEXTLAB_MEMORY_BUDGET_MB 환경 변수에서 모델 메모리 한도(MB)를 읽음.
+    설정이 없거나 0 이하이면 None (한도 없음).
+    """
+    raw = os.environ.get("STUDYTEXTLAB_MEMORY_BUDGET_MB", "").strip()
+    if not raw:
+        return None
+    budget = float(raw)
+    return budget if budget > 0 else None
+
+
+def estimate_model_bytes(pipe: Any) -> int:
+    """
+    파이프라인/모델이 차지하는 대략적인 메모리 (가중치 + buffer).
+    int8 양자화 모델의 packed weight도 state_dict에 들어 있으므로 같이 셈.
+    """
+    module = getattr(pipe, "model", pipe)
+    state_dict = getattr(module, "state_dict", None)
+    if not callable(state_dict):
+        return 0
+
+    seen: set[int] = set()
+
+    def _size(value: Any) -> int:
+        if isinstance(value, (tuple, list)):
+            return sum(_size(v) for v in value)
+        if hasattr(value, "element_size") and hasattr(value, "numel"):
+            # weight tying 등으로 같은 tensor가 여러 이름으로 나오면 한 번만 셈
+            try:
+                ptr = value.untyped_storage().data_ptr()
+            except Exception:
+                ptr = id(value)
+            if ptr in seen:
+                return 0
+            seen.add(ptr)
+            return int(value.numel() * value.element_size())
+        return 0
+
+    try:
+        return sum(_size(v) for v in state_dict().values())
+    except Exception:
+        return 0
+
+
+class PipelineRegistry:
+    """
+    모델/파이프라인을 처음 사용할 때 로드하는 레지스트리.
+    registry["qa"] 처럼 dict와 같은 방식으로 접근.
+
+    메모리 한도(budget_mb, 기본값은 STUDYTEXTLAB_MEMORY_BUDGET_MB, 0이면 없음)가 있으면
+    로드된 모델 크기의 합이 한도를 넘지 않도록 가장 오래 사용하지 않은 모델부터 내림.
+    내린 모델은 다음 사용 시 다시 로드.
+    """
+
+    def __init__(
+        self,
+        loaders: dict[str, Callable[[], Any]] | None = None,
+        unloaders: dict[str, Callable[[], None]] | None = None,
+        budget_mb: float | None = None,
+    ):
+        self._loaders = dict(loaders or DEFAULT_LOADERS)
+        self._unloaders = dict(unloaders if unloaders is not None else DEFAULT_UNLOADERS)
+        # 사용 순서 (앞쪽이 가장 오래 전에 사용)
+        self._pipelines: "OrderedDict[str, Any]" = OrderedDict()
+        self._state: dict[str, str] = {name: NOT_LOADED for name in self._loaders}
+        self._load_time: dict[str, float] = {}
+        self._errors: dict[str, str] = {}
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        # 모델 호출용 lock (토크나이저 등이 여러 스레드의 동시 호출에 안전하지 않음)
+        self._use_locks = {name: threading.RLock() for name in self._loaders}
+        self._lru_lock = threading.Lock()
+        self._sizes: dict[str, int] = {}
+        self._evictions: dict[str, int] = {name: 0 for name in self._loaders}
+        if budget_mb is None:
+            budget_mb = memory_budget_from_env()
+        self.budget_bytes = int(budget_mb * _MB) if budget_mb and budget_mb > 0 else None
+        self._prewarm_thread: threading.Thread | None = None
+        self._stop_prewarm = threading.Event()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._loaders
+
+    def __getitem__(self, name: str) -> Any:
+        return self.get(name)
+
+    def names(self) -> list[str]:
+        return list(self._loaders)
+
+    def get(self, name: str) -> Any:
+        """파이프라인을 반환. 아직 로드되지 않았으면 지금 로드."""
+        if name not in self._loaders:
+            raise KeyError(f"등록되지 않은 파이프라인입니다: {name}")
+
+        pipe = self._touch(name)
+        if pipe is not None:
+            return pipe
+
+        # prewarm 스레드가 로드 중이면 lock에서 기다렸다가 결과를 그대로 사용
+        with self._locks[name]:
+            pipe = self._touch(name)
+            if pipe is not None:
+                return pipe
+
+            # 예전에 로드해 본 모델이면 크기를 알고 있으므로 미리 자리를 비움
+            self._evict_for(name, self._sizes.get(name, 0))
+            pipe = self._load(name)
+            self._evict_for(name, 0)
+            return pipe
+
+    def _load(self, name: str, recent: bool = True) -> Any:
+        """로드 후 크기를 기록하고 LRU에 넣음 (recent=False면 가장 오래된 쪽). 호출 측이 name lock을 잡음."""
+        self._state[name] = LOADING
+        start = time.perf_counter()
+        try:
+            with stage("model_load"):
+                pipe = self._loaders[name]()
+        except Exception as e:
+            self._state[name] = FAILED
+            self._errors[name] = str(e)
+            raise
+        self._load_time[name] = time.perf_counter() - start
+        self._sizes[name] = estimate_model_bytes(pipe)
+        with self._lru_lock:
+            self._pipelines[name] = pipe
+            self._pipelines.move_to_end(name, last=recent)
+        self._state[name] = LOADED
+        self._errors.pop(name, None)
+        return pipe
+
+    def _touch(self, name: str) -> Any:
+        with self._lru_lock:
+            pipe = self._pipelines.get(name)
+            if pipe is not None:
+                self._pipelines.move_to_end(name)
+            return pipe
+
+    def _used_bytes(self) -> int:
+        return sum(self._sizes.get(n, 0) for n in self._pipelines)
+
+    def _evict_for(self, keep: str, incoming: int) -> None:
+        """incoming 바이트가 더 들어와도 한도를 넘지 않도록 keep 이외의 모델을 LRU 순으로 내림."""
+        if self.budget_bytes is None:
+            return
+        with self._lru_lock:
+            victims = []
+            used = self._used_bytes() + incoming
+            for other in list(self._pipelines):
+                if used <= self.budget_bytes:
+                    break
+                if other == keep:
+                    continue
+                victims.append(other)
+                used -= self._sizes.get(other, 0)
+        for other in victims:
+            self.unload(other, evicted=True)
+
+    def unload(self, name: str, evicted: bool = False) -> bool:
+        """
+        모델을 메모리에서 내림. 다음 get() 때 다시 로드.
+        이미 모델을 받아 사용 중인 호출은 그 참조로 끝까지 실행됨.
+        """
+        with self._lru_lock:
+            if self._pipelines.pop(name, None) is None:
+                return False
+            self._state[name] = NOT_LOADED
+            if evicted:
+                self._evictions[name] += 1
+        unloader = self._unloaders.get(name)
+        if unloader is not None:
+            unloader()
+        gc.collect()
+        return True
+
+    @contextmanager
+    def using(self, *names: str) -> Iterator[None]:
+        """
+        names 모델을 호출하는 동안 잡아 둠. 메뉴와 백그라운드 미리 실행이 같은 모델을 동시에 호출하지 않게 함.
+        여러 개를 잡을 때는 이름 순서로 잡아서 서로 기다리며 멈추지 않게 함.
+        """
+        with ExitStack() as stack:
+            for name in sorted(set(names)):
+                stack.enter_context(self._use_locks[name])
+            yield
+
+    def is_loaded(self, name: str) -> bool:
+        return self._state.get(name) == LOADED
+
+    def status(self) -> dict[str, dict]:
+        """모델별 로드 상태와 로드 시간(초)."""
+        info = {}
+        for name in self._loaders:
+            entry = {"state": self._state[name]}
+            if name in self._load_time:
+                entry["load_time"] = round(self._load_time[name], 3)
+            if name in self._sizes:
+                entry["size_mb"] = round(self._sizes[name] / _MB, 1)
+            if self._evictions[name]:
+                entry["evictions"] = self._evictions[name]
+            if name in self._errors:
+                entry["error"] = self._errors[name]
+            info[name] = entry
+        return info
+
+    def memory(self) -> dict:
+        """로드된 모델 크기 합계, 한도, 내린 횟수 (MB)."""
+        with self._lru_lock:
+            used = self._used_bytes()
+            loaded = list(self._pipelines)
+        return {
+            "budget_mb": round(self.budget_bytes / _MB, 1) if self.budget_bytes is not None else None,
+            "used_mb": round(used / _MB, 1),
+            "loaded": loaded,
+            "evictions": sum(self._evictions.values()),
+        }
+
+    def start_prewarm(self, order: list[str] | None = None) -> None:
+        """
+        백그라운드 스레드에서 order 순서대로 모델을 미리 로드.
+        이미 로드된 모델은 건너뛰고, 실패해도 다음 모델을 계속 로드.
+        메모리 한도가 있으면 한도가 찰 때까지만 로드 (prewarm 때문에 모델을 내리지 않음).
+        """
+        if self._prewarm_thread is not None and self._prewarm_thread.is_alive():
+            return
+
+        names = [n for n in (order if order is not None else DEFAULT_PREWARM_ORDER) if n in self._loaders]
+        if not names:
+            return
+
+        def _worker() -> None:
+            for name in names:
+                if self._stop_prewarm.is_set():
+                    return
+                if self.is_loaded(name):
+                    continue
+                if self.budget_bytes is not None:
+                    with self._lru_lock:
+                        used = self._used_bytes()
+                    if used + self._sizes.get(name, 0) >= self.budget_bytes:
+                        return
+                try:
+                    self._prewarm_one(name)
+                except Exception:
+                    # 실패 내용은 status()에 남음. 실제 사용 시 다시 시도.
+                    continue
+
+        self._stop_prewarm.clear()
+        self._prewarm_thread = threading.Thread(target=_worker, name="pipeline-prewarm", daemon=True)
+        self._prewarm_thread.start()
+
+    def _prewarm_one(self, name: str) -> None:
+        with self._locks[name]:
+            if self._touch(name) is not None:
+                return
+            # 아직 사용한 적 없는 모델이므로 LRU 맨 앞(가장 먼저 내릴 쪽)에 둠
+            self._load(name, recent=False)
+        with self._lru_lock:
+            over = self._used_bytes() > self.budget_bytes if self.budget_bytes is not None else False
+        if over:
+            # 한도를 넘기게 한 모델은 다른 모델을 밀어내지 않고 자기만 내림
+            self.unload(name)
+
+    def stop_prewarm(self) -> None:
+        """진행 중인 prewarm을 현재 모델 로드가 끝나는 시점에 중단."""
+        self._stop_prewarm.set()
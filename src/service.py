@@ -0,0 +1,516 @@
+# StudyTextLab - Local HTTP/JSON Service
+#
+# 사용 예)
+#   python main.py service --port 8765
+#   curl -X POST localhost:8765/summarization -d '{"text": "..."}'
+#
+# POST /<task>  : JSON body로 Task 실행 (예: {"text": "..."}), 결과를 {"result": ...}로 반환
+# GET  /health  : 모델 로드 상태, 메모리, 큐 길이
+#
+# 동시에 들어온 요청은 Task(모델)별 큐에 모였다가 max_wait_ms 안에 최대 max_batch개씩
+# 한 번의 배치 호출로 실행됨. 큐가 가득 차면 바로 429를 돌려줌.
+# 여러 Task가 같은 모델(embedder 등)을 쓰므로, 배치는 PipelineRegistry.using()으로 모델을 잡고 실행.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from pipelines import PipelineRegistry, prewarm_order_from_env
+from tasks import qa
+from tasks import summarization
+from tasks import translation
+from tasks import sentiment
+from tasks import topic_classification
+from tasks import keywords
+from tasks import similarity
+from tasks import grammar
+
+_MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# 번역 방향 -> PipelineRegistry 항목
+_TRANSLATORS = {"ko-en": "translator", "en-ko": "translator_en_ko"}
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _text(req: dict, key: str = "text") -> str:
+    value = req.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise BadRequest(f"'{key}' 문자열이 필요합니다.")
+    return value
+
+
+def _optional_int(req: dict, key: str, minimum: int = 1) -> int | None:
+    value = req.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise BadRequest(f"'{key}'는 {minimum} 이상의 정수여야 합니다.")
+    return value
+
+
+def _optional_choice(req: dict, key: str, choices: Any) -> None:
+    value = req.get(key)
+    if value is not None and value not in choices:
+        raise BadRequest(f"'{key}'는 {', '.join(choices)} 중 하나여야 합니다.")
+
+
+def _validate_summarization(req: dict) -> None:
+    _text(req)
+    max_len = _optional_int(req, "max_len")
+    min_len = _optional_int(req, "min_len")
+    if (min_len or 30) > (max_len or 130):
+        raise BadRequest("'min_len'은 'max_len'보다 클 수 없습니다.")
+
+
+def _validate_translation(req: dict) -> None:
+    _text(req)
+    _optional_choice(req, "direction", _TRANSLATORS)
+
+
+def _validate_topic(req: dict) -> None:
+    _text(req)
+    labels = req.get("labels")
+    if labels is not None and (
+        not isinstance(labels, list) or not labels or not all(isinstance(x, str) and x.strip() for x in labels)
+    ):
+        raise BadRequest("'labels'는 비어 있지 않은 문자열 목록이어야 합니다.")
+    _optional_choice(req, "tier", topic_classification.TIERS)
+
+
+def _validate_keywords(req: dict) -> None:
+    _text(req)
+    _optional_int(req, "top_k")
+
+
+def _groups(reqs: list[dict], keys: tuple[str, ...]) -> dict[str, list[int]]:
+    """같은 파라미터를 쓴 요청끼리 묶음 (묶음마다 배치 호출 1회)."""
+    groups: dict[str, list[int]] = {}
+    for i, req in enumerate(reqs):
+        params = json.dumps({k: req.get(k) for k in keys}, sort_keys=True)
+        groups.setdefault(params, []).append(i)
+    return groups
+
+
+def _batched(
+    keys: tuple[str, ...],
+    models: Callable[[dict], tuple[str, ...]],
+    call: Callable[[PipelineRegistry, list[dict], dict], list],
+) -> Callable[[PipelineRegistry, list[dict]], list]:
+    # models(params): 이 파라미터 묶음이 쓰는 PipelineRegistry 항목 (번역 방향 / 주제 분류 tier마다 다름)
+    def runner(pipelines: PipelineRegistry, reqs: list[dict]) -> list:
+        results: list[Any] = [None] * len(reqs)
+        for params, idx in _groups(reqs, keys).items():
+            group = [reqs[i] for i in idx]
+            params = json.loads(params)
+            with pipelines.using(*models(params)):
+                out = call(pipelines, group, params)
+            for i, result in zip(idx, out):
+                results[i] = result
+        return results
+
+    return runner
+
+
+def _per_request(
+    models: tuple[str, ...],
+    call: Callable[[PipelineRegistry, dict], Any],
+) -> Callable[[PipelineRegistry, list[dict]], list]:
+    # 배치 API가 없는 Task: 묶음 안의 요청을 차례로 실행 (모델은 한 번만 가져옴)
+    def runner(pipelines: PipelineRegistry, reqs: list[dict]) -> list:
+        with pipelines.using(*models):
+            return [call(pipelines, req) for req in reqs]
+
+    return runner
+
+
+def _summarize(pipelines: PipelineRegistry, reqs: list[dict], params: dict) -> list:
+    return summarization.summarize_many(
+        pipelines["summarizer"],
+        [r["text"] for r in reqs],
+        max_len=int(params["max_len"] or 130),
+        min_len=int(params["min_len"] or 30),
+    )
+
+
+def _translate(pipelines: PipelineRegistry, reqs: list[dict], params: dict) -> list:
+    translator = pipelines[_TRANSLATORS[params["direction"] or "ko-en"]]
+    return translation.run_translation_many(translator, [r["text"] for r in reqs])
+
+
+def _sentiment(pipelines: PipelineRegistry, reqs: list[dict], params: dict) -> list:
+    return sentiment.run_sentiment_many(pipelines["sentiment"], [r["text"] for r in reqs])
+
+
+def _topic(pipelines: PipelineRegistry, reqs: list[dict], params: dict) -> list:
+    labels = params["labels"] or topic_classification.DEFAULT_LABELS
+    texts = [r["text"] for r in reqs]
+    if params["tier"] == "fast":
+        return topic_classification.run_fast_topic_classification(pipelines["embedder"], texts, labels)
+    return topic_classification.run_topic_classification_many(pipelines["topic_classifier"], texts, labels)
+
+
+def _keywords(pipelines: PipelineRegistry, reqs: list[dict], params: dict) -> list:
+    return keywords.extract_keywords(
+        [r["text"] for r in reqs],
+        top_k=int(params["top_k"] or 10),
+        embedder=pipelines["embedder"],
+    )
+
+
+# task 이름 -> (요청 검증 함수, 요청 목록을 받아 결과 목록을 돌려주는 함수)
+# 검증 함수는 잘못된 요청을 BadRequest(400)로 막아서, 배치 안의 다른 요청까지 다시 실행되지 않게 함
+SERVICE_TASKS: dict[str, tuple[Callable[[dict], Any], Callable[[PipelineRegistry, list[dict]], list]]] = {
+    "summarization": (
+        _validate_summarization,
+        _batched(("max_len", "min_len"), lambda params: ("summarizer",), _summarize),
+    ),
+    "translation": (
+        _validate_translation,
+        _batched(("direction",), lambda params: (_TRANSLATORS[params["direction"] or "ko-en"],), _translate),
+    ),
+    "sentiment": (_text, _batched((), lambda params: ("sentiment",), _sentiment)),
+    "topic_classification": (
+        _validate_topic,
+        _batched(
+            ("labels", "tier"),
+            lambda params: ("embedder",) if params["tier"] == "fast" else ("topic_classifier",),
+            _topic,
+        ),
+    ),
+    "keywords": (_validate_keywords, _batched(("top_k",), lambda params: ("embedder",), _keywords)),
+    "qa": (
+        lambda r: (_text(r, "context"), _text(r, "question")),
+        _per_request(
+            ("qa", "embedder"),
+            lambda p, r: qa.run_qa(p["qa"], r["context"], r["question"], embedder=p["embedder"]),
+        ),
+    ),
+    "similarity": (
+        lambda r: (_text(r, "text_a"), _text(r, "text_b")),
+        _per_request(
+            ("embedder",),
+            lambda p, r: similarity.compute_similarity(p["embedder"], r["text_a"], r["text_b"]),
+        ),
+    ),
+    "grammar_correction": (
+        _text,
+        _per_request(
+            ("grammar_model",),
+            lambda p, r: grammar.run_grammar_correction(p["grammar_model"], r["text"]),
+        ),
+    ),
+}
+
+
+class MicroBatcher:
+    """
+    Task 하나의 요청 큐.
+    첫 요청이 들어오면 max_wait 동안 (또는 max_batch개가 찰 때까지) 더 모은 뒤
+    executor에서 한 번에 실행. 한 Task의 배치는 한 번에 하나씩 실행되고,
+    같은 모델을 쓰는 다른 Task의 배치와는 runner가 잡는 모델 lock(PipelineRegistry.using)으로 순서를 맞춤.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        runner: Callable[[list[dict]], list],
+        executor: ThreadPoolExecutor,
+        max_batch: int,
+        max_wait: float,
+        max_queue: int,
+    ):
+        self.name = name
+        self._runner = runner
+        self._executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self._task: asyncio.Task | None = None
+        self.batches = 0
+        self.requests = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, req: dict) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((req, future))
+        except asyncio.QueueFull:
+            raise QueueFull(self.name) from None
+        return await future
+
+    async def _collect(self) -> list[tuple[dict, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        items = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # 연결이 끊겨 취소된 요청은 실행하지 않음
+        return [(req, fut) for req, fut in items if not fut.cancelled()]
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            if not items:
+                continue
+            reqs = [req for req, _fut in items]
+            try:
+                results = await loop.run_in_executor(self._executor, self._runner, reqs)
+            except Exception as e:
+                if len(items) == 1:
+                    if not items[0][1].done():
+                        items[0][1].set_exception(e)
+                    continue
+                # 배치가 실패하면 요청별로 다시 실행해서 문제가 된 요청만 실패로 돌려줌
+                results = []
+                for req in reqs:
+                    try:
+                        results.append((await loop.run_in_executor(self._executor, self._runner, [req]))[0])
+                    except Exception as item_error:
+                        results.append(item_error)
+            self.batches += 1
+            self.requests += len(items)
+            for (_req, fut), result in zip(items, results):
+                if fut.done():
+                    continue
+                if isinstance(result, Exception):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.qsize(),
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch": round(self.requests / self.batches, 2) if self.batches else None,
+        }
+
+
+class Service:
+    def __init__(
+        self,
+        pipelines: PipelineRegistry,
+        workers: int = 2,
+        max_batch: int = 8,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 64,
+    ):
+        self.pipelines = pipelines
+        # 추론은 이 executor에서만 실행 (동시에 실행되는 배치 수 = workers)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="service-infer")
+        self._batchers = {
+            name: MicroBatcher(
+                name,
+                lambda reqs, runner=runner: runner(self.pipelines, reqs),
+                self._executor,
+                max_batch,
+                max_wait_ms / 1000.0,
+                max_queue,
+            )
+            for name, (_validate, runner) in SERVICE_TASKS.items()
+        }
+
+    def start(self) -> None:
+        for batcher in self._batchers.values():
+            batcher.start()
+
+    async def stop(self) -> None:
+        for batcher in self._batchers.values():
+            await batcher.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def health(self) -> dict:
+        return {
+            "models": self.pipelines.status(),
+            "memory": self.pipelines.memory(),
+            "queues": {name: b.stats() for name, b in self._batchers.items()},
+        }
+
+    async def handle(self, method: str, path: str, body: bytes) -> tuple[int, Any]:
+        """(status code, JSON으로 보낼 객체)"""
+        path = path.split("?", 1)[0].strip("/")
+        if path == "health":
+            if method != "GET":
+                return 405, {"error": "GET만 지원합니다."}
+            return 200, self.health()
+
+        if path not in SERVICE_TASKS:
+            return 404, {"error": f"알 수 없는 Task: {path}", "tasks": list(SERVICE_TASKS)}
+        if method != "POST":
+            return 405, {"error": "POST만 지원합니다."}
+
+        try:
+            req = json.loads(body.decode("utf-8") or "{}")
+            if not isinstance(req, dict):
+                raise BadRequest("JSON 객체가 필요합니다.")
+            SERVICE_TASKS[path][0](req)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return 400, {"error": f"JSON을 읽지 못했습니다: {e}"}
+        except BadRequest as e:
+            return 400, {"error": str(e)}
+
+        try:
+            result = await self._batchers[path].submit(req)
+        except QueueFull:
+            return 429, {"error": f"{path} 요청 큐가 가득 찼습니다. 잠시 후 다시 시도하세요."}
+        except Exception as e:
+            return 500, {"error": str(e)}
+        return 200, {"result": result}
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) < 2:
+        raise BadRequest("잘못된 요청 줄입니다.")
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0") or 0)
+    if length > _MAX_BODY_BYTES:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b""
+    return parts[0].upper(), parts[1], headers, body
+
+
+def _encode_response(status: int, payload: Any, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+    )
+    if status == 429:
+        head += "Retry-After: 1\r\n"
+    return (head + "\r\n").encode("latin-1") + body
+
+
+async def _serve_connection(service: Service, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except OverflowError:
+                writer.write(_encode_response(413, {"error": "요청 본문이 너무 큽니다."}, False))
+                break
+            except (BadRequest, ValueError):
+                writer.write(_encode_response(400, {"error": "HTTP 요청을 읽지 못했습니다."}, False))
+                break
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+            status, payload = await service.handle(method, path, body)
+            writer.write(_encode_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service: Service, host: str, port: int) -> None:
+    service.start()
+    server = await asyncio.start_server(
+        lambda r, w: _serve_connection(service, r, w), host, port
+    )
+    print(f"[INFO] StudyTextLab service: http://{host}:{port}  (Task: {', '.join(SERVICE_TASKS)})", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="main.py service",
+        description="NLP Task를 로컬 HTTP JSON API로 제공합니다.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("STUDYTEXTLAB_SERVICE_WORKERS", 2)),
+        help="동시에 실행할 추론 배치 수 (기본: 2)",
+    )
+    parser.add_argument("--max-batch", type=int, default=8, help="한 번에 묶을 최대 요청 수 (기본: 8)")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="배치를 모으려고 기다릴 최대 시간 (기본: 10ms)")
+    parser.add_argument("--max-queue", type=int, default=64, help="Task별 대기 요청 한도, 넘으면 429 (기본: 64)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    pipelines = PipelineRegistry()
+    pipelines.start_prewarm(prewarm_order_from_env())
+    service = Service(
+        pipelines,
+        workers=args.workers,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# StudyTextLab - Speculative Precompute
+#
+# 텍스트를 불러온 뒤 사용자가 메뉴를 고르는 동안, 자주 쓰는 가벼운 Task를 백그라운드에서 미리 실행해
+# 결과 캐시에 넣어 둠. 같은 Task를 고르면 캐시에서 바로 결과가 나옴.
+# - STUDYTEXTLAB_SPECULATE=1 이면 기본 목록, "sentiment,keywords" 처럼 Task 목록을 줄 수도 있음. 기본은 꺼짐.
+# - 텍스트가 바뀌면 아직 시작하지 않은 작업은 취소.
+#   이미 실행 중인 모델 호출은 끝까지 가지만, 결과 캐시 키가 텍스트 해시라 다른 텍스트 결과와 섞이지 않음.
+# - 사용자가 Task를 고르면 (claim) 그 Task는 미리 실행 목록에서 빼고, 실행 중이면 끝날 때까지 기다림.
+# - 모델은 PipelineRegistry.using()으로 잡고 호출해서 메뉴의 Task와 같은 모델을 동시에 부르지 않음.
+# - 백그라운드 스레드의 우선순위를 낮춤 (Linux). 메모리 한도가 있으면 이미 로드된 모델만 사용.
+# - 결과 캐시가 꺼져 있으면 미리 계산해도 버려지므로 동작하지 않음.
+# - 미리 계산한 결과가 실제로 몇 번 쓰였는지는 결과 캐시가 셈 (stats()의 results_used).
+
+import os
+import threading
+from typing import Any, Callable
+
+from pipelines import PipelineRegistry
+from tasks import keywords
+from tasks import sentiment
+from tasks import summarization
+from tasks import topic_classification
+from tasks.cache import get_cache, speculative
+
+# 스레드 nice 값 (클수록 낮은 우선순위)
+_NICENESS = 10
+
+
+# Task 이름 -> (필요한 모델, 실행 함수)
+# main.py 메뉴와 똑같은 인자로 호출해야 결과 캐시 키가 같아짐
+SPECULATIVE_TASKS: dict[str, tuple[tuple[str, ...], Callable[[PipelineRegistry, str], Any]]] = {
+    "sentiment": (
+        ("sentiment",),
+        lambda p, text: sentiment.run_sentiment(p["sentiment"], text),
+    ),
+    "keywords": (
+        ("embedder",),
+        lambda p, text: keywords.extract_keywords(text, top_k=10, embedder=p["embedder"]),
+    ),
+    # 빠른 주제 분류 (문서 청크 임베딩도 Document에 기억되어 QA / 유사도 검사에서 재사용)
+    "embeddings": (
+        ("embedder",),
+        lambda p, text: topic_classification.run_topic_classification(
+            None, text, tier="fast", embedder=p["embedder"]
+        ),
+    ),
+    "summary": (
+        ("summarizer",),
+        lambda p, text: summarization.run_summarization(p["summarizer"], text, max_len=60, min_len=20),
+    ),
+}
+
+DEFAULT_SPECULATIVE_TASKS = ["sentiment", "keywords", "embeddings", "summary"]
+
+
+def speculative_tasks_from_env() -> list[str]:
+    """
+    STUDYTEXTLAB_SPECULATE 환경 변수에서 미리 실행할 Task 목록을 읽음.
+    예) "1" / "on" 이면 기본 목록, "sentiment,keywords" 이면 그 Task만. 설정이 없으면 빈 목록 (끔).
+    """
+    raw = os.environ.get("STUDYTEXTLAB_SPECULATE", "").strip().lower()
+    if raw in ("", "0", "none", "off", "false"):
+        return []
+    if raw in ("1", "on", "true", "all"):
+        return list(DEFAULT_SPECULATIVE_TASKS)
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+
+def _lower_priority() -> None:
+    # Linux에서는 스레드마다 nice 값이 따로 있음 (다른 OS에서는 무시)
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), _NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+class Speculator:
+    """
+    submit(text)로 받은 텍스트에 대해 tasks를 순서대로 미리 실행하는 백그라운드 스레드 1개.
+    새 텍스트가 들어오거나 cancel()하면 이전 텍스트의 남은 작업은 건너뜀.
+    """
+
+    def __init__(self, pipelines: PipelineRegistry, tasks: list[str] | None = None):
+        self.pipelines = pipelines
+        names = speculative_tasks_from_env() if tasks is None else tasks
+        self.tasks = [name for name in names if name in SPECULATIVE_TASKS]
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._text: str | None = None
+        # 지금 텍스트에서 아직 시작하지 않은 작업
+        self._pending: list[str] = []
+        # 지금 실행 중인 (generation, task)
+        self._running: tuple[int, str] | None = None
+        self._thread: threading.Thread | None = None
+        self.counts = {"submitted": 0, "completed": 0, "claimed": 0, "skipped": 0, "cancelled": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.tasks) and get_cache().enabled
+
+    def submit(self, text: str) -> None:
+        """text로 미리 실행을 시작. 이전 텍스트의 남은 작업은 취소."""
+        if not self.enabled:
+            return
+        if not text or text.isspace():
+            self.cancel()
+            return
+        with self._cond:
+            self._drop_pending()
+            self._generation += 1
+            self._text = text
+            self._pending = list(self.tasks)
+            self.counts["submitted"] += 1
+            self._cond.notify_all()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="speculation", daemon=True)
+                self._thread.start()
+
+    def cancel(self) -> None:
+        """아직 시작하지 않은 작업을 모두 취소 (텍스트가 바뀌거나 지워졌을 때)."""
+        with self._cond:
+            self._drop_pending()
+            self._generation += 1
+            self._text = None
+            self._cond.notify_all()
+
+    def _drop_pending(self) -> None:
+        # self._cond를 잡은 상태에서 호출. 이전 텍스트에서 아직 시작하지 않은 작업을 취소로 셈
+        self.counts["cancelled"] += len(self._pending)
+        self._pending = []
+
+    def claim(self, task: str, timeout: float | None = None) -> None:
+        """
+        사용자가 task를 골랐을 때 호출. 아직 시작하지 않았으면 미리 실행 목록에서 빼고,
+        지금 텍스트로 실행 중이면 끝날 때까지 기다림 (같은 계산을 두 번 하지 않고 캐시에 들어간 결과를 씀).
+        """
+        with self._cond:
+            if task in self._pending:
+                self._pending.remove(task)
+                self.counts["claimed"] += 1
+            self._cond.wait_for(
+                lambda: self._running is None or self._running != (self._generation, task),
+                timeout,
+            )
+
+    def _worker(self) -> None:
+        _lower_priority()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._text is not None)
+                generation, text = self._generation, self._text
+
+            while True:
+                with self._cond:
+                    if generation != self._generation or not self._pending:
+                        break
+                    name = self._pending.pop(0)
+                    self._running = (generation, name)
+                try:
+                    self._run_one(name, text)
+                finally:
+                    with self._cond:
+                        self._running = None
+                        self._cond.notify_all()
+
+            with self._cond:
+                if generation == self._generation:
+                    self._text = None
+
+    def _run_one(self, name: str, text: str) -> None:
+        models, run = SPECULATIVE_TASKS[name]
+        if self.pipelines.budget_bytes is not None and not all(self.pipelines.is_loaded(m) for m in models):
+            # 미리 실행하려고 사용자가 쓰는 모델을 내리지 않음
+            self.counts["skipped"] += 1
+            return
+        try:
+            with self.pipelines.using(*models), speculative():
+                run(self.pipelines, text)
+        except Exception:
+            # 실제로 고르면 그때 다시 실행하면서 오류를 보여 줌
+            self.counts["failed"] += 1
+            return
+        self.counts["completed"] += 1
+
+    def stats(self) -> dict:
+        cache = get_cache()
+        with self._cond:
+            running = self._running[1] if self._running is not None else None
+            counts = dict(self.counts)
+        return {
+            "tasks": self.tasks,
+            "running": running,
+            **counts,
+            "results_stored": cache.speculative_stored,
+            "results_used": cache.speculative_used,
+        }
@@ -0,0 +1,259 @@
+from __future__ import annotations
+import json
+import os
+import re
+import time
+import warnings
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+import numpy as np
+
+if TYPE_CHECKING:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+# torch / transformers / sentence_transformers는 import에 몇 초가 걸리므로
+# 모델을 실제로 만들 때 함수 안에서 읽음 (메뉴와 history 조회는 이 라이브러리 없이 바로 뜸)
+
+# 추론 백엔드
+#   fp32     : 기본 PyTorch eager
+#   int8     : Linear 층 동적 int8 양자화 (CPU 전용). 변환한 모델은 디스크에 저장해 두고 재사용
+#   compiled : torch.compile 로 forward를 컴파일 (지원하지 않는 환경에서는 fp32로 동작)
+BACKENDS = ("fp32", "int8", "compiled")
+_DEFAULT_BACKEND = "fp32"
+
+# Task별 설정 키 (환경 변수: STUDYTEXTLAB_BACKEND_<TASK>, 전체 기본값: STUDYTEXTLAB_BACKEND)
+TASKS = ("qa", "summarization", "translation", "sentiment", "topic_classification", "grammar_correction", "embedder")
+
+_CACHE_DIR = Path(os.environ.get("STUDYTEXTLAB_CACHE_DIR") or Path(__file__).resolve().parent.parent.parent / "cache")
+QUANTIZED_DIR = _CACHE_DIR / "quantized"
+
+_overrides: Dict[str, str] = {}
+
+
+def set_backend(task: str, backend: str) -> None:
+    """이후 로드되는 task 모델의 백엔드를 지정 (이미 로드된 모델에는 영향 없음)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 백엔드입니다: {backend} (가능: {', '.join(BACKENDS)})")
+    _overrides[task] = backend
+
+
+def get_backend(task: str) -> str:
+    backend = (
+        _overrides.get(task)
+        or os.environ.get(f"STUDYTEXTLAB_BACKEND_{task.upper()}")
+        or os.environ.get("STUDYTEXTLAB_BACKEND")
+        or _DEFAULT_BACKEND
+    ).strip().lower()
+    if backend not in BACKENDS:
+        warnings.warn(f"알 수 없는 백엔드 '{backend}' ({task}) - fp32로 실행합니다.")
+        return _DEFAULT_BACKEND
+    return backend
+
+
+def _quantized_path(model_name: str) -> Path:
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+    return QUANTIZED_DIR / f"{safe}.int8.pt"
+
+
+def _quantize(module: torch.nn.Module, model_name: str) -> torch.nn.Module:
+    import torch
+
+    quantized = torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+    path = _quantized_path(model_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    torch.save(quantized, tmp)
+    tmp.replace(path)
+    return quantized
+
+
+def _load_quantized(model_name: str) -> Optional[torch.nn.Module]:
+    path = _quantized_path(model_name)
+    if not path.exists():
+        return None
+    import torch
+
+    try:
+        return torch.load(path, weights_only=False)
+    except Exception as e:
+        warnings.warn(f"저장된 int8 모델을 읽지 못해 다시 변환합니다: {path} ({e})")
+        return None
+
+
+def _compile(module: torch.nn.Module) -> None:
+    # generate()도 self(...)를 거치므로 forward만 바꾸면 생성 모델에도 적용됨
+    import torch
+
+    if not hasattr(torch, "compile"):
+        warnings.warn("torch.compile을 사용할 수 없어 fp32 eager로 실행합니다.")
+        return
+    module.forward = torch.compile(module.forward)
+
+
+def build_pipeline(pipeline_task: str, model_name: str, task: str) -> Any:
+    """
+    task에 설정된 백엔드로 transformers pipeline을 만듦.
+    반환 객체의 inference_backend 속성에 실제 백엔드를 기록 (결과 캐시 키에 사용).
+    """
+    from transformers import pipeline
+
+    backend = get_backend(task)
+    if backend == "int8":
+        model = _load_quantized(model_name)
+        if model is not None:
+            # 변환해 둔 모델이 있으면 fp32 가중치를 읽지 않고 바로 사용
+            pipe = pipeline(pipeline_task, model=model, tokenizer=model_name)
+        else:
+            pipe = pipeline(pipeline_task, model=model_name)
+            pipe.model = _quantize(pipe.model, model_name)
+    else:
+        pipe = pipeline(pipeline_task, model=model_name)
+        if backend == "compiled":
+            _compile(pipe.model)
+    pipe.inference_backend = backend
+    return pipe
+
+
+def build_embedder(model_name: str, task: str = "embedder") -> SentenceTransformer:
+    """task에 설정된 백엔드로 SentenceTransformer를 만듦."""
+    from sentence_transformers import SentenceTransformer
+
+    backend = get_backend(task)
+    if backend == "int8":
+        model = _load_quantized(model_name)
+        if model is None:
+            model = _quantize(SentenceTransformer(model_name, device="cpu"), model_name)
+    else:
+        model = SentenceTransformer(model_name)
+        if backend == "compiled":
+            _compile(model)
+    model.inference_backend = backend
+    return model
+
+
+# ---- 백엔드별 정확도/지연 시간 비교 ----
+
+_SAMPLES = [
+    "The lecture covered the basics of machine learning, including supervised and unsupervised methods. "
+    "Students practiced with linear regression and decision trees in the lab session.",
+    "I really enjoyed the field trip to the science museum. The exhibits were interactive and fun.",
+    "The new tax policy will affect small businesses, and economists disagree about its long-term impact "
+    "on employment and growth.",
+]
+_QUESTION = "What did the students practice?"
+
+
+def _agreement(reference: Any, other: Any) -> float:
+    """fp32 결과와 비교한 일치도: 문자열은 단어 F1, 벡터는 코사인, 그 외는 같으면 1."""
+    if isinstance(reference, str) and isinstance(other, str):
+        a, b = reference.lower().split(), other.lower().split()
+        if not a and not b:
+            return 1.0
+        common = sum(min(a.count(w), b.count(w)) for w in set(a))
+        if common == 0:
+            return 0.0
+        p, r = common / len(b), common / len(a)
+        return 2 * p * r / (p + r)
+    if isinstance(reference, np.ndarray):
+        num = float((reference * other).sum())
+        return num / float(np.linalg.norm(reference) * np.linalg.norm(other) or 1.0)
+    return float(reference == other)
+
+
+def _task_specs() -> Dict[str, Dict[str, Any]]:
+    # 순환 import를 피하려고 비교할 때만 task 모듈을 읽음
+    from . import grammar, qa, sentiment, similarity, summarization, topic_classification, translation
+
+    return {
+        "qa": {
+            "build": lambda: build_pipeline("question-answering", qa._MODEL_NAME, "qa"),
+            "run": lambda p, t: p(question=_QUESTION, context=t)["answer"],
+        },
+        "summarization": {
+            "build": lambda: build_pipeline("summarization", summarization._MODEL_NAME, "summarization"),
+            "run": lambda p, t: p(t, max_length=60, min_length=10, do_sample=False)[0]["summary_text"],
+        },
+        "translation": {
+            "build": lambda: build_pipeline("translation", translation.DIRECTION_MODELS["en-ko"], "translation"),
+            "run": lambda p, t: p(t, truncation=True)[0]["translation_text"],
+        },
+        "sentiment": {
+            "build": lambda: build_pipeline("sentiment-analysis", sentiment._MODEL_NAME, "sentiment"),
+            "run": lambda p, t: p(t)[0]["label"],
+        },
+        "topic_classification": {
+            "build": lambda: build_pipeline(
+                "zero-shot-classification", topic_classification._MODEL_NAME, "topic_classification"
+            ),
+            "run": lambda p, t: p(t, candidate_labels=topic_classification.DEFAULT_LABELS)["labels"][0],
+        },
+        "grammar_correction": {
+            "build": lambda: build_pipeline("text2text-generation", grammar._MODEL_NAME, "grammar_correction"),
+            "run": lambda p, t: p("gec: " + t, max_length=128, do_sample=False)[0]["generated_text"],
+        },
+        "embedder": {
+            "build": lambda: build_embedder(similarity._MODEL_NAME, "embedder"),
+            "run": lambda p, t: np.asarray(p.encode(t, convert_to_numpy=True)),
+        },
+    }
+
+
+def compare_backends(
+    tasks: Optional[List[str]] = None,
+    backends: Optional[List[str]] = None,
+    samples: Optional[List[str]] = None,
+    repeats: int = 3,
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    task마다 각 백엔드로 모델을 새로 만들어 같은 샘플을 실행하고
+    로드 시간, 샘플당 평균 지연 시간, fp32 대비 결과 일치도를 비교.
+    """
+    specs = _task_specs()
+    tasks = tasks or list(specs)
+    backends = backends or list(BACKENDS)
+    samples = samples or _SAMPLES
+    saved = dict(_overrides)
+    report: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    try:
+        for task in tasks:
+            spec = specs[task]
+            reference: Optional[List[Any]] = None
+            report[task] = {}
+            for backend in ["fp32"] + [b for b in backends if b != "fp32"]:
+                set_backend(task, backend)
+                start = time.perf_counter()
+                pipe = spec["build"]()
+                load_time = time.perf_counter() - start
+
+                spec["run"](pipe, samples[0])  # warm-up (compile 등)
+                outputs: List[Any] = []
+                start = time.perf_counter()
+                for _ in range(max(1, repeats)):
+                    outputs = [spec["run"](pipe, s) for s in samples]
+                latency = (time.perf_counter() - start) / (max(1, repeats) * len(samples))
+
+                if reference is None:
+                    reference = outputs
+                report[task][backend] = {
+                    "load_sec": round(load_time, 3),
+                    "latency_ms": round(latency * 1000, 2),
+                    "agreement_vs_fp32": round(
+                        sum(_agreement(r, o) for r, o in zip(reference, outputs)) / len(samples), 3
+                    ),
+                }
+                del pipe
+            fp32_latency = report[task]["fp32"]["latency_ms"]
+            for stats in report[task].values():
+                stats["speedup"] = round(fp32_latency / stats["latency_ms"], 2) if stats["latency_ms"] else None
+    finally:
+        _overrides.clear()
+        _overrides.update(saved)
+    return report
+
+
+if __name__ == "__main__":
+    # src/ 에서: python -m tasks.backends [task ...]
+    import sys
+
+    print(json.dumps(compare_backends(sys.argv[1:] or None), indent=2, ensure_ascii=False))
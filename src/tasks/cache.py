@@ -0,0 +1,356 @@
+from __future__ import annotations
+import contextvars
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from . import instrumentation
+from .document import Document
+
+# 메모리 LRU 기본 크기. STUDYTEXTLAB_CACHE_SIZE=0 이면 캐시를 쓰지 않음
+_DEFAULT_MAX_ENTRIES = 256
+# 청크별 결과 캐시 크기 (STUDYTEXTLAB_CHUNK_CACHE_SIZE). 문서 하나가 청크 수백 개가 될 수 있어 더 크게 둠
+_DEFAULT_CHUNK_ENTRIES = 8192
+
+# speculative() 블록 안에서 저장한 결과는 "미리 계산한 결과"로 표시해 두고, 나중에 실제로 쓰였는지 셈
+_speculative: contextvars.ContextVar[bool] = contextvars.ContextVar("studytextlab_speculative", default=False)
+
+
+@contextmanager
+def speculative() -> Iterator[None]:
+    token = _speculative.set(True)
+    try:
+        yield
+    finally:
+        _speculative.reset(token)
+
+
+def normalize_text(text: str) -> str:
+    """캐시 키용 정규화: 줄바꿈 통일 + 유니코드 NFC + 앞뒤 공백 제거."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def text_hash(text: str) -> str:
+    if isinstance(text, Document):
+        # 같은 Document로 여러 Task를 실행하면 정규화 + 해시를 한 번만 계산
+        return text.memo(("text_hash",), lambda: _sha256(normalize_text(text)))
+    return _sha256(normalize_text(text))
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_name_of(obj: Any) -> str:
+    """
+    pipeline / SentenceTransformer 등에서 모델 이름을 찾아 반환.
+    fp32가 아닌 백엔드로 만든 모델은 "이름@백엔드" (예: ...-ko-en@int8).
+    """
+    name = _base_model_name(obj)
+    backend = getattr(obj, "inference_backend", "fp32")
+    return name if backend == "fp32" else f"{name}@{backend}"
+
+
+def _base_model_name(obj: Any) -> str:
+    model = getattr(obj, "model", None)
+    name = getattr(model, "name_or_path", None)
+    if name:
+        return str(name)
+    first = getattr(obj, "_first_module", None)
+    if callable(first):
+        try:
+            name = first().auto_model.name_or_path
+        except Exception:
+            name = None
+        if name:
+            return str(name)
+    return type(obj).__name__
+
+
+def make_key(task: str, model_name: str, params: Dict[str, Any], texts: Dict[str, Any]) -> str:
+    """texts 값은 문자열 또는 문자열 목록 (목록이면 항목별로 해시)."""
+    payload = {
+        "task": task,
+        "model": model_name,
+        "params": params,
+        "texts": {
+            k: text_hash(v) if isinstance(v, str) else [text_hash(x or "") for x in v]
+            for k, v in texts.items()
+        },
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Task 결과 캐시.
+    메모리 LRU(max_entries) + (선택) sqlite 디스크 계층으로 구성.
+    """
+
+    def __init__(self, max_entries: int = _DEFAULT_MAX_ENTRIES, disk_path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._mem: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # 미리 계산해서 저장했지만 아직 쓰이지 않은 키 / 저장한 수 / 실제로 쓰인 수
+        self._speculative_keys: set[str] = set()
+        self.speculative_stored = 0
+        self.speculative_used = 0
+        if disk_path is not None:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(disk_path), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """(찾았는지, 값). 값은 복사본을 돌려줌."""
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                self._mark_used(key)
+                return True, copy.deepcopy(self._mem[key])
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._mark_used(key)
+                    return True, copy.deepcopy(value)
+
+            self.misses += 1
+            return False, None
+
+    def _mark_used(self, key: str) -> None:
+        # 미리 계산한 결과를 사용자 요청이 처음 꺼내 간 경우만 셈
+        if key in self._speculative_keys and not _speculative.get():
+            self._speculative_keys.discard(key)
+            self.speculative_used += 1
+            instrumentation.count("speculative_hits")
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Sequence[tuple[str, Any]]) -> None:
+        """여러 결과를 저장 (디스크에는 한 번의 commit으로). JSON으로 바꿀 수 없는 값은 메모리에만 둠."""
+        with self._lock:
+            rows = []
+            for key, value in items:
+                self._remember(key, copy.deepcopy(value))
+                if _speculative.get() and key not in self._speculative_keys:
+                    self._speculative_keys.add(key)
+                    self.speculative_stored += 1
+                if self._db is not None:
+                    try:
+                        rows.append((key, json.dumps(value, ensure_ascii=False)))
+                    except (TypeError, ValueError):
+                        continue
+            if rows:
+                self._db.executemany("INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)", rows)
+                self._db.commit()
+
+    def _remember(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._speculative_keys.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._mem),
+            "max_entries": self.max_entries,
+            "disk": str(self.disk_path) if self.disk_path else None,
+            "speculative_stored": self.speculative_stored,
+            "speculative_used": self.speculative_used,
+        }
+
+
+def _cache_from_env() -> ResultCache:
+    size = int(os.environ.get("STUDYTEXTLAB_CACHE_SIZE", _DEFAULT_MAX_ENTRIES))
+    disk_dir = os.environ.get("STUDYTEXTLAB_CACHE_DIR")
+    disk_path = Path(disk_dir) / "results.sqlite3" if disk_dir else None
+    return ResultCache(max_entries=size, disk_path=disk_path)
+
+
+def _chunk_cache_from_env() -> ResultCache:
+    # 결과 캐시를 끄면 (STUDYTEXTLAB_CACHE_SIZE=0) 청크 캐시도 기본으로 끔
+    default = _DEFAULT_CHUNK_ENTRIES if int(os.environ.get("STUDYTEXTLAB_CACHE_SIZE", 1)) > 0 else 0
+    size = int(os.environ.get("STUDYTEXTLAB_CHUNK_CACHE_SIZE", default))
+    disk_dir = os.environ.get("STUDYTEXTLAB_CACHE_DIR")
+    disk_path = Path(disk_dir) / "chunks.sqlite3" if disk_dir else None
+    return ResultCache(max_entries=size, disk_path=disk_path)
+
+
+_cache: Optional[ResultCache] = None
+_chunk_cache: Optional[ResultCache] = None
+
+
+def get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = _cache_from_env()
+    return _cache
+
+
+def get_chunk_cache() -> ResultCache:
+    global _chunk_cache
+    if _chunk_cache is None:
+        _chunk_cache = _chunk_cache_from_env()
+    return _chunk_cache
+
+
+def configure_cache(
+    max_entries: int = _DEFAULT_MAX_ENTRIES,
+    disk_dir: Optional[Path] = None,
+    chunk_entries: Optional[int] = None,
+) -> ResultCache:
+    """
+    기본 캐시(와 청크 캐시)를 새 설정으로 교체.
+    chunk_entries가 None이면 max_entries가 0일 때 청크 캐시도 끄고, 아니면 기본 크기.
+    """
+    global _cache, _chunk_cache
+    if chunk_entries is None:
+        chunk_entries = _DEFAULT_CHUNK_ENTRIES if max_entries > 0 else 0
+    _cache = ResultCache(
+        max_entries=max_entries,
+        disk_path=Path(disk_dir) / "results.sqlite3" if disk_dir else None,
+    )
+    _chunk_cache = ResultCache(
+        max_entries=chunk_entries,
+        disk_path=Path(disk_dir) / "chunks.sqlite3" if disk_dir else None,
+    )
+    return _cache
+
+
+def cached_map(
+    task: str,
+    model_name: str,
+    params: Dict[str, Any],
+    chunks: Sequence[str],
+    compute: Callable[[List[str]], Sequence[Any]],
+) -> List[Any]:
+    """
+    청크(문장, window 등)별 결과를 청크 캐시에서 찾고, 없는 청크만 모아 compute(청크 목록)로 한 번에 계산.
+    키는 청크 내용의 해시라서, 문서를 고쳐 다시 실행하면 바뀌지 않은 청크(위치가 밀린 청크 포함)는 재사용되고
+    새로 계산하는 양은 고친 양에 비례함. 같은 내용의 청크는 한 번만 계산.
+    재사용/계산한 청크 수는 실행 중인 trace의 chunks_reused / chunks_computed 카운터로 기록.
+    """
+    cache = get_chunk_cache()
+    if not cache.enabled:
+        instrumentation.count("chunks_computed", len(chunks))
+        return list(compute(list(chunks)))
+
+    results: List[Any] = [None] * len(chunks)
+    pending: Dict[str, List[int]] = {}
+    for i, chunk in enumerate(chunks):
+        key = make_key(task, model_name, params, {"text": chunk})
+        if key in pending:
+            pending[key].append(i)
+            continue
+        found, value = cache.get(key)
+        if found:
+            results[i] = value
+        else:
+            pending[key] = [i]
+
+    instrumentation.count("chunks_reused", len(chunks) - sum(len(idx) for idx in pending.values()))
+    instrumentation.count("chunks_computed", len(pending))
+    if pending:
+        todo = [chunks[idx[0]] for idx in pending.values()]
+        values = list(compute(todo))
+        for idx, value in zip(pending.values(), values):
+            for i in idx:
+                results[i] = value
+        cache.put_many(list(zip(pending, values)))
+    return results
+
+
+def cached(
+    task: str,
+    text_args: Iterable[str],
+    model_arg: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> Callable:
+    """
+    Task 함수 앞에 결과 캐시를 두는 데코레이터.
+    키 = task + 모델 이름(model_arg 객체 또는 model_name) + 나머지 인자 + 정규화한 text_args 해시.
+    pipeline 같은 객체 인자는 모델 이름으로 바꿔 키에 넣음.
+    """
+    text_args = tuple(text_args)
+
+    def decorator(fn: Callable) -> Callable:
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            cache = get_cache()
+            if not cache.enabled:
+                return fn(*args, **kwargs)
+
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            texts: Dict[str, Any] = {}
+            params: Dict[str, Any] = {}
+            name = model_name or ""
+            for arg, value in bound.arguments.items():
+                if arg in text_args:
+                    texts[arg] = value or ""
+                elif arg == model_arg:
+                    name = model_name_of(value)
+                elif value is None or isinstance(value, (str, int, float, bool)):
+                    params[arg] = value
+                elif isinstance(value, (list, tuple)) and all(isinstance(v, (str, int, float)) for v in value):
+                    params[arg] = list(value)
+                else:
+                    params[arg] = model_name_of(value)
+
+            key = make_key(task, name, params, texts)
+            found, value = cache.get(key)
+            if found:
+                instrumentation.count("cache_hits")
+                return value
+            result = fn(*args, **kwargs)
+            cache.put(key, result)
+            return result
+
+        return wrapper
+
+    return decorator
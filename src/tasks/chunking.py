@@ -0,0 +1,141 @@
+from __future__ import annotations
+import re
+import zlib
+from typing import Any, List, Optional, Sequence, Tuple
+
+Span = Tuple[int, int]
+
+# 문장 끝(. ! ? 。 등) 뒤 공백, 또는 줄바꿈에서 문장을 나눔
+_SENTENCE_END = re.compile(r"(?<=[.!?。？！])\s+|\n+")
+
+
+def sentence_spans(text: str) -> List[Span]:
+    """text 안의 문장 위치 (start, end) 목록. 공백만 있는 구간은 제외."""
+    spans: List[Span] = []
+    pos = 0
+    for m in _SENTENCE_END.finditer(text):
+        _add_span(text, pos, m.start(), spans)
+        pos = m.end()
+    _add_span(text, pos, len(text), spans)
+    return spans
+
+
+def _add_span(text: str, start: int, end: int, spans: List[Span]) -> None:
+    # 앞뒤 공백을 제외한 실제 문장 범위만 기록
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        spans.append((start, end))
+
+
+def split_with_separators(text: str, spans: Optional[Sequence[Span]] = None) -> Tuple[List[str], List[str]]:
+    """
+    text를 문장 목록과, 문장 사이 구분자 목록으로 나눔.
+    원문의 빈 줄(문단 구분)과 줄바꿈은 구분자로 보존해서, 문장별로 처리한 뒤 다시 합칠 수 있음.
+    spans: 이미 계산한 sentence_spans(text) (없으면 여기서 계산)
+    """
+    if spans is None:
+        spans = sentence_spans(text)
+    seps: List[str] = []
+    for (_s, prev_end), (next_start, _e) in zip(spans, spans[1:]):
+        newlines = text[prev_end:next_start].count("\n")
+        seps.append("\n\n" if newlines >= 2 else "\n" if newlines == 1 else " ")
+    return [text[s:e] for s, e in spans], seps
+
+
+def join_with_separators(parts: Sequence[str], seps: Sequence[str]) -> str:
+    """split_with_separators의 반대. parts는 문장 수만큼."""
+    joined = list(parts[:1])
+    for sep, part in zip(seps, parts[1:]):
+        joined += [sep, part]
+    return "".join(joined)
+
+
+def token_lengths(tokenizer: Any, pieces: Sequence[str]) -> List[int]:
+    """각 조각의 토큰 수 (special token 제외). 한 번의 배치 호출로 계산."""
+    if not pieces:
+        return []
+    enc = tokenizer(list(pieces), add_special_tokens=False)
+    return [len(ids) for ids in enc["input_ids"]]
+
+
+def _split_long_span(text: str, span: Span, n_tokens: int, max_tokens: int) -> List[Tuple[Span, int]]:
+    # 한 문장이 max_tokens를 넘으면 단어 경계에서 거의 같은 크기로 다시 나눔
+    start, end = span
+    words = [(m.start() + start, m.end() + start) for m in re.finditer(r"\S+", text[start:end])]
+    parts = -(-n_tokens // max_tokens)
+    per_part = -(-len(words) // parts)
+    out = []
+    for i in range(0, len(words), per_part):
+        group = words[i:i + per_part]
+        tokens = -(-n_tokens * len(group) // len(words))
+        out.append(((group[0][0], group[-1][1]), tokens))
+    return out
+
+
+def split_long_spans(
+    text: str,
+    spans: Sequence[Span],
+    lengths: Sequence[int],
+    max_tokens: int,
+) -> List[Tuple[Span, int]]:
+    """max_tokens를 넘는 문장만 단어 경계에서 나눈 (span, 토큰 수) 목록."""
+    items: List[Tuple[Span, int]] = []
+    for span, n in zip(spans, lengths):
+        if n > max_tokens:
+            items.extend(_split_long_span(text, span, n, max_tokens))
+        else:
+            items.append((span, n))
+    return items
+
+
+def _is_anchor(text: str, span: Span, anchor_every: int) -> bool:
+    # 프로세스마다 바뀌는 hash() 대신 crc32를 써서 실행할 때마다 같은 문장이 anchor가 되게 함
+    return zlib.crc32(text[span[0]:span[1]].encode("utf-8")) % anchor_every == 0
+
+
+def pack_spans(
+    text: str,
+    spans: Sequence[Span],
+    lengths: Sequence[int],
+    max_tokens: int,
+    overlap_tokens: int = 0,
+    anchor_every: int = 0,
+) -> List[Span]:
+    """
+    연속된 문장들을 max_tokens 이하의 청크로 묶음.
+    overlap_tokens 만큼 이전 청크의 마지막 문장들을 다음 청크 앞에 다시 포함.
+
+    anchor_every > 0 이면 청크 경계를 내용으로 정함 (content-defined chunking):
+    문장 해시가 anchor_every로 나누어떨어지는 문장(평균 anchor_every 문장마다 하나) 뒤에서,
+    청크가 max_tokens / 4 이상이면 끊음. 문서 앞부분을 고쳐도 그 뒤의 경계는 다음 anchor부터
+    예전과 같아지므로, 고친 곳 근처 청크만 내용이 바뀜 (청크별 결과 캐시를 재사용할 수 있음).
+    """
+    items = split_long_spans(text, spans, lengths, max_tokens)
+    min_tokens = max_tokens // 4
+
+    chunks: List[Span] = []
+    current: List[Tuple[Span, int]] = []
+    current_tokens = 0
+    cut = False
+    for item in items:
+        if current and (cut or current_tokens + item[1] > max_tokens):
+            chunks.append((current[0][0][0], current[-1][0][1]))
+            # 다음 청크 앞에 겹쳐 넣을 문장들
+            carry: List[Tuple[Span, int]] = []
+            carry_tokens = 0
+            for prev in reversed(current):
+                if carry_tokens + prev[1] > overlap_tokens or carry_tokens + prev[1] + item[1] > max_tokens:
+                    break
+                carry.insert(0, prev)
+                carry_tokens += prev[1]
+            current, current_tokens = carry, carry_tokens
+        current.append(item)
+        current_tokens += item[1]
+        cut = anchor_every > 0 and current_tokens >= min_tokens and _is_anchor(text, item[0], anchor_every)
+    if current:
+        chunks.append((current[0][0][0], current[-1][0][1]))
+    return chunks
+
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from .chunking import Span, pack_spans, sentence_spans, token_lengths
+
+# Document.embed 기본 배치 크기
+_ENCODE_BATCH = 64
+
+
+def tokenizer_key(tokenizer: Any) -> str:
+    """같은 토크나이저 파일이면 모델을 다시 로드해도 같은 키."""
+    name = getattr(tokenizer, "name_or_path", None)
+    return str(name) if name else f"{type(tokenizer).__name__}@{id(tokenizer)}"
+
+
+def embedder_key(embedder: Any) -> str:
+    from .cache import model_name_of  # cache가 이 모듈을 import하므로 여기서 읽음
+
+    return model_name_of(embedder)
+
+
+class Document(str):
+    """
+    분석할 텍스트 1개. 일반 문자열처럼 모든 Task에 그대로 넘길 수 있고,
+    전처리 결과는 처음 필요할 때 계산해서 기억해 둠.
+      - 문장 위치 (sentence_spans)
+      - 토크나이저별 문장 토큰 수 / 전체 토큰 수
+      - (토크나이저, 최대 토큰 수, overlap)별 청크 위치
+      - (embedder, 정규화 여부)별 구간 임베딩
+      - 결과 캐시 키용 텍스트 해시
+    같은 Document로 여러 Task를 실행하면 이 계산을 다시 하지 않음.
+    슬라이스나 + 연산 결과는 일반 str이므로 기억한 값이 섞이지 않음.
+    """
+
+    source: Optional[str]
+
+    def __new__(cls, text: str = "", source: Optional[str] = None) -> "Document":
+        doc = super().__new__(cls, text)
+        doc.source = source
+        doc._memo = {}
+        doc._lock = threading.Lock()
+        doc.memo_hits = 0
+        doc.memo_misses = 0
+        return doc
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # 복사 / pickle 시에는 텍스트와 출처만 넘김 (기억한 값과 lock 제외)
+        return (Document, (str(self), self.source))
+
+    def memo(self, key: Tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+        """key에 기억한 값을 돌려주고, 없으면 compute()로 계산해서 기억."""
+        with self._lock:
+            if key in self._memo:
+                self.memo_hits += 1
+                return self._memo[key]
+        value = compute()
+        with self._lock:
+            # 다른 스레드가 먼저 계산했으면 그 값을 사용
+            if key in self._memo:
+                return self._memo[key]
+            self.memo_misses += 1
+            self._memo[key] = value
+        return value
+
+    def memo_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for key in self._memo:
+                kinds[key[0]] = kinds.get(key[0], 0) + 1
+            return {"hits": self.memo_hits, "misses": self.memo_misses, "entries": kinds}
+
+    def strip(self, chars: Optional[str] = None) -> str:
+        # Task들이 (text or "").strip()을 하므로, 앞뒤 공백이 없으면 자기 자신을 돌려줘서 기억한 값을 유지
+        if chars is not None:
+            return str.strip(self, chars)
+        return self.memo(("strip",), self._stripped)
+
+    def _stripped(self) -> "Document":
+        stripped = str.strip(self)
+        return self if len(stripped) == len(self) else Document(stripped, self.source)
+
+    # ---- 전처리 ----
+
+    def sentence_spans(self) -> Sequence[Span]:
+        return self.memo(("sentence_spans",), lambda: tuple(sentence_spans(self)))
+
+    def sentence_token_lengths(self, tokenizer: Any) -> Sequence[int]:
+        """문장별 토큰 수. 토크나이저가 None이면 단어 수."""
+        def compute() -> Tuple[int, ...]:
+            pieces = [self[s:e] for s, e in self.sentence_spans()]
+            if tokenizer is None:
+                return tuple(len(p.split()) for p in pieces)
+            return tuple(token_lengths(tokenizer, pieces))
+
+        key = tokenizer_key(tokenizer) if tokenizer is not None else None
+        return self.memo(("sentence_token_lengths", key), compute)
+
+    def token_count(self, tokenizer: Any) -> int:
+        """전체 텍스트의 토큰 수 (special token 제외)."""
+        return self.memo(
+            ("token_count", tokenizer_key(tokenizer)),
+            lambda: len(tokenizer(str(self), add_special_tokens=False)["input_ids"]),
+        )
+
+    def chunk_spans(
+        self,
+        tokenizer: Any,
+        max_tokens: int,
+        overlap_tokens: int = 0,
+        anchor_every: int = 0,
+    ) -> Sequence[Span]:
+        """
+        문장 경계 기준, max_tokens 이하의 (겹치는) 청크 위치. 토크나이저가 None이면 단어 수로 셈.
+        anchor_every > 0 이면 내용 기준 경계 (chunking.pack_spans 참고).
+        """
+        def compute() -> Tuple[Span, ...]:
+            spans = self.sentence_spans()
+            lengths = self.sentence_token_lengths(tokenizer)
+            return tuple(pack_spans(self, spans, lengths, max_tokens, overlap_tokens, anchor_every))
+
+        key = tokenizer_key(tokenizer) if tokenizer is not None else None
+        return self.memo(("chunk_spans", key, max_tokens, overlap_tokens, anchor_every), compute)
+
+    def chunks(self, tokenizer: Any, max_tokens: int, overlap_tokens: int = 0, anchor_every: int = 0) -> List[str]:
+        return [self[s:e] for s, e in self.chunk_spans(tokenizer, max_tokens, overlap_tokens, anchor_every)]
+
+    def embed(
+        self,
+        embedder: Any,
+        spans: Optional[Sequence[Span]] = None,
+        normalize: bool = True,
+        batch_size: int = _ENCODE_BATCH,
+    ) -> np.ndarray:
+        """spans 구간(없으면 전체 텍스트)의 임베딩 (구간 수, dim). 이미 계산한 구간은 다시 계산하지 않음."""
+        return encode_spans(embedder, [(self, spans)], normalize=normalize, batch_size=batch_size)[0]
+
+    def _vectors(self, embedder: Any, normalize: bool) -> Dict[Span, np.ndarray]:
+        return self.memo(("embeddings", embedder_key(embedder), normalize), dict)
+
+
+def as_document(text: Any, source: Optional[str] = None) -> Document:
+    """Document는 그대로, 일반 문자열(또는 None)은 새 Document로 감싸서 반환."""
+    if isinstance(text, Document):
+        return text
+    return Document(text or "", source)
+
+
+def encode_spans(
+    embedder: Any,
+    items: Sequence[Tuple[Any, Optional[Sequence[Span]]]],
+    normalize: bool = True,
+    batch_size: int = _ENCODE_BATCH,
+) -> List[np.ndarray]:
+    """
+    여러 (텍스트, spans) 쌍의 구간 임베딩을 계산. spans가 None이면 텍스트 전체 한 구간.
+    Document마다 아직 계산하지 않은 구간만 모아 한 번의 배치 호출로 임베딩하고, 결과를 Document에 기억함.
+    """
+    docs = [as_document(text) for text, _spans in items]
+    wanted = [
+        [tuple(span) for span in spans] if spans is not None else [(0, len(doc))]
+        for doc, (_text, spans) in zip(docs, items)
+    ]
+    stores = [doc._vectors(embedder, normalize) for doc in docs]
+
+    missing: List[Tuple[int, Span]] = []
+    seen = set()
+    for i, (spans, store) in enumerate(zip(wanted, stores)):
+        for span in spans:
+            if span not in store and (id(store), span) not in seen:
+                seen.add((id(store), span))
+                missing.append((i, span))
+
+    if missing:
+        vectors = embedder.encode(
+            [docs[i][s:e] for i, (s, e) in missing],
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+        )
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for (i, span), vector in zip(missing, vectors):
+            stores[i][span] = vector
+
+    out: List[np.ndarray] = []
+    for spans, store in zip(wanted, stores):
+        if spans:
+            out.append(np.stack([store[span] for span in spans]))
+        else:
+            dim = next(iter(store.values())).shape[0] if store else 0
+            out.append(np.zeros((0, dim), dtype=np.float32))
+    return out
@@ -1,23 +1,89 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
-from transformers import pipeline
+import re
+from typing import Any, Dict, List, Optional
 
+from .backends import build_pipeline
+from .cache import cached, cached_map, model_name_of
+from .chunking import join_with_separators, split_with_separators
+from .document import as_document
+from .instrumentation import count, stage
+
+_MODEL_NAME = "prithivida/grammar_error_correcter_v1"
 _model: Optional[Any] = None
 
+_BATCH_SIZE = 16
+
+_HAS_LETTER = re.compile(r"[A-Za-z]")
+
 
-def load_grammar_model(model_name: str = "prithivida/grammar_error_correcter_v1") -> Any:
+def load_grammar_model(model_name: str = _MODEL_NAME) -> Any:
     global _model
     if _model is None:
-        _model = pipeline("text2text-generation", model=model_name)
+        _model = build_pipeline("text2text-generation", model_name, task="grammar_correction")
     return _model
 
 
-def run_grammar_correction(grammar_model: Any, text: str) -> Dict:
-    text = (text or "").strip()
+def unload_grammar_model() -> None:
+    # 문장별 교정 결과는 (모델 이름, 문장) 기준으로 청크 캐시에 있으므로 다시 로드해도 그대로 유효
+    global _model
+    _model = None
+
+
+def _correct_batch(grammar_model: Any, sentences: List[str], batch_size: int) -> List[str]:
+    out_all: List[str] = []
+    for b in range(0, len(sentences), max(1, batch_size)):
+        batch = sentences[b:b + max(1, batch_size)]
+        max_length = max(32, max(len(s.split()) for s in batch) * 2)
+        with stage("generate"):
+            out = grammar_model(
+                ["gec: " + s for s in batch],
+                max_length=max_length,
+                do_sample=False,
+                batch_size=len(batch),
+            )
+        for o in out:
+            # text2text pipeline은 입력마다 list[dict] 또는 dict를 돌려줌
+            o = o[0] if isinstance(o, list) and o else o
+            out_all.append((o.get("generated_text", "") if isinstance(o, dict) else "").strip())
+    return out_all
+
+
+@cached("grammar_correction", text_args=("text",), model_arg="grammar_model")
+def run_grammar_correction(grammar_model: Any, text: str, batch_size: int = _BATCH_SIZE) -> Dict:
+    """
+    문장 단위로 배치 교정.
+    - 영문자가 없는 문장, 이전에 교정해 본 문장은 모델에 넣지 않음 (청크 캐시 재사용)
+    - 결과: 합친 교정문 + 바뀐 문장 목록(edits)
+    """
+    text = as_document(text).strip()
     if not text:
-        return {"original": "", "corrected": ""}
+        return {"original": "", "corrected": "", "edits": []}
+
+    sentences, seps = split_with_separators(text, text.sentence_spans())
+    # 교정 결과가 원문과 같으면 "이미 깨끗한 문장"으로 캐시됨
+    idx = [i for i, sentence in enumerate(sentences) if _HAS_LETTER.search(sentence)]
+    checked: List[str] = []
+
+    def correct(todo: List[str]) -> List[str]:
+        checked.extend(todo)
+        return [fixed or s for s, fixed in zip(todo, _correct_batch(grammar_model, todo, batch_size))]
+
+    final = list(sentences)
+    fixed = cached_map("grammar_sentence", model_name_of(grammar_model), {}, [sentences[i] for i in idx], correct)
+    for i, f in zip(idx, fixed):
+        final[i] = f
 
-    prompt = "gec: " + text
-    out = grammar_model(prompt, max_length=max(32, len(text.split()) * 2), do_sample=False)
-    corrected = (out[0].get("generated_text", "") if out else "").strip()
-    return {"original": text, "corrected": corrected}
+    count("sentences", len(sentences))
+    count("sentences_checked", len(checked))
+    edits = [
+        {"index": i, "original": s, "corrected": c}
+        for i, (s, c) in enumerate(zip(sentences, final))
+        if s != c
+    ]
+    return {
+        "original": str(text),
+        "corrected": join_with_separators(final, seps),
+        "edits": edits,
+        "sentences": len(sentences),
+        "checked": len(checked),
+    }
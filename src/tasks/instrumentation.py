@@ -0,0 +1,224 @@
+from __future__ import annotations
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# STUDYTEXTLAB_PROFILE=1 이면 실행마다 cProfile 결과(.prof)를 profiles/ 에 저장.
+# 경로를 주면 그 폴더에 저장. (snakeviz, flameprof 등으로 flame graph를 볼 수 있음)
+PROFILE_DIR = Path(__file__).resolve().parent.parent.parent / "profiles"
+
+_MB = 1024 * 1024
+
+_current: contextvars.ContextVar[Optional["RunTrace"]] = contextvars.ContextVar("studytextlab_trace", default=None)
+
+
+def profile_dir_from_env() -> Optional[Path]:
+    raw = os.environ.get("STUDYTEXTLAB_PROFILE", "").strip()
+    if raw.lower() in ("", "0", "off", "false", "none"):
+        return None
+    if raw.lower() in ("1", "on", "true", "yes"):
+        return PROFILE_DIR
+    return Path(raw)
+
+
+def _rss_bytes() -> Optional[int]:
+    # 현재 RSS (Linux /proc). 다른 OS에서는 None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 byte 단위
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _delta_mb(before: Optional[int], after: Optional[int]) -> Optional[float]:
+    if before is None or after is None:
+        return None
+    return round((after - before) / _MB, 1)
+
+
+def _output_length(result: Any) -> int:
+    if isinstance(result, str):
+        return len(result)
+    try:
+        return len(json.dumps(result, ensure_ascii=False, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class RunTrace:
+    """Task 실행 1회의 단계별 시간, 카운터, 메모리 변화."""
+
+    def __init__(self, task: str, model: Any = None):
+        self.task = task
+        self.model: Optional[str] = None
+        # 입력 토큰 수를 셀 때 쓸 모델 객체 (tokenizer)
+        self._model_obj: Any = None
+        self.set_model(model)
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.wall_time: Optional[float] = None
+        self.input_tokens: Optional[int] = None
+        self.output_length: Optional[int] = None
+        self.memory: Dict[str, Optional[float]] = {}
+        self.profile_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def set_model(self, model: Any) -> Any:
+        """
+        실행에 쓴 모델을 기록하고 그대로 돌려줌.
+        trace 블록 안에서 pipelines[...]를 가져오면서 부르면 처음 로드하는 시간도 model_load 단계로 잡힘.
+        """
+        from .cache import model_name_of  # cache가 이 모듈을 import하므로 여기서 읽음
+
+        if model is not None and not isinstance(model, str):
+            self._model_obj = model
+            self.model = model_name_of(model)
+        else:
+            self.model = model
+        return model
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        # 같은 이름의 단계가 여러 번 실행되면 (청크마다 generate 등) 시간을 더함
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_output(self, result: Any) -> None:
+        self.output_length = _output_length(result)
+
+    def count_input_tokens(self, tokenizer: Any, text: str) -> None:
+        if tokenizer is None or not text:
+            return
+        try:
+            # Document면 토크나이저별 토큰 수를 기억해 두고 재사용
+            memoized = getattr(text, "token_count", None)
+            if memoized is not None:
+                self.input_tokens = memoized(tokenizer)
+            else:
+                self.input_tokens = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+        except Exception:
+            self.input_tokens = None
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {k: round(v, 4) for k, v in self.stages.items()}
+            counters = dict(self.counters)
+        out: Dict[str, Any] = {
+            "task": self.task,
+            "model": self.model,
+            "wall_time": round(self.wall_time, 4) if self.wall_time is not None else None,
+            "stages": stages,
+            "input_tokens": self.input_tokens,
+            "output_length": self.output_length,
+            "memory": self.memory,
+        }
+        if counters:
+            out["counters"] = counters
+        if self.profile_path:
+            out["profile"] = self.profile_path
+        return out
+
+
+def current() -> Optional[RunTrace]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """실행 중인 trace가 있으면 이 블록의 시간을 name 단계로 기록 (없으면 아무것도 안 함)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, time.perf_counter() - start)
+
+
+def count(name: str, n: int = 1) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """다른 스레드(Executor)에서 실행할 함수가 현재 trace에 기록하도록 context를 함께 넘김."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+@contextmanager
+def trace(task: str, model: Any = None, text: str = "", profile: Optional[bool] = None) -> Iterator[RunTrace]:
+    """
+    with trace("summarization", text=text) as t:
+        pipe = t.set_model(pipelines["summarizer"])
+        result = ...
+        t.set_output(result)
+    블록 전체 시간, 내부 stage() 시간, 입력 토큰 수(model의 tokenizer 기준), 메모리 변화를 기록.
+    profile이 True이거나 STUDYTEXTLAB_PROFILE이 켜져 있으면 cProfile 결과를 파일로 저장
+    (호출한 스레드만 측정됨).
+    """
+    run = RunTrace(task, model)
+    token = _current.set(run)
+    if profile is None:
+        profile_dir = profile_dir_from_env()
+    else:
+        profile_dir = (profile_dir_from_env() or PROFILE_DIR) if profile else None
+    profiler = cProfile.Profile() if profile_dir is not None else None
+
+    rss_before = _rss_bytes()
+    peak_before = _peak_rss_bytes()
+    start = time.perf_counter()
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError:
+            # 바깥 trace가 이미 profile 중
+            profiler = None
+    try:
+        yield run
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        run.wall_time = time.perf_counter() - start
+        _current.reset(token)
+
+        run.memory = {
+            "rss_delta_mb": _delta_mb(rss_before, _rss_bytes()),
+            # 프로세스 최대 RSS가 이번 실행에서 늘어난 양 (0이면 이전 최대치 안에서 실행됨)
+            "peak_rss_delta_mb": _delta_mb(peak_before, _peak_rss_bytes()),
+        }
+        if text:
+            run.count_input_tokens(getattr(run._model_obj, "tokenizer", None), text)
+
+        if profiler is not None:
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            path = profile_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{task}.prof"
+            profiler.dump_stats(str(path))
+            run.profile_path = str(path)
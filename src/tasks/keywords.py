@@ -1,27 +1,143 @@
 from __future__ import annotations
-from typing import List, Optional
-from keybert import KeyBERT
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
 
+if TYPE_CHECKING:
+    from keybert import KeyBERT
+    from sklearn.feature_extraction.text import CountVectorizer
+
+from .cache import cached, cached_map, model_name_of
+from .document import as_document, encode_spans
+from .instrumentation import stage
+from .similarity import load_embedder
+
+_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 _kw_model: Optional[KeyBERT] = None
+_kw_embedder: Any = None
+
+# 문서/후보 단어 임베딩을 계산할 때의 배치 크기
+_BATCH_SIZE = 128
 
 
-def _get_kw_model() -> KeyBERT:
-    global _kw_model
-    if _kw_model is None:
-        _kw_model = KeyBERT("sentence-transformers/all-MiniLM-L6-v2")
+def _get_kw_model(embedder: Any) -> KeyBERT:
+    # 넘겨받은 embedder 인스턴스를 그대로 감쌈 (모델을 두 번 올리지 않음).
+    # embedder가 다시 로드되어 다른 객체가 되면 KeyBERT도 새로 만듦
+    global _kw_model, _kw_embedder
+    if _kw_model is None or _kw_embedder is not embedder:
+        from keybert import KeyBERT
+
+        _kw_model = KeyBERT(model=embedder)
+        _kw_embedder = embedder
     return _kw_model
 
 
-def extract_keywords(text: str, top_k: int = 10) -> List[str]:
-    text = (text or "").strip()
-    if not text:
-        return []
+def unload_kw_model() -> None:
+    # KeyBERT가 embedder를 잡고 있으므로 embedder를 내릴 때 같이 내림
+    global _kw_model, _kw_embedder
+    _kw_model = None
+    _kw_embedder = None
+
+
+def _vectorizer() -> CountVectorizer:
+    # KeyBERT 기본 후보 추출 설정과 동일
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    return CountVectorizer(ngram_range=(1, 1), stop_words="english", min_df=1)
+
+
+def _extract_many(embedder: Any, docs: List[str], top_k: int, batch_size: int) -> List[List[str]]:
+    model = _get_kw_model(embedder)
+
+    # 문서 임베딩과 (모든 문서의) 후보 단어 임베딩을 큰 배치로 한 번씩만 계산
+    try:
+        words = _vectorizer().fit(docs).get_feature_names_out()
+    except ValueError:
+        # 불용어만 있는 등 후보 단어가 하나도 없음
+        return [[] for _ in docs]
+    with stage("embed"):
+        # 문서 임베딩은 Document에 기억해 두고 재사용
+        doc_embeddings = np.concatenate(
+            encode_spans(embedder, [(d, None) for d in docs], normalize=False, batch_size=batch_size)
+        )
+        # 후보 단어 임베딩은 단어별로 청크 캐시에 남겨 둠 (문서를 고치면 새로 나온 단어만 계산)
+        word_embeddings = np.stack(cached_map(
+            "keyword_word_embedding",
+            model_name_of(embedder),
+            {},
+            list(words),
+            lambda todo: list(embedder.encode(todo, batch_size=batch_size, convert_to_numpy=True)),
+        ))
+
+    with stage("rank"):
+        results = model.extract_keywords(
+            docs,
+            top_n=top_k,
+            use_maxsum=True,
+            nr_candidates=max(20, top_k * 4),
+            vectorizer=_vectorizer(),
+            doc_embeddings=doc_embeddings,
+            word_embeddings=word_embeddings,
+        )
+    # KeyBERT는 문서가 하나면 목록을 한 겹 벗겨서 돌려줌
+    if len(docs) == 1:
+        results = [results]
+    return [[kw for kw, _score in r] for r in results]
+
+
+def extract_keywords(
+    text: Union[str, List[str]],
+    top_k: int = 10,
+    batch_size: int = _BATCH_SIZE,
+    embedder: Any = None,
+) -> Union[List[str], List[List[str]]]:
+    """
+    text가 문자열이면 키워드 목록, 문자열 목록이면 문서별 키워드 목록의 목록을 반환.
+    embedder가 없으면 similarity.load_embedder()의 모델을 사용.
+    (메뉴 / batch / service는 메모리 한도 관리를 위해 PipelineRegistry의 embedder를 넘김)
+    """
+    if embedder is None:
+        embedder = load_embedder(_MODEL_NAME)
+    return _extract_keywords(embedder, text, top_k, batch_size)
+
+
+# 캐시 키에 embedder의 모델 이름을 넣어 백엔드(fp32 / int8 / compiled)별 결과가 섞이지 않게 함
+@cached("keywords", text_args=("text",), model_arg="embedder")
+def _extract_keywords(
+    embedder: Any,
+    text: Union[str, List[str]],
+    top_k: int,
+    batch_size: int,
+) -> Union[List[str], List[List[str]]]:
+    if isinstance(text, str):
+        text = as_document(text).strip()
+        if not text:
+            return []
+        return _extract_many(embedder, [text], top_k, batch_size)[0]
+
+    docs = [as_document(t).strip() for t in text]
+    results: List[List[str]] = [[] for _ in docs]
+    idx = [i for i, d in enumerate(docs) if d]
+    if idx:
+        for i, kws in zip(idx, _extract_many(embedder, [docs[i] for i in idx], top_k, batch_size)):
+            results[i] = kws
+    return results
+
 
-    model = _get_kw_model()
-    results = model.extract_keywords(
-        text,
-        top_n=top_k,
-        use_maxsum=True,
-        nr_candidates=max(20, top_k * 4),
-    )
-    return [kw for kw, _score in results]
+def extract_keywords_stream(
+    pieces: Iterable[str],
+    top_k: int = 10,
+    batch_size: int = _BATCH_SIZE,
+    embedder: Any = None,
+) -> List[str]:
+    """
+    큰 텍스트를 조각(pieces)별로 키워드를 뽑아 합침.
+    여러 조각에서 나온 키워드가 앞에 오고, 같으면 조각 안 순위가 높은 (그리고 먼저 나온) 키워드가 앞.
+    """
+    # 키워드 -> (나온 조각 수, 순위 합, 처음 나온 조각 번호)
+    stats: Dict[str, Tuple[int, int, int]] = {}
+    for n, piece in enumerate(pieces):
+        for rank, kw in enumerate(extract_keywords(piece, top_k=top_k, batch_size=batch_size, embedder=embedder)):
+            count, rank_sum, first = stats.get(kw, (0, 0, n))
+            stats[kw] = (count + 1, rank_sum + rank, first)
+    ordered = sorted(stats.items(), key=lambda item: (-item[1][0], item[1][1] / item[1][0], item[1][2]))
+    return [kw for kw, _stats in ordered[:top_k]]
@@ -1,31 +1,124 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
-from transformers import pipeline
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from .backends import build_pipeline
+from .cache import cached
+from .document import Document, as_document, embedder_key, tokenizer_key
+from .instrumentation import stage
 
 _MODEL_NAME = "distilbert-base-uncased-distilled-squad"
 _qa_pipe: Optional[Any] = None
 
+# 긴 context는 이 크기의 passage로 나눠 색인한 뒤, 질문과 가까운 top-k만 QA 모델에 넣음
+_PASSAGE_TOKENS = 256
+_PASSAGE_OVERLAP = 32
+_TOP_K = 3
+
+
+@dataclass
+class PassageIndex:
+    text_hash: str
+    embedder_id: int
+    spans: List[Tuple[int, int]]
+    embeddings: Any  # (passage 수, dim), L2 정규화된 np.ndarray
+
+
+_index: Optional[PassageIndex] = None
+
 
 def load_qa_pipeline(model_name: str = _MODEL_NAME) -> Any:
     """Q&A pipeline을 1회 로딩 후 재사용."""
     global _qa_pipe
     if _qa_pipe is None:
-        _qa_pipe = pipeline("question-answering", model=model_name)
+        _qa_pipe = build_pipeline("question-answering", model_name, task="qa")
     return _qa_pipe
 
 
-def run_qa(qa_pipe: Any, context: str, question: str) -> Dict:
-    """main에서 호출할 표준 인터페이스."""
-    context = (context or "").strip()
+def unload_qa_pipeline() -> None:
+    global _qa_pipe
+    _qa_pipe = None
+
+
+def clear_passage_index() -> None:
+    """embedder가 바뀌면 이전 embedder로 만든 passage 색인을 버림."""
+    global _index
+    _index = None
+
+
+def _new_index(embedder: Any, tokenizer: Any, doc: Document, text_hash: str) -> PassageIndex:
+    spans = list(doc.chunk_spans(tokenizer, _PASSAGE_TOKENS, _PASSAGE_OVERLAP))
+    return PassageIndex(text_hash, id(embedder), spans, doc.embed(embedder, spans))
+
+
+def build_passage_index(embedder: Any, tokenizer: Any, context: str) -> PassageIndex:
+    """
+    context를 passage로 나누고 임베딩을 계산해 둠.
+    Document면 색인을 Document에 기억하고,
+    일반 문자열이면 같은 텍스트(와 같은 embedder)에 대해 마지막으로 만든 색인을 재사용.
+    """
+    global _index
+    if isinstance(context, Document):
+        key = ("passage_index", embedder_key(embedder), tokenizer_key(tokenizer))
+        return context.memo(key, lambda: _new_index(embedder, tokenizer, context, ""))
+
+    text_hash = hashlib.sha1(context.encode("utf-8")).hexdigest()
+    if _index is not None and _index.text_hash == text_hash and _index.embedder_id == id(embedder):
+        return _index
+    _index = _new_index(embedder, tokenizer, as_document(context), text_hash)
+    return _index
+
+
+def _retrieve(embedder: Any, index: PassageIndex, question: str, top_k: int) -> List[Tuple[int, int]]:
+    q = embedder.encode([question], convert_to_numpy=True, normalize_embeddings=True)[0]
+    scores = index.embeddings @ np.asarray(q, dtype=np.float32)
+    k = min(top_k, len(index.spans))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [index.spans[i] for i in top]
+
+
+@cached("qa", text_args=("context", "question"), model_arg="qa_pipe")
+def run_qa(
+    qa_pipe: Any,
+    context: str,
+    question: str,
+    embedder: Any = None,
+    top_k: int = _TOP_K,
+) -> Dict:
+    """
+    main에서 호출할 표준 인터페이스.
+    embedder가 주어지고 context가 passage 하나보다 길면,
+    질문과 가까운 top_k passage에서만 답을 찾고 start/end는 원문 기준으로 되돌림.
+    """
+    context = as_document(context).strip()
     question = (question or "").strip()
 
     if not context or not question:
         return {"error": "context/question이 비어 있습니다.", "answer": "", "score": 0.0}
 
-    result = qa_pipe(question=question, context=context)
+    candidates = [(0, len(context))]
+    tokenizer = getattr(qa_pipe, "tokenizer", None)
+    if embedder is not None and tokenizer is not None:
+        with stage("retrieve"):
+            index = build_passage_index(embedder, tokenizer, context)
+            if len(index.spans) > 1:
+                candidates = _retrieve(embedder, index, question, top_k)
+
+    passages = [context[s:e] for s, e in candidates]
+    with stage("inference"):
+        out = qa_pipe(question=[question] * len(passages), context=passages)
+    if isinstance(out, dict):
+        out = [out]
+
+    best, offset = max(zip(out, (s for s, _e in candidates)), key=lambda pair: pair[0].get("score", 0.0))
+    start = int(best.get("start", -1))
+    end = int(best.get("end", -1))
     return {
-        "answer": result.get("answer", ""),
-        "score": float(result.get("score", 0.0)),
-        "start": int(result.get("start", -1)),
-        "end": int(result.get("end", -1)),
+        "answer": best.get("answer", ""),
+        "score": float(best.get("score", 0.0)),
+        "start": start + offset if start >= 0 else start,
+        "end": end + offset if end >= 0 else end,
     }
@@ -1,52 +1,274 @@
 from __future__ import annotations
-from typing import Callable, Dict, Any
-from pypdf import PdfReader
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 
+from .document import Document
+from .instrumentation import count, current, propagate, stage
+
+# 페이지 텍스트 캐시 (파일 해시 + 페이지 번호). STUDYTEXTLAB_CACHE_DIR 이 있으면 그 아래에 저장
+_CACHE_DIR = Path(os.environ.get("STUDYTEXTLAB_CACHE_DIR") or Path(__file__).resolve().parent.parent.parent / "cache")
+PAGE_CACHE_PATH = _CACHE_DIR / "pdf_pages.sqlite3"
+
+# 추출할 페이지가 이보다 많으면 여러 프로세스로 나눠 추출
+_PARALLEL_MIN_PAGES = 32
+_PAGES_PER_TASK = 8
+
+PageSelection = Union[None, str, Iterable[int]]
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_connect() -> sqlite3.Connection:
+    PAGE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(PAGE_CACHE_PATH))
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS files (hash TEXT PRIMARY KEY, n_pages INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS pages (
+            hash TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL,
+            PRIMARY KEY (hash, page)
+        );
+        """
+    )
+    return conn
+
+
+def _select_pages(pages: PageSelection, n_pages: int) -> List[int]:
+    """
+    페이지 선택을 0부터 시작하는 페이지 번호 목록(중복 없이 페이지 순서)으로 바꿈.
+    문자열은 사람이 쓰는 1부터 시작하는 범위 ("1-5,8"), 그 외는 0부터 시작하는 번호 목록.
+    형식이 틀리거나 PDF에 없는 페이지가 있으면 ValueError.
+    """
+    if pages is None:
+        return list(range(n_pages))
+    if isinstance(pages, str):
+        selected: List[int] = []
+        for part in pages.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                if "-" in part:
+                    a, b = part.split("-", 1)
+                    first = int(a) if a.strip() else 1
+                    last = int(b) if b.strip() else n_pages
+                else:
+                    first = last = int(part)
+            except ValueError:
+                raise ValueError(f"잘못된 페이지 선택입니다: {part!r} (예: \"1-5,8\")") from None
+            if first > last:
+                raise ValueError(f"페이지 범위의 시작이 끝보다 큽니다: {part!r}")
+            if first < 1 or last > n_pages:
+                raise ValueError(f"PDF에 없는 페이지입니다: {part!r} (1-{n_pages}쪽)")
+            selected.extend(range(first - 1, last))
+        if not selected:
+            raise ValueError(f"선택된 페이지가 없습니다: {pages!r}")
+        pages = selected
+    numbers = sorted(set(pages))
+    invalid = [p for p in numbers if not 0 <= p < n_pages]
+    if invalid:
+        raise ValueError(f"PDF에 없는 페이지 번호입니다 (0부터): {invalid} (전체 {n_pages}쪽)")
+    return numbers
+
+
+def _extract_pages(pdf_path: str, page_numbers: List[int]) -> List[str]:
+    # ProcessPoolExecutor에서도 호출되므로 모듈 최상위 함수로 둠
+    from pypdf import PdfReader
 
-def extract_text_from_pdf_path(pdf_path: str) -> str:
     reader = PdfReader(pdf_path)
-    texts = []
-    for page in reader.pages:
-        t = page.extract_text() or ""
-        texts.append(t)
+    return [reader.pages[p].extract_text() or "" for p in page_numbers]
+
+
+def _extracted_stream(pdf_path: str, missing: List[int], workers: Optional[int]) -> Iterator[str]:
+    """missing 페이지의 텍스트를 순서대로 하나씩 돌려줌 (페이지가 많으면 프로세스 풀 사용)."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(missing) >= _PARALLEL_MIN_PAGES:
+        groups = [missing[i:i + _PAGES_PER_TASK] for i in range(0, len(missing), _PAGES_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for texts in pool.map(_extract_pages, [pdf_path] * len(groups), groups):
+                yield from texts
+        return
+
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    for p in missing:
+        yield reader.pages[p].extract_text() or ""
+
+
+def iter_pdf_pages(
+    pdf_path: str,
+    pages: PageSelection = None,
+    workers: Optional[int] = None,
+    use_cache: bool = True,
+) -> Iterator[Tuple[int, str]]:
+    """
+    (페이지 번호(0부터), 텍스트)를 페이지 순서대로 하나씩 돌려주는 generator.
+    - pages: None(전체) / "1-5,8" / 페이지 번호 목록
+    - workers: 프로세스 수 (None: CPU 수, 1: 순차 추출). 페이지가 적으면 항상 순차
+    - 이미 추출한 페이지는 캐시에서 바로 읽음 (같은 파일 내용이면 경로가 달라도 재사용)
+    """
+    h = file_hash(pdf_path) if use_cache else ""
+    conn = _cache_connect() if use_cache else None
+    try:
+        n_pages = None
+        if conn is not None:
+            row = conn.execute("SELECT n_pages FROM files WHERE hash = ?", (h,)).fetchone()
+            n_pages = row[0] if row else None
+        if n_pages is None:
+            from pypdf import PdfReader
+
+            n_pages = len(PdfReader(pdf_path).pages)
+            if conn is not None:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO files (hash, n_pages) VALUES (?, ?)", (h, n_pages))
+
+        numbers = _select_pages(pages, n_pages)
+        cached: Dict[int, str] = {}
+        if conn is not None and numbers:
+            rows = conn.execute("SELECT page, text FROM pages WHERE hash = ?", (h,)).fetchall()
+            wanted = set(numbers)
+            cached = {p: t for p, t in rows if p in wanted}
+
+        missing = [p for p in numbers if p not in cached]
+        stream = _extracted_stream(pdf_path, missing, workers) if missing else iter(())
+        for p in numbers:
+            if p in cached:
+                yield p, cached[p]
+                continue
+            text = next(stream)
+            if conn is not None:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO pages (hash, page, text) VALUES (?, ?, ?)", (h, p, text))
+            yield p, text
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def extract_text_from_pdf_path(
+    pdf_path: str,
+    pages: PageSelection = None,
+    workers: Optional[int] = None,
+) -> str:
+    texts = [t for _p, t in iter_pdf_pages(pdf_path, pages=pages, workers=workers)]
     return "\n\n".join(texts).strip()
 
 
+def _timed(fn: Callable[[], Any], name: Optional[str] = None) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    if name is None:
+        result = fn()
+    else:
+        with stage(name):
+            result = fn()
+    return result, time.perf_counter() - start
+
+
 def analyze_pdf(
     summarizer: Any,
     topic_classifier: Any,
     keyword_extractor: Callable[[str, int], list],
     pdf_path: str,
+    executor: Optional[Executor] = None,
+    stage_timeout: Optional[float] = None,
 ) -> Dict:
-    raw_text = extract_text_from_pdf_path(pdf_path)
+    """
+    요약 / 주제 분류 / 키워드 추출을 동시에 실행.
+    - executor: 단계를 실행할 Executor (없으면 3개 스레드로 새로 만듦)
+    - stage_timeout: 전체 단계 대기 시간(초). 넘긴 단계는 error로 기록하고 나머지 결과는 그대로 반환.
+      이미 시작한 단계는 멈출 수 없으므로, 호출한 쪽이 잡은 모델(pipelines.using)을 그 단계가 계속 쓰지 않도록
+      끝날 때까지 기다린 뒤 반환함. 기다린 시간은 timings["overrun"]과 trace의 stage_overrun 단계로 기록.
+    """
+    raw_text, extract_time = _timed(lambda: Document(extract_text_from_pdf_path(pdf_path), pdf_path), "pdf_extract")
     if not raw_text:
         return {"pdf_path": pdf_path, "error": "PDF에서 텍스트를 추출하지 못했습니다."}
 
-    summary = ""
-    try:
-        # summarization.py의 run_summarization 형태를 그대로 사용한다고 가정
-        from . import summarization as sum_mod
-        summary = sum_mod.run_summarization(summarizer, raw_text, max_len=130, min_len=30)
-    except Exception as e:
-        summary = f"(summary error) {e}"
+    from . import summarization as sum_mod
+    from . import topic_classification as tc_mod
 
-    topic = {}
-    try:
-        from . import topic_classification as tc_mod
-        topic = tc_mod.run_topic_classification(topic_classifier, raw_text)
-    except Exception as e:
-        topic = {"error": str(e), "top_label": "general", "top_score": 0.0}
+    # 문서를 요약 모델 토큰 기준 청크로 한 번만 나눠 두고 요약/주제 분류가 함께 사용.
+    # (bart-large-cnn과 bart-large-mnli는 같은 토크나이저를 쓰고, 주제 분류는 어차피
+    #  모델 입력 한계에서 잘리므로 첫 청크만 넣어도 결과가 같음)
+    tokenizer = getattr(summarizer, "tokenizer", None)
+    with stage("chunk"):
+        if tokenizer is not None:
+            chunks = raw_text.chunks(tokenizer, sum_mod._CHUNK_TOKENS, sum_mod._OVERLAP_TOKENS, sum_mod._ANCHOR_EVERY)
+        else:
+            chunks = [raw_text]
 
-    kws = []
-    try:
-        kws = keyword_extractor(raw_text, 10)
-    except Exception as e:
-        kws = [f"(keywords error) {e}"]
+    stages: Dict[str, Callable[[], Any]] = {
+        "summary": lambda: sum_mod.summarize_chunks(summarizer, chunks, max_len=130, min_len=30),
+        "topic": lambda: tc_mod.run_topic_classification(topic_classifier, chunks[0]),
+        "keywords": lambda: keyword_extractor(raw_text, 10),
+    }
+    fallbacks: Dict[str, Callable[[str], Any]] = {
+        "summary": lambda err: f"(summary error) {err}",
+        "topic": lambda err: {"error": err, "top_label": "general", "top_score": 0.0},
+        "keywords": lambda err: [f"(keywords error) {err}"],
+    }
+
+    own_executor = executor is None
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="pdf-stage")
+
+    start = time.perf_counter()
+    # 각 단계 스레드도 호출한 쪽의 계측(trace)에 기록되도록 context를 넘김
+    futures = {name: executor.submit(propagate(_timed), fn, name) for name, fn in stages.items()}
+    deadline = start + stage_timeout if stage_timeout is not None else None
+
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {"extract": round(extract_time, 3)}
+    overrun = []
+    for name, future in futures.items():
+        timeout = max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+        try:
+            result, elapsed = future.result(timeout=timeout)
+            timings[name] = round(elapsed, 3)
+        except FutureTimeout:
+            if not future.cancel():
+                overrun.append(future)
+            result = fallbacks[name](f"timeout after {stage_timeout}s")
+            timings[name] = None
+        except Exception as e:
+            result = fallbacks[name](str(e))
+            timings[name] = round(time.perf_counter() - start, 3)
+        results[name] = result
+    timings["stages_total"] = round(time.perf_counter() - start, 3)
+
+    if overrun:
+        # timeout 난 단계가 끝나야 모델을 놓아줄 수 있음 (결과는 버림)
+        count("stages_timed_out", len(overrun))
+        with stage("stage_overrun"):
+            overrun_start = time.perf_counter()
+            wait(overrun)
+            timings["overrun"] = round(time.perf_counter() - overrun_start, 3)
+    if own_executor:
+        executor.shutdown(wait=False)
+
+    run = current()
+    if run is not None:
+        run.count_input_tokens(tokenizer, raw_text)
 
     return {
         "pdf_path": pdf_path,
         "raw_text_length": len(raw_text),
-        "summary": summary,
-        "topic": topic,
-        "keywords": kws,
+        "summary": results["summary"],
+        "topic": results["topic"],
+        "keywords": results["keywords"],
+        "timings": timings,
     }
@@ -1,24 +1,163 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
-from transformers import pipeline
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .backends import build_pipeline
+from .cache import cached, cached_map, model_name_of
+from .document import as_document
+from .instrumentation import stage
 
 _MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
 _sentiment_pipe: Optional[Any] = None
 
+# 긴 텍스트는 문장을 이 토큰 수 이하로 묶은 window 단위로 분류 (모델 한계는 512)
+_WINDOW_TOKENS = 128
+_BATCH_SIZE = 16
+# 평균 4문장마다 내용 기준 window 경계 (고친 곳 근처 window만 다시 분류)
+_ANCHOR_EVERY = 4
+
 
 def load_sentiment_model(model_name: str = _MODEL_NAME) -> Any:
     global _sentiment_pipe
     if _sentiment_pipe is None:
-        _sentiment_pipe = pipeline("sentiment-analysis", model=model_name)
+        _sentiment_pipe = build_pipeline("sentiment-analysis", model_name, task="sentiment")
     return _sentiment_pipe
 
 
-def run_sentiment(sentiment_model: Any, text: str) -> Dict:
-    text = (text or "").strip()
-    if not text:
-        return {"error": "text가 비어 있습니다.", "label": "", "score": 0.0}
+def unload_sentiment_model() -> None:
+    global _sentiment_pipe
+    _sentiment_pipe = None
+
 
-    out = sentiment_model(text)
+def _to_result(d: Any) -> Dict:
     # pipeline 반환은 list[dict] 형태
-    d = out[0] if isinstance(out, list) and out else {}
+    d = d[0] if isinstance(d, list) and d else d
+    d = d if isinstance(d, dict) else {}
     return {"label": d.get("label", ""), "score": float(d.get("score", 0.0))}
+
+
+def _positive_prob(d: Dict) -> float:
+    # SST-2는 POSITIVE/NEGATIVE 두 라벨. score는 예측 라벨의 확률
+    score = float(d.get("score", 0.0))
+    return score if str(d.get("label", "")).upper().startswith("POS") else 1.0 - score
+
+
+def _windows(sentiment_model: Any, text: str, window_tokens: int) -> List[str]:
+    tokenizer = getattr(sentiment_model, "tokenizer", None)
+    if tokenizer is None:
+        return [text]
+    return as_document(text).chunks(tokenizer, window_tokens, anchor_every=_ANCHOR_EVERY) or [text]
+
+
+def run_sentiment_many(
+    sentiment_model: Any,
+    texts: List[str],
+    batch_size: int = _BATCH_SIZE,
+    window_tokens: int = _WINDOW_TOKENS,
+) -> List[Dict]:
+    """
+    여러 텍스트를 문장 묶음(window) 단위로 나눠, 모든 window를 한 번의 배치 호출로 분류.
+    window가 여러 개인 문서는 길이 가중 평균 긍정 확률로 문서 라벨을 정하고,
+    window별 긍정 확률 배열(timeline)을 함께 반환.
+    window별 결과는 청크 캐시에 남으므로 문서를 고쳐 다시 실행하면 바뀐 window만 분류함.
+    """
+    results: List[Dict] = [{"error": "text가 비어 있습니다.", "label": "", "score": 0.0} for _ in texts]
+    windows: List[str] = []
+    owners: List[int] = []
+    with stage("tokenize"):
+        for i, t in enumerate(texts):
+            t = as_document(t).strip()
+            if not t:
+                continue
+            for w in _windows(sentiment_model, t, window_tokens):
+                windows.append(w)
+                owners.append(i)
+    if not windows:
+        return results
+
+    timing = {"windows": 0, "sec": 0.0}
+
+    def classify(todo: List[str]) -> List[Dict]:
+        start = time.perf_counter()
+        with stage("inference"):
+            out = sentiment_model(todo, batch_size=batch_size, truncation=True)
+        timing["windows"] += len(todo)
+        timing["sec"] += time.perf_counter() - start
+        return [_to_result(d) for d in out]
+
+    out = cached_map("sentiment_window", model_name_of(sentiment_model), {}, windows, classify)
+    # 이번에 실제로 분류한 window 기준 처리량 (모두 재사용했으면 None)
+    rate = round(timing["windows"] / timing["sec"], 1) if timing["sec"] > 0 else None
+
+    per_doc: Dict[int, List[Tuple[float, int]]] = {}
+    for owner, w, d in zip(owners, windows, out):
+        per_doc.setdefault(owner, []).append((_positive_prob(d), len(w)))
+        if len(per_doc[owner]) == 1:
+            results[owner] = _to_result(d)
+
+    for i, probs in per_doc.items():
+        if len(probs) == 1:
+            continue
+        total = sum(n for _p, n in probs)
+        pos = sum(p * n for p, n in probs) / total
+        label = "POSITIVE" if pos >= 0.5 else "NEGATIVE"
+        results[i] = {
+            "label": label,
+            "score": round(pos if label == "POSITIVE" else 1.0 - pos, 4),
+            "windows": len(probs),
+            # window별 긍정 확률 (0~1)
+            "timeline": [round(p, 3) for p, _n in probs],
+            "windows_per_sec": rate,
+        }
+    return results
+
+
+@cached("sentiment", text_args=("text",), model_arg="sentiment_model")
+def run_sentiment(
+    sentiment_model: Any,
+    text: str,
+    batch_size: int = _BATCH_SIZE,
+    window_tokens: int = _WINDOW_TOKENS,
+) -> Dict:
+    """
+    window_tokens 이하의 텍스트는 한 번에 분류하고,
+    더 긴 텍스트는 window로 나눠 배치 분류한 뒤 문서 라벨 + timeline을 반환.
+    """
+    text = as_document(text).strip()
+    if not text:
+        return {"error": "text가 비어 있습니다.", "label": "", "score": 0.0}
+
+    return run_sentiment_many(sentiment_model, [text], batch_size=batch_size, window_tokens=window_tokens)[0]
+
+
+def run_sentiment_stream(
+    sentiment_model: Any,
+    pieces: Iterable[str],
+    batch_size: int = _BATCH_SIZE,
+    window_tokens: int = _WINDOW_TOKENS,
+) -> Dict:
+    """
+    큰 텍스트를 조각(pieces)별로 분류하고 조각 길이 가중 평균 긍정 확률로 문서 라벨을 정함.
+    timeline은 조각별 긍정 확률 (조각 안의 window별 값은 남기지 않아 메모리가 파일 크기에 비례하지 않음).
+    """
+    probs: List[Tuple[float, int]] = []
+    windows = 0
+    for piece in pieces:
+        result = run_sentiment_many(sentiment_model, [piece], batch_size=batch_size, window_tokens=window_tokens)[0]
+        if "error" in result:
+            continue
+        probs.append((_positive_prob(result), len(piece)))
+        windows += result.get("windows", 1)
+    if not probs:
+        return {"error": "text가 비어 있습니다.", "label": "", "score": 0.0}
+
+    total = sum(n for _p, n in probs)
+    pos = sum(p * n for p, n in probs) / total
+    label = "POSITIVE" if pos >= 0.5 else "NEGATIVE"
+    return {
+        "label": label,
+        "score": round(pos if label == "POSITIVE" else 1.0 - pos, 4),
+        "windows": windows,
+        "pieces": len(probs),
+        "timeline": [round(p, 3) for p, _n in probs],
+    }
@@ -1,24 +1,374 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
-from sentence_transformers import SentenceTransformer, util
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+from .backends import build_embedder
+from .cache import cached, model_name_of
+from .document import as_document, encode_spans
+from .instrumentation import stage
+
+_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 _model: Optional[SentenceTransformer] = None
 
+# 코퍼스 색인 기본 위치 (STUDYTEXTLAB_CACHE_DIR 이 있으면 그 아래)
+_CACHE_DIR = Path(os.environ.get("STUDYTEXTLAB_CACHE_DIR") or Path(__file__).resolve().parent.parent.parent / "cache")
+INDEX_DIR = _CACHE_DIR / "similarity_index"
+
+# MiniLM 입력 한계(256)보다 작게 잘라서 문단 단위 표절도 잡히도록 함
+_CHUNK_TOKENS = 128
+_CHUNK_OVERLAP = 16
+_ENCODE_BATCH = 64
 
-def load_embedder(model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> SentenceTransformer:
+
+def load_embedder(model_name: str = _MODEL_NAME) -> SentenceTransformer:
     global _model
     if _model is None:
-        _model = SentenceTransformer(model_name)
+        _model = build_embedder(model_name)
     return _model
 
 
+def unload_embedder() -> None:
+    global _model
+    _model = None
+
+
+@cached("similarity", text_args=("text_a", "text_b"), model_arg="embedder")
 def compute_similarity(embedder: Any, text_a: str, text_b: str) -> Dict:
-    a = (text_a or "").strip()
-    b = (text_b or "").strip()
+    a = as_document(text_a).strip()
+    b = as_document(text_b).strip()
 
     if not a or not b:
         return {"error": "비교할 두 텍스트가 필요합니다.", "similarity": None}
 
-    emb = embedder.encode([a, b], convert_to_tensor=True)
-    score = util.cos_sim(emb[0], emb[1]).item()
-    return {"similarity": float(score)}
+    with stage("embed"):
+        # 정규화한 전체 텍스트 임베딩의 내적 = 코사인 유사도 (Document면 이전에 계산한 임베딩 재사용)
+        emb_a, emb_b = encode_spans(embedder, [(a, None), (b, None)])
+    return {"similarity": float(emb_a[0] @ emb_b[0])}
+
+
+def embedding_chunk_spans(embedder: Any, text: str) -> List[Tuple[int, int]]:
+    """임베딩 모델 입력 한계에 맞춘 (겹치는) 청크 위치 목록. 토크나이저가 없으면 단어 수로 대신 셈."""
+    tokenizer = getattr(embedder, "tokenizer", None)
+    return list(as_document(text).chunk_spans(tokenizer, _CHUNK_TOKENS, _CHUNK_OVERLAP))
+
+
+def _file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CorpusIndex:
+    """
+    문서 코퍼스의 청크 임베딩 색인 (표절 검사용).
+
+    index_dir 구성
+      vectors.f32 : (청크 수, dim) L2 정규화 float32 행렬. memmap으로 읽음
+      rows.i32    : 청크별 문서 번호 (삭제된 청크는 -1)
+      spans.i64   : 청크별 원문 (start, end)
+      docs.json   : 문서 목록 (id, 내용 해시, 파일 크기 / 수정 시각, 청크 행 범위) + 모델 이름 / dim
+
+    문서 추가는 파일 끝에 이어 쓰고, 삭제는 rows를 -1로 표시만 함 (compact()로 정리).
+    docs.json의 n_rows가 기준: 이어 쓰다 중단되어 남은 행은 다음 add() 때 잘라 냄.
+    model_name(기본: model_name_of(embedder), 백엔드 포함)이 색인을 만든 모델과 다르면
+    예전 벡터와 비교할 수 없으므로 색인을 비우고 새로 만듦.
+    """
+
+    def __init__(self, embedder: Any, index_dir: Path = INDEX_DIR, model_name: Optional[str] = None):
+        self.embedder = embedder
+        self.index_dir = Path(index_dir)
+        self.model_name = model_name or model_name_of(embedder)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.index_dir / "vectors.f32"
+        self._rows_path = self.index_dir / "rows.i32"
+        self._spans_path = self.index_dir / "spans.i64"
+        self._meta_path = self.index_dir / "docs.json"
+        self._load_meta()
+        self._mm: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    # ---- 메타데이터 ----
+
+    def _load_meta(self) -> None:
+        meta = None
+        if self._meta_path.exists():
+            with self._meta_path.open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("model") != self.model_name:
+                # 다른 모델(또는 백엔드)로 만든 색인: 행 파일을 지우고 새로 만듦
+                for path in (self._vectors_path, self._rows_path, self._spans_path, self._meta_path):
+                    path.unlink(missing_ok=True)
+                meta = None
+        if meta is None:
+            meta = {"model": self.model_name, "dim": None, "n_rows": 0, "docs": []}
+        self.meta = meta
+        # doc id -> docs 목록 안의 번호 (삭제된 문서 제외)
+        self._by_id = {d["id"]: i for i, d in enumerate(meta["docs"]) if not d.get("deleted")}
+
+    def _save_meta(self) -> None:
+        tmp = self._meta_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp.replace(self._meta_path)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._by_id
+
+    def stats(self) -> Dict[str, Any]:
+        live_rows = sum(d["n_chunks"] for d in self.meta["docs"] if not d.get("deleted"))
+        return {
+            "documents": len(self._by_id),
+            "chunks": live_rows,
+            "deleted_chunks": self.meta["n_rows"] - live_rows,
+            "dim": self.meta["dim"],
+        }
+
+    # ---- 쓰기 ----
+
+    def _truncate_to_meta(self) -> None:
+        """행 파일을 docs.json에 기록된 n_rows 행까지만 남김 (저장 전에 중단된 이어 쓰기 정리)."""
+        n, dim = self.meta["n_rows"], self.meta["dim"] or 0
+        for path, row_bytes in (
+            (self._vectors_path, dim * 4),
+            (self._rows_path, 4),
+            (self._spans_path, 16),
+        ):
+            if path.exists() and path.stat().st_size != n * row_bytes:
+                with path.open("r+b") as f:
+                    f.truncate(n * row_bytes)
+
+    def add(
+        self,
+        doc_id: str,
+        text: str,
+        content_hash: Optional[str] = None,
+        file_stat: Optional[Tuple[int, int]] = None,
+    ) -> bool:
+        """
+        문서를 색인에 추가. 같은 id가 같은 내용으로 이미 있으면 건너뛰고 False,
+        내용이 바뀌었으면 예전 청크를 지우고 다시 추가.
+        file_stat: 원본 파일의 (크기, 수정 시각 ns). 다음 update_from_directory에서 해시 계산을 건너뛰는 데 사용.
+        """
+        content_hash = content_hash or hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if doc_id in self._by_id:
+            if self.meta["docs"][self._by_id[doc_id]]["hash"] == content_hash:
+                return False
+            self.delete(doc_id)
+
+        spans = embedding_chunk_spans(self.embedder, text)
+        if spans:
+            vectors = as_document(text).embed(self.embedder, spans, batch_size=_ENCODE_BATCH)
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            if self.meta["dim"] is None:
+                self.meta["dim"] = int(vectors.shape[1])
+        else:
+            vectors = np.zeros((0, self.meta["dim"] or 0), dtype=np.float32)
+
+        doc_no = len(self.meta["docs"])
+        first = self.meta["n_rows"]
+        self._truncate_to_meta()
+        with self._vectors_path.open("ab") as f:
+            f.write(vectors.tobytes())
+        with self._rows_path.open("ab") as f:
+            f.write(np.full(len(spans), doc_no, dtype=np.int32).tobytes())
+        with self._spans_path.open("ab") as f:
+            f.write(np.asarray(spans, dtype=np.int64).reshape(-1, 2).tobytes())
+
+        doc = {"id": doc_id, "hash": content_hash, "first_row": first, "n_chunks": len(spans)}
+        if file_stat is not None:
+            doc["size"], doc["mtime_ns"] = file_stat
+        self.meta["docs"].append(doc)
+        self.meta["n_rows"] = first + len(spans)
+        self._by_id[doc_id] = doc_no
+        self._save_meta()
+        self._mm = None
+        return True
+
+    def delete(self, doc_id: str) -> bool:
+        if doc_id not in self._by_id:
+            return False
+        doc_no = self._by_id.pop(doc_id)
+        doc = self.meta["docs"][doc_no]
+        doc["deleted"] = True
+        if doc["n_chunks"]:
+            rows = np.memmap(self._rows_path, dtype=np.int32, mode="r+", shape=(self.meta["n_rows"],))
+            rows[doc["first_row"]:doc["first_row"] + doc["n_chunks"]] = -1
+            rows.flush()
+            del rows
+        self._save_meta()
+        self._mm = None
+        return True
+
+    def update_from_directory(
+        self,
+        directory: Path,
+        load_text: Callable[[Path], str],
+        suffixes: Iterable[str] = (".txt", ".pdf"),
+    ) -> Dict[str, int]:
+        """
+        directory 안의 파일과 색인을 맞춤: 새/바뀐 파일만 임베딩하고, 사라진 파일은 삭제.
+        doc id는 directory 기준 상대 경로.
+        크기와 수정 시각이 색인에 기록된 값과 같은 파일은 읽지 않음 (다르면 내용 해시로 다시 확인).
+        """
+        directory = Path(directory)
+        suffixes = tuple(s.lower() for s in suffixes)
+        seen = set()
+        added = unchanged = 0
+        touched = False
+        for path in sorted(p for p in directory.rglob("*") if p.is_file() and p.suffix.lower() in suffixes):
+            doc_id = path.relative_to(directory).as_posix()
+            seen.add(doc_id)
+            st = path.stat()
+            file_stat = (st.st_size, st.st_mtime_ns)
+            doc = self.meta["docs"][self._by_id[doc_id]] if doc_id in self._by_id else None
+            if doc is not None and (doc.get("size"), doc.get("mtime_ns")) == file_stat:
+                unchanged += 1
+                continue
+            h = _file_hash(path)
+            if doc is not None and doc["hash"] == h:
+                # 내용은 그대로이고 수정 시각만 바뀜: 다음부터 해시를 다시 계산하지 않도록 기록만 갱신
+                doc["size"], doc["mtime_ns"] = file_stat
+                touched = True
+                unchanged += 1
+                continue
+            if self.add(doc_id, load_text(path), content_hash=h, file_stat=file_stat):
+                added += 1
+        removed = 0
+        for doc_id in [d for d in self._by_id if d not in seen]:
+            removed += int(self.delete(doc_id))
+        if touched:
+            self._save_meta()
+        return {"added": added, "unchanged": unchanged, "removed": removed}
+
+    def compact(self) -> None:
+        """삭제 표시된 청크를 실제로 지우고 파일을 다시 씀."""
+        vectors, rows = self._matrix()
+        spans = self._spans()
+        keep_docs = [d for d in self.meta["docs"] if not d.get("deleted")]
+        new_vectors, new_rows, new_spans = [], [], []
+        pos = 0
+        for new_no, doc in enumerate(keep_docs):
+            sl = slice(doc["first_row"], doc["first_row"] + doc["n_chunks"])
+            new_vectors.append(np.asarray(vectors[sl]))
+            new_spans.append(np.asarray(spans[sl]))
+            new_rows.append(np.full(doc["n_chunks"], new_no, dtype=np.int32))
+            doc["first_row"] = pos
+            pos += doc["n_chunks"]
+        dim = self.meta["dim"] or 0
+        self._mm = None
+        del vectors, rows, spans
+        for path, parts, dtype, shape in (
+            (self._vectors_path, new_vectors, np.float32, (0, dim)),
+            (self._rows_path, new_rows, np.int32, (0,)),
+            (self._spans_path, new_spans, np.int64, (0, 2)),
+        ):
+            data = np.concatenate(parts) if parts else np.zeros(shape, dtype=dtype)
+            tmp = path.with_suffix(".tmp")
+            with tmp.open("wb") as f:
+                f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+            tmp.replace(path)
+        self.meta["docs"] = keep_docs
+        self.meta["n_rows"] = pos
+        self._by_id = {d["id"]: i for i, d in enumerate(keep_docs)}
+        self._save_meta()
+
+    # ---- 읽기 ----
+
+    def _matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(vectors, rows) memmap. 색인이 바뀔 때까지 재사용."""
+        if self._mm is None:
+            n, dim = self.meta["n_rows"], self.meta["dim"] or 0
+            if n == 0:
+                self._mm = (np.zeros((0, dim), dtype=np.float32), np.zeros(0, dtype=np.int32))
+            else:
+                self._mm = (
+                    np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, dim)),
+                    np.memmap(self._rows_path, dtype=np.int32, mode="r", shape=(n,)),
+                )
+        return self._mm
+
+    def _spans(self) -> np.ndarray:
+        n = self.meta["n_rows"]
+        if n == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        return np.memmap(self._spans_path, dtype=np.int64, mode="r", shape=(n, 2))
+
+    def query(
+        self,
+        text: str,
+        top_k: int = 5,
+        pairs_per_doc: int = 3,
+        exclude: Iterable[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """
+        text와 가장 비슷한 문서 top_k개.
+        문서 점수 = 문서 청크와 질의 청크 사이의 최대 코사인 유사도.
+        coverage = 질의 청크 중 그 문서에서 가장 비슷한 청크를 찾은 비율.
+        matches  = 가장 비슷한 (질의 청크, 문서 청크 위치) 쌍.
+        """
+        text = as_document(text).strip()
+        vectors, rows = self._matrix()
+        if not text or len(vectors) == 0:
+            return []
+
+        q_spans = embedding_chunk_spans(self.embedder, text)
+        q = text.embed(self.embedder, q_spans, batch_size=_ENCODE_BATCH)
+
+        scores = vectors @ q.T  # (청크 수, 질의 청크 수)
+        best_q = scores.argmax(axis=1)
+        best = scores[np.arange(len(best_q)), best_q]
+
+        n_docs = len(self.meta["docs"])
+        alive = np.asarray(rows) >= 0
+        for doc_id in exclude:
+            if doc_id in self._by_id:
+                alive &= np.asarray(rows) != self._by_id[doc_id]
+        doc_best = np.full(n_docs, -np.inf, dtype=np.float32)
+        np.maximum.at(doc_best, rows[alive], best[alive])
+
+        k = min(top_k, int(np.isfinite(doc_best).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-doc_best, k - 1)[:k]
+        top = top[np.argsort(-doc_best[top])]
+
+        # 질의 청크별로 가장 비슷한 문서 (coverage 계산용)
+        masked = np.where(alive[:, None], scores, -np.inf)
+        q_best_row = masked.argmax(axis=0)
+        q_best_doc = np.asarray(rows)[q_best_row]
+
+        spans = self._spans()
+        results = []
+        for doc_no in top:
+            doc = self.meta["docs"][doc_no]
+            sl = slice(doc["first_row"], doc["first_row"] + doc["n_chunks"])
+            doc_scores = best[sl]
+            order = np.argsort(-doc_scores)[:pairs_per_doc]
+            matches = []
+            for r in order:
+                qs, qe = q_spans[int(best_q[sl][r])]
+                ds, de = (int(x) for x in spans[doc["first_row"] + r])
+                matches.append({
+                    "score": round(float(doc_scores[r]), 4),
+                    "query_chunk": text[qs:qe],
+                    "doc_start": ds,
+                    "doc_end": de,
+                })
+            results.append({
+                "doc_id": doc["id"],
+                "score": round(float(doc_best[doc_no]), 4),
+                "coverage": round(float((q_best_doc == doc_no).mean()), 4),
+                "matches": matches,
+            })
+        return results
@@ -1,26 +1,186 @@
 from __future__ import annotations
-from typing import Any, Optional
-from transformers import pipeline
+from typing import Any, Iterable, List, Optional
+
+from .backends import build_pipeline
+from .cache import cached, cached_map, model_name_of
+from .document import as_document
+from .instrumentation import stage
 
 _MODEL_NAME = "facebook/bart-large-cnn"
 _summarizer: Optional[Any] = None
 
+# bart-large-cnn 입력 한계는 1024 토큰. special token 여유를 두고 청크를 자름
+_CHUNK_TOKENS = 900
+_OVERLAP_TOKENS = 64
+_BATCH_SIZE = 8
+_MAX_DEPTH = 3
+# 평균 16문장마다 내용 기준 청크 경계 (고친 곳 근처 청크만 다시 요약)
+_ANCHOR_EVERY = 16
+
 
 def load_summarizer(model_name: str = _MODEL_NAME) -> Any:
     global _summarizer
     if _summarizer is None:
-        _summarizer = pipeline("summarization", model=model_name)
+        _summarizer = build_pipeline("summarization", model_name, task="summarization")
     return _summarizer
 
 
-def run_summarization(summarizer: Any, text: str, max_len: int = 130, min_len: int = 30) -> str:
-    text = (text or "").strip()
-    if not text:
-        return ""
+def unload_summarizer() -> None:
+    global _summarizer
+    _summarizer = None
+
+
+def _summarize_batch(summarizer: Any, texts: List[str], max_len: int, min_len: int, batch_size: int) -> List[str]:
+    if not texts:
+        return []
+    with stage("generate"):
+        out = summarizer(
+            texts,
+            max_length=max_len,
+            min_length=min_len,
+            do_sample=False,
+            truncation=True,
+            batch_size=batch_size,
+        )
+    return [(o.get("summary_text", "") if o else "").strip() for o in out]
+
+
+def _summarize_chunk_batch(summarizer: Any, chunks: List[str], max_len: int, min_len: int, batch_size: int) -> List[str]:
+    """map 단계: 청크별 요약을 청크 캐시에서 찾고, 바뀐(처음 보는) 청크만 요약."""
+    return cached_map(
+        "summarization_chunk",
+        model_name_of(summarizer),
+        {"max_len": max_len, "min_len": min_len},
+        chunks,
+        lambda todo: _summarize_batch(summarizer, todo, max_len, min_len, batch_size),
+    )
+
+
+def summarize_many(
+    summarizer: Any,
+    texts: List[str],
+    max_len: int = 130,
+    min_len: int = 30,
+    chunk_tokens: int = _CHUNK_TOKENS,
+    overlap_tokens: int = _OVERLAP_TOKENS,
+    batch_size: int = _BATCH_SIZE,
+    max_depth: int = _MAX_DEPTH,
+) -> List[str]:
+    """
+    여러 문서를 map-reduce 방식으로 요약.
+    모델 입력 한계를 넘는 문서는 겹치는 청크로 나눠 (모든 문서의 청크를 한 번에) 배치 요약하고,
+    청크 요약을 이어 붙인 결과가 다시 한계를 넘으면 max_depth 단계까지 반복해서 줄임.
+    청크 경계는 내용 기준이고 청크 요약은 청크 캐시에 남으므로, 문서를 조금 고쳐 다시 요약하면
+    바뀐 청크와 reduce 단계만 다시 계산함.
+    """
+    results: List[str] = [""] * len(texts)
+    current: dict[int, str] = {}
+    for i, text in enumerate(texts):
+        text = as_document(text).strip()
+        # 너무 짧으면 요약이 오히려 이상해질 수 있어 그대로 반환
+        if not text or len(text.split()) < 20:
+            results[i] = text
+        else:
+            current[i] = text
+
+    tokenizer = getattr(summarizer, "tokenizer", None)
+    for _depth in range(max_depth if tokenizer is not None else 0):
+        with stage("tokenize"):
+            # Document면 같은 토크나이저 / 청크 설정으로 나눈 결과를 재사용
+            chunked = {
+                i: as_document(t).chunks(tokenizer, chunk_tokens, overlap_tokens, _ANCHOR_EVERY)
+                for i, t in current.items()
+            }
+        long_docs = [i for i, chunks in chunked.items() if len(chunks) > 1]
+        if not long_docs:
+            break
+
+        flat = [c for i in long_docs for c in chunked[i]]
+        summaries = _summarize_chunk_batch(summarizer, flat, max_len, min_len, batch_size)
+        pos = 0
+        for i in long_docs:
+            n = len(chunked[i])
+            current[i] = "\n".join(s for s in summaries[pos:pos + n] if s)
+            pos += n
+
+    # 최종 요약 (max_depth 이후에도 길면 모델 입력 한계에서 잘림)
+    order = list(current)
+    finals = _summarize_batch(summarizer, [current[i] for i in order], max_len, min_len, batch_size)
+    for i, summary in zip(order, finals):
+        results[i] = summary
+    return results
+
+
+@cached("summarization", text_args=("text",), model_arg="summarizer")
+def run_summarization(
+    summarizer: Any,
+    text: str,
+    max_len: int = 130,
+    min_len: int = 30,
+    chunk_tokens: int = _CHUNK_TOKENS,
+    overlap_tokens: int = _OVERLAP_TOKENS,
+    batch_size: int = _BATCH_SIZE,
+    max_depth: int = _MAX_DEPTH,
+) -> str:
+    return summarize_many(
+        summarizer,
+        [text],
+        max_len=max_len,
+        min_len=min_len,
+        chunk_tokens=chunk_tokens,
+        overlap_tokens=overlap_tokens,
+        batch_size=batch_size,
+        max_depth=max_depth,
+    )[0]
+
+
+@cached("summarization_chunks", text_args=("chunks",), model_arg="summarizer")
+def summarize_chunks(
+    summarizer: Any,
+    chunks: List[str],
+    max_len: int = 130,
+    min_len: int = 30,
+    chunk_tokens: int = _CHUNK_TOKENS,
+    overlap_tokens: int = _OVERLAP_TOKENS,
+    batch_size: int = _BATCH_SIZE,
+    max_depth: int = _MAX_DEPTH,
+) -> str:
+    """
+    이미 나눠 둔 청크 목록(Document.chunks 등)을 요약 (map 단계의 청크 분할을 생략).
+    청크 요약을 이어 붙인 뒤의 reduce 단계는 summarize_many와 같음.
+    """
+    chunks = [c for c in chunks if (c or "").strip()]
+    if len(chunks) <= 1:
+        return run_summarization(summarizer, chunks[0] if chunks else "", max_len, min_len,
+                                 chunk_tokens, overlap_tokens, batch_size, max_depth)
+
+    summaries = _summarize_chunk_batch(summarizer, chunks, max_len, min_len, batch_size)
+    return summarize_many(
+        summarizer,
+        ["\n".join(s for s in summaries if s)],
+        max_len=max_len,
+        min_len=min_len,
+        chunk_tokens=chunk_tokens,
+        overlap_tokens=overlap_tokens,
+        batch_size=batch_size,
+        max_depth=max(0, max_depth - 1),
+    )[0]
 
-    # 너무 짧으면 요약이 오히려 이상해질 수 있어 그대로 반환
-    if len(text.split()) < 20:
-        return text
 
-    out = summarizer(text, max_length=max_len, min_length=min_len, do_sample=False)
-    return (out[0].get("summary_text", "") if out else "").strip()
+def summarize_stream(
+    summarizer: Any,
+    pieces: Iterable[str],
+    max_len: int = 130,
+    min_len: int = 30,
+    batch_size: int = _BATCH_SIZE,
+) -> str:
+    """
+    메모리에 한 번에 올리지 않는 큰 텍스트(LargeTextFile.iter_chunks 등)를 조각별로 요약한 뒤,
+    조각 요약을 이어 붙여 다시 요약. 메모리에는 조각 하나와 조각 요약들만 둠.
+    """
+    partial = [
+        summarize_many(summarizer, [piece], max_len, min_len, batch_size=batch_size)[0]
+        for piece in pieces
+    ]
+    joined = "\n".join(s for s in partial if s)
+    return summarize_many(summarizer, [joined], max_len, min_len, batch_size=batch_size)[0]
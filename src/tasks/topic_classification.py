@@ -1,6 +1,13 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
-from transformers import pipeline
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+
+from .backends import build_pipeline
+from .cache import cached
+from .instrumentation import stage
+from .document import as_document, encode_spans
+from .similarity import embedding_chunk_spans
 
 _MODEL_NAME = "facebook/bart-large-mnli"
 _classifier: Optional[Any] = None
@@ -10,20 +17,34 @@ DEFAULT_LABELS: List[str] = [
     "health", "sports", "politics", "entertainment", "general"
 ]
 
+# fast tier: 라벨 문장 임베딩(prototype)과 문서 청크 임베딩의 코사인 유사도로 분류
+TIERS = ("accurate", "fast")
+_PROTOTYPE_TEMPLATE = "This text is about {}."
+_FAST_TEMPERATURE = 0.05
+_FAST_BATCH = 64
+
+# (embedder id, 라벨 목록) -> (라벨 수, dim) prototype 행렬
+_prototypes: Dict[Tuple[int, Tuple[str, ...]], np.ndarray] = {}
+
 
 def load_topic_classifier(model_name: str = _MODEL_NAME) -> Any:
     global _classifier
     if _classifier is None:
-        _classifier = pipeline("zero-shot-classification", model=model_name)
+        _classifier = build_pipeline("zero-shot-classification", model_name, task="topic_classification")
     return _classifier
 
 
-def run_topic_classification(classifier: Any, text: str, labels: List[str] = DEFAULT_LABELS) -> Dict:
-    text = (text or "").strip()
-    if not text:
-        return {"error": "text가 비어 있습니다.", "top_label": "general", "top_score": 0.0}
+def unload_topic_classifier() -> None:
+    global _classifier
+    _classifier = None
+
+
+def clear_prototypes() -> None:
+    """embedder가 바뀌면 이전 embedder로 만든 prototype을 버림."""
+    _prototypes.clear()
 
-    out = classifier(text, candidate_labels=labels)
+
+def _to_result(out: Dict) -> Dict:
     if not out:
         return {"top_label": "general", "top_score": 0.0}
 
@@ -35,3 +56,160 @@ def run_topic_classification(classifier: Any, text: str, labels: List[str] = DEF
         "labels": out.get("labels", []),
         "scores": out.get("scores", []),
     }
+
+
+def run_topic_classification_many(
+    classifier: Any,
+    texts: List[str],
+    labels: List[str] = DEFAULT_LABELS,
+    batch_size: int = 8,
+) -> List[Dict]:
+    """여러 텍스트를 한 번의 배치 호출로 분류."""
+    results: List[Dict] = [
+        {"error": "text가 비어 있습니다.", "top_label": "general", "top_score": 0.0} for _ in texts
+    ]
+    idx = [i for i, t in enumerate(texts) if (t or "").strip()]
+    if not idx:
+        return results
+
+    with stage("inference"):
+        out = classifier([texts[i].strip() for i in idx], candidate_labels=labels, batch_size=batch_size)
+    if isinstance(out, dict):
+        out = [out]
+    for i, o in zip(idx, out):
+        results[i] = _to_result(o)
+    return results
+
+
+def _label_prototypes(embedder: Any, labels: List[str]) -> np.ndarray:
+    key = (id(embedder), tuple(labels))
+    if key not in _prototypes:
+        _prototypes[key] = np.asarray(
+            embedder.encode(
+                [_PROTOTYPE_TEMPLATE.format(label) for label in labels],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ),
+            dtype=np.float32,
+        )
+    return _prototypes[key]
+
+
+def run_fast_topic_classification(
+    embedder: Any,
+    texts: Union[str, List[str]],
+    labels: List[str] = DEFAULT_LABELS,
+    batch_size: int = _FAST_BATCH,
+) -> Union[Dict, List[Dict]]:
+    """
+    임베딩 기반 빠른 주제 분류. 모델 입력보다 긴 문서는 청크로 나눠 청크 점수를 길이 가중 평균.
+    모든 문서의 청크를 한 번의 배치로 임베딩함. texts가 목록이면 결과도 목록.
+    """
+    single = isinstance(texts, str)
+    docs = [as_document(t).strip() for t in ([texts] if single else texts)]
+    results: List[Dict] = [
+        {"error": "text가 비어 있습니다.", "top_label": "general", "top_score": 0.0} for _ in docs
+    ]
+
+    items = []
+    owners: List[int] = []
+    weights: List[int] = []
+    for i, doc in enumerate(docs):
+        if not doc:
+            continue
+        spans = embedding_chunk_spans(embedder, doc) or [(0, len(doc))]
+        items.append((doc, spans))
+        for s, e in spans:
+            owners.append(i)
+            weights.append(e - s)
+
+    if items:
+        with stage("embed"):
+            protos = _label_prototypes(embedder, labels)
+            # Document에 이미 있는 청크 임베딩(표절 검사 등에서 계산)은 다시 계산하지 않음
+            emb = np.concatenate(encode_spans(embedder, items, batch_size=batch_size))
+        logits = (emb @ protos.T) / _FAST_TEMPERATURE
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        owners_arr = np.asarray(owners)
+        weights_arr = np.asarray(weights, dtype=np.float32)
+        for i in sorted(set(owners)):
+            mask = owners_arr == i
+            doc_probs = np.average(probs[mask], axis=0, weights=weights_arr[mask])
+            order = np.argsort(-doc_probs)
+            results[i] = {
+                "top_label": labels[order[0]],
+                "top_score": float(doc_probs[order[0]]),
+                "labels": [labels[j] for j in order],
+                "scores": [float(doc_probs[j]) for j in order],
+                "tier": "fast",
+            }
+
+    return results[0] if single else results
+
+
+@cached("topic_classification", text_args=("text",), model_arg="classifier")
+def run_topic_classification(
+    classifier: Any,
+    text: str,
+    labels: List[str] = DEFAULT_LABELS,
+    tier: str = "accurate",
+    embedder: Any = None,
+) -> Dict:
+    """
+    tier="accurate": bart-large-mnli zero-shot (라벨마다 forward 1회)
+    tier="fast"    : MiniLM 라벨 prototype 유사도 (classifier 없이 embedder만 사용)
+    """
+    if tier not in TIERS:
+        raise ValueError(f"알 수 없는 tier입니다: {tier} (가능: {', '.join(TIERS)})")
+    if tier == "fast":
+        if embedder is None:
+            # 메모리 한도 밖에서 모델을 따로 올리지 않도록 PipelineRegistry의 embedder를 받아야 함
+            raise ValueError("tier=\"fast\"에는 embedder가 필요합니다.")
+        return run_fast_topic_classification(embedder, text, labels)
+
+    text = (text or "").strip()
+    if not text:
+        return {"error": "text가 비어 있습니다.", "top_label": "general", "top_score": 0.0}
+
+    with stage("inference"):
+        out = classifier(text, candidate_labels=labels)
+    return _to_result(out)
+
+
+def benchmark_tiers(
+    classifier: Any,
+    embedder: Any,
+    texts: List[str],
+    labels: List[str] = DEFAULT_LABELS,
+) -> Dict:
+    """
+    같은 텍스트 목록에 두 tier를 실행해서 문서당 지연 시간과 tier 간 일치율을 비교.
+    (결과 캐시를 거치지 않도록 배치 함수를 직접 호출)
+    """
+    texts = [t for t in texts if (t or "").strip()]
+    if not texts:
+        return {"error": "비교할 텍스트가 없습니다."}
+
+    start = time.perf_counter()
+    accurate = run_topic_classification_many(classifier, texts, labels)
+    accurate_time = time.perf_counter() - start
+
+    _prototypes.clear()
+    start = time.perf_counter()
+    fast = run_fast_topic_classification(embedder, texts, labels)
+    fast_time = time.perf_counter() - start
+
+    top1 = [a["top_label"] == f["top_label"] for a, f in zip(accurate, fast)]
+    # fast tier의 top label이 accurate tier의 상위 3개 안에 드는 비율
+    top3 = [f["top_label"] in a.get("labels", [])[:3] for a, f in zip(accurate, fast)]
+    return {
+        "documents": len(texts),
+        "accurate_sec_per_doc": round(accurate_time / len(texts), 4),
+        "fast_sec_per_doc": round(fast_time / len(texts), 4),
+        "speedup": round(accurate_time / fast_time, 1) if fast_time > 0 else None,
+        "top1_agreement": round(sum(top1) / len(texts), 3),
+        "fast_in_accurate_top3": round(sum(top3) / len(texts), 3),
+    }
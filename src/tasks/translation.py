@@ -1,24 +1,112 @@
 from __future__ import annotations
-from typing import Any, Optional
-from transformers import pipeline
+from typing import Any, Dict, List, Optional, Sequence
+
+from .backends import build_pipeline
+from .cache import cached
+from .chunking import join_with_separators, split_long_spans, split_with_separators, token_lengths
+from .document import as_document
+from .instrumentation import stage
+
+# 번역 방향 -> 모델
+DIRECTION_MODELS: Dict[str, str] = {
+    "ko-en": "Helsinki-NLP/opus-mt-ko-en",
+    "en-ko": "Helsinki-NLP/opus-mt-tc-big-en-ko",
+}
 
 # 기본: 한국어 → 영어
-_DEFAULT_MODEL = "Helsinki-NLP/opus-mt-ko-en"
-_translator: Optional[Any] = None
-_loaded_model: Optional[str] = None
+_DEFAULT_MODEL = DIRECTION_MODELS["ko-en"]
+
+# opus-mt 입력 한계(512)보다 여유 있게 문장을 자름
+_MAX_SENTENCE_TOKENS = 400
+_BATCH_SIZE = 16
 
 
 def load_translator(model_name: str = _DEFAULT_MODEL) -> Any:
-    global _translator, _loaded_model
-    if _translator is None or _loaded_model != model_name:
-        _translator = pipeline("translation", model=model_name)
-        _loaded_model = model_name
-    return _translator
+    """
+    번역 파이프라인을 새로 만듦. 모듈에 따로 두지 않고, 방향별로 PipelineRegistry
+    ("translator" / "translator_en_ko")가 들고 있다가 메모리 한도에 따라 내림.
+    """
+    return build_pipeline("translation", model_name, task="translation")
+
+
+def load_translator_for(direction: str) -> Any:
+    """번역 방향("ko-en", "en-ko")으로 파이프라인을 가져옴."""
+    if direction not in DIRECTION_MODELS:
+        raise ValueError(f"지원하지 않는 번역 방향입니다: {direction} (가능: {', '.join(DIRECTION_MODELS)})")
+    return load_translator(DIRECTION_MODELS[direction])
+
+
+def _translate_sentences(
+    translator: Any,
+    sentences: List[str],
+    batch_size: int,
+    lengths: Optional[Sequence[int]] = None,
+) -> List[str]:
+    """
+    문장 목록을 길이가 비슷한 것끼리 묶어서 배치 번역 (padding 낭비를 줄임).
+    모델 입력 한계를 넘는 문장은 단어 경계에서 나눠 번역한 뒤 다시 이어 붙임.
+    lengths: 이미 계산한 문장별 토큰 수 (없으면 여기서 계산)
+    """
+    tokenizer = getattr(translator, "tokenizer", None)
+    if lengths is None:
+        with stage("tokenize"):
+            if tokenizer is not None:
+                lengths = token_lengths(tokenizer, sentences)
+            else:
+                lengths = [len(s.split()) for s in sentences]
+
+    pieces: List[str] = []
+    owners: List[int] = []
+    piece_lengths: List[int] = []
+    for i, (sentence, n) in enumerate(zip(sentences, lengths)):
+        for (s, e), m in split_long_spans(sentence, [(0, len(sentence))], [n], _MAX_SENTENCE_TOKENS):
+            pieces.append(sentence[s:e])
+            owners.append(i)
+            piece_lengths.append(m)
+
+    order = sorted(range(len(pieces)), key=lambda j: piece_lengths[j])
+    translated = [""] * len(pieces)
+    for b in range(0, len(order), max(1, batch_size)):
+        bucket = order[b:b + max(1, batch_size)]
+        with stage("generate"):
+            out = translator([pieces[j] for j in bucket], batch_size=len(bucket), truncation=True)
+        for j, o in zip(bucket, out):
+            translated[j] = (o.get("translation_text", "") if o else "").strip()
+
+    results: List[List[str]] = [[] for _ in sentences]
+    for j, owner in enumerate(owners):
+        results[owner].append(translated[j])
+    return [" ".join(parts) for parts in results]
+
+
+def run_translation_many(translator: Any, texts: List[str], batch_size: int = _BATCH_SIZE) -> List[str]:
+    """
+    여러 텍스트를 문장 단위로 나눠 한 번의 (길이별 배치) 번역으로 처리하고,
+    원래 문단/줄바꿈 구조대로 다시 합침.
+    """
+    tokenizer = getattr(translator, "tokenizer", None)
+    docs = [as_document(t).strip() for t in texts]
+    lengths: List[int] = []
+    with stage("tokenize"):
+        # Document면 문장 분할과 문장별 토큰 수를 재사용
+        split = [split_with_separators(doc, doc.sentence_spans()) for doc in docs]
+        for doc in docs:
+            lengths.extend(doc.sentence_token_lengths(tokenizer))
+    flat = [s for sentences, _seps in split for s in sentences]
+    translated = _translate_sentences(translator, flat, batch_size, lengths) if flat else []
+
+    results: List[str] = []
+    pos = 0
+    for sentences, seps in split:
+        parts = translated[pos:pos + len(sentences)]
+        pos += len(sentences)
+        results.append(join_with_separators(parts, seps).strip())
+    return results
 
 
-def run_translation(translator: Any, text: str) -> str:
-    text = (text or "").strip()
+@cached("translation", text_args=("text",), model_arg="translator")
+def run_translation(translator: Any, text: str, batch_size: int = _BATCH_SIZE) -> str:
+    text = as_document(text).strip()
     if not text:
         return ""
-    out = translator(text)
-    return (out[0].get("translation_text", "") if out else "").strip()
+    return run_translation_many(translator, [text], batch_size=batch_size)[0]
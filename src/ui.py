@@ -16,17 +16,21 @@ def print_header(title: str) -> None:
     print("=" * 60)
 
 
-def print_current_text_preview(text: str, max_chars: int = 120) -> None:
+def print_current_text_preview(text: str, max_chars: int = 120, note: str = "") -> None:
     print("\n[현재 텍스트 미리보기]")
-    if not text.strip():
+    # isspace()는 복사 없이 첫 글자부터 검사하므로, 긴 텍스트도 앞부분만 보고 끝남
+    if not text or text.isspace():
         print("  (현재 텍스트 없음)")
         print("-" * 60)
         return
 
-    preview = text.replace("\n", " ")
-    if len(preview) > max_chars:
+    # 화면에 보일 앞부분만 잘라서 줄바꿈을 바꿈 (전체 텍스트를 복사하지 않음)
+    preview = text[:max_chars].replace("\n", " ")
+    if len(text) > max_chars:
         preview = preview[: max_chars - 3] + "..."
     print(f"  {preview}")
+    if note:
+        print(f"  ({note})")
     print("-" * 60)
 
 
@@ -45,10 +49,12 @@ def print_main_menu() -> None:
     print("  [6] Keyword Extraction (키워드 추출)")
     print("  [7] Similarity Check (유사도 검사)")
     print("  [8] Grammar Correction (문법 교정)")
+    print("  [9] Corpus Plagiarism Check (data/ 폴더 전체와 비교)")
     print("  [P] PDF Smart Analysis (요약+주제+키워드)")
     print()
-    print("히스토리 & 종료")
+    print("히스토리 & 상태 & 종료")
     print("  [H] 히스토리 보기")
+    print("  [S] 모델 로드 상태 보기")
     print("  [Q] 종료")
     print("-" * 60)
 
@@ -88,8 +94,24 @@ def print_result_block(title: str, data: Any) -> None:
     print("=" * 60 + "\n")
 
 
-def print_history_list(files: list[str]) -> None:
+def print_history_list(entries: list[dict]) -> None:
     print("\n=== Saved Histories ===")
-    for idx, name in enumerate(files, start=1):
-        print(f"[{idx}] {name}")
+    for idx, entry in enumerate(entries, start=1):
+        print(f"[{idx}] #{entry['id']} {entry['timestamp']} {entry['task']}")
     print("=======================\n")
+
+
+def print_model_status(status: dict[str, dict]) -> None:
+    print("\n=== Model Status ===")
+    for name, info in status.items():
+        line = f"- {name:<18} {info.get('state', '')}"
+        if "load_time" in info:
+            line += f" ({info['load_time']:.1f}s)"
+        if "size_mb" in info:
+            line += f" ~{info['size_mb']:.0f}MB"
+        if "evictions" in info:
+            line += f" [evicted x{info['evictions']}]"
+        if "error" in info:
+            line += f" [error: {info['error']}]"
+        print(line)
+    print("====================\n")
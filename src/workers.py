@@ -0,0 +1,235 @@
+# StudyTextLab - Batch Worker Pool
+#
+# N개 worker 프로세스 x 프로세스당 M개 PyTorch 스레드로 문서 묶음을 나눠 처리.
+# - 문서를 큰 것부터 정렬해 묶음(unit)으로 만들고 공유 큐에 넣음.
+#   쉬는 worker가 다음 묶음을 가져가므로 문서 길이가 고르지 않아도 한 worker에 일이 몰리지 않음.
+# - worker는 자기 묶음에 필요한 모델만 처음 사용할 때 로드 (prewarm 없음).
+# - CPU 코어가 충분하면 worker마다 서로 다른 코어 M개에 고정 (Linux).
+# - 끝나면 worker별 처리 시간 / 대기 시간 / 사용률을 보고.
+#
+# torch를 import하기 전에 스레드 수를 정해야 하므로 이 모듈은 모델 관련 모듈을 위에서 import하지 않음.
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+# 묶음 하나에 넣을 최대 파일 크기 합 (긴 문서는 혼자 한 묶음이 됨)
+_UNIT_BYTES = 256 * 1024
+_POLL_SEC = 0.5
+
+
+def available_cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_threads(workers: int) -> int:
+    return max(1, len(available_cores()) // max(1, workers))
+
+
+def configure_threads(threads: int, cores: list[int] | None = None) -> None:
+    """현재 프로세스의 PyTorch/BLAS 스레드 수를 정하고, cores가 있으면 그 코어에 고정."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    # tokenizers(Rust)의 자체 병렬화도 worker끼리 코어를 다투지 않게 끔
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 이미 병렬 작업이 실행된 뒤에는 바꿀 수 없음
+        pass
+
+
+def make_units(paths: list[Path], batch_size: int, unit_bytes: int = _UNIT_BYTES) -> list[list[Path]]:
+    """
+    큰 문서부터 정렬해서 최대 batch_size개 / unit_bytes 크기까지 묶음.
+    큰 묶음이 먼저 처리되므로 마지막에 긴 문서 하나만 남아 다른 worker가 노는 시간이 줄어듦.
+    """
+    def size(p: Path) -> int:
+        try:
+            return p.stat().st_size
+        except OSError:
+            return 0
+
+    units: list[list[Path]] = []
+    current: list[Path] = []
+    current_bytes = 0
+    for path in sorted(paths, key=size, reverse=True):
+        n = size(path)
+        if current and (len(current) >= batch_size or current_bytes + n > unit_bytes):
+            units.append(current)
+            current, current_bytes = [], 0
+        current.append(path)
+        current_bytes += n
+    if current:
+        units.append(current)
+    return units
+
+
+def _worker_main(
+    worker_id: int,
+    threads: int,
+    cores: list[int] | None,
+    args: argparse.Namespace,
+    input_dir: Path,
+    task_queue: Any,
+    result_queue: Any,
+) -> None:
+    started = time.perf_counter()
+    configure_threads(threads, cores)
+
+    # 스레드 설정 후에 모델 관련 모듈을 읽음
+    from batch import process_documents
+    from pipelines import PipelineRegistry
+    from tasks.cache import configure_cache
+
+    if args.cache_dir is not None:
+        configure_cache(disk_dir=args.cache_dir)
+    pipelines = PipelineRegistry()
+
+    busy = idle = 0.0
+    units = docs = 0
+    setup = time.perf_counter() - started
+    while True:
+        wait_start = time.perf_counter()
+        unit = task_queue.get()
+        idle += time.perf_counter() - wait_start
+        if unit is None:
+            break
+
+        work_start = time.perf_counter()
+        try:
+            records = process_documents(pipelines, input_dir, unit, args)
+        except Exception as e:
+            records = [
+                {"path": p.relative_to(input_dir).as_posix(), "error": f"worker {worker_id}: {e}", "tasks": {}}
+                for p in unit
+            ]
+        busy += time.perf_counter() - work_start
+        units += 1
+        docs += len(unit)
+        result_queue.put(("records", worker_id, records))
+
+    wall = time.perf_counter() - started
+    result_queue.put((
+        "stats",
+        worker_id,
+        {
+            "worker": worker_id,
+            "threads": threads,
+            "cores": cores,
+            "units": units,
+            "docs": docs,
+            "setup_sec": round(setup, 2),
+            "busy_sec": round(busy, 2),
+            "idle_sec": round(idle, 2),
+            "wall_sec": round(wall, 2),
+            # 모델 로드 시간은 처음 묶음을 처리할 때 busy에 포함됨
+            "model_load_sec": {
+                name: info["load_time"] for name, info in pipelines.status().items() if "load_time" in info
+            },
+            "utilisation": round(busy / wall, 3) if wall > 0 else None,
+        },
+    ))
+
+
+class WorkerPool:
+    """batch 모드용 프로세스 풀. run()이 완료되는 순서대로 문서 기록 묶음을 돌려줌."""
+
+    def __init__(self, processes: int, threads: int, args: argparse.Namespace):
+        self.processes = max(1, processes)
+        self.threads = max(1, threads)
+        self.args = args
+        self.stats: dict[int, dict] = {}
+        self.wall_sec: float | None = None
+
+    def _core_sets(self) -> list[list[int] | None]:
+        cores = available_cores()
+        if len(cores) < self.processes * self.threads:
+            # 코어가 모자라면 고정하지 않고 OS 스케줄러에 맡김
+            return [None] * self.processes
+        return [cores[i * self.threads:(i + 1) * self.threads] for i in range(self.processes)]
+
+    def run(self, input_dir: Path, paths: list[Path]) -> Iterator[list[dict]]:
+        units = make_units(paths, max(1, self.args.batch_size))
+        if not units:
+            return
+        # fork는 torch 스레드 풀 상태를 그대로 복사하므로 spawn 사용
+        ctx = mp.get_context("spawn")
+        task_queue = ctx.Queue()
+        result_queue = ctx.Queue()
+        for unit in units:
+            task_queue.put(unit)
+        n = min(self.processes, len(units))
+        for _ in range(n):
+            task_queue.put(None)
+
+        started = time.perf_counter()
+        procs = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, self.threads, cores, self.args, input_dir, task_queue, result_queue),
+                name=f"batch-worker-{i}",
+                daemon=True,
+            )
+            for i, cores in enumerate(self._core_sets()[:n])
+        ]
+        for p in procs:
+            p.start()
+
+        pending = len(units)
+        finished: set[int] = set()
+        try:
+            while pending > 0 or len(finished) < n:
+                try:
+                    kind, worker_id, payload = result_queue.get(timeout=_POLL_SEC)
+                except queue.Empty:
+                    dead = [i for i, p in enumerate(procs) if not p.is_alive() and i not in finished]
+                    if dead and all(not p.is_alive() for p in procs):
+                        # 모든 worker가 끝났는데 남은 묶음이 있음 (worker 비정상 종료)
+                        print(f"[ERROR] worker {dead}가 비정상 종료되었습니다.", file=sys.stderr)
+                        break
+                    continue
+                if kind == "records":
+                    pending -= 1
+                    yield payload
+                else:
+                    self.stats[worker_id] = payload
+                    finished.add(worker_id)
+        finally:
+            self.wall_sec = time.perf_counter() - started
+            for p in procs:
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+
+    def report_lines(self) -> list[str]:
+        lines = []
+        for worker_id in sorted(self.stats):
+            s = self.stats[worker_id]
+            lines.append(
+                f"[INFO] worker {worker_id}: 문서 {s['docs']}개 / 묶음 {s['units']}개, "
+                f"처리 {s['busy_sec']:.1f}s, 대기 {s['idle_sec']:.1f}s, 사용률 {s['utilisation']:.0%}"
+                f" (스레드 {s['threads']}, 코어 {s['cores'] if s['cores'] else '고정 안 함'})"
+            )
+        if self.stats and self.wall_sec:
+            busy = sum(s["busy_sec"] for s in self.stats.values())
+            lines.append(
+                f"[INFO] 전체 {self.wall_sec:.1f}s, 평균 사용률 {busy / (self.wall_sec * len(self.stats)):.0%}"
+            )
+        return lines
@@ -0,0 +1,39 @@
+# StudyTextLab - pytest 공통 설정
+#
+# src/ 모듈은 `python main.py`처럼 src를 작업 폴더로 두고 import하므로 테스트에서도 src를 경로에 넣음.
+# 모델이 필요한 테스트는 benchmark.py의 stub 파이프라인을 씀 (다운로드 없음).
+
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    """테스트마다 새 결과 캐시 (메모리 + tmp_path의 sqlite). 끝나면 환경 변수 기준 캐시로 되돌림."""
+    from tasks import cache
+
+    saved = cache._cache, cache._chunk_cache
+    yield cache.configure_cache(max_entries=8, disk_dir=tmp_path / "cache")
+    cache._cache, cache._chunk_cache = saved
+
+
+@pytest.fixture
+def stubs():
+    """benchmark.py의 stub 파이프라인 / 임베더가 있는 모듈."""
+    return pytest.importorskip("benchmark")
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    """tmp_path에 새 history DB를 쓰는 history 모듈 (예전 *.json 파일도 tmp_path에서 찾음)."""
+    import history
+
+    monkeypatch.setattr(history, "HISTORY_DIR", tmp_path)
+    monkeypatch.setattr(history, "HISTORY_DB", tmp_path / "history.sqlite3")
+    monkeypatch.setattr(history, "_initialized", False)
+    return history
@@ -0,0 +1,106 @@
+from tasks import cache
+from tasks.cache import ResultCache, cached, make_key, speculative, text_hash
+from tasks.document import Document
+from tasks.instrumentation import trace
+
+
+def _counting(calls):
+    @cached("echo", text_args=("text",), model_name="stub/echo")
+    def echo(text, upper=False):
+        calls.append(text)
+        return text.upper() if upper else text
+
+    return echo
+
+
+def test_key_same_for_document_and_str():
+    text = "First sentence.\r\nSecond sentence.  "
+    assert text_hash(Document(text)) == text_hash(text)
+    assert make_key("t", "m", {"a": 1}, {"text": Document(text)}) == make_key("t", "m", {"a": 1}, {"text": text})
+
+
+def test_key_changes_with_params_and_model():
+    base = make_key("t", "m", {"a": 1}, {"text": "x"})
+    assert make_key("t", "m", {"a": 2}, {"text": "x"}) != base
+    assert make_key("t", "m@int8", {"a": 1}, {"text": "x"}) != base
+
+
+def test_cached_hit_for_document_after_str(result_cache):
+    calls = []
+    echo = _counting(calls)
+    assert echo("hello world") == "hello world"
+    assert echo(Document("hello world\n")) == "hello world"
+    assert echo("hello world", upper=True) == "HELLO WORLD"
+    assert calls == ["hello world", "hello world"]
+    assert result_cache.hits == 1
+
+
+def test_cached_model_arg_uses_model_name(result_cache, stubs):
+    @cached("tag", text_args=("text",), model_arg="model")
+    def tag(model, text):
+        return model.model.name_or_path
+
+    assert tag(stubs.StubPipeline("summarization"), "abc") == "stub/summarization"
+    # 모델이 다르면 키도 다름
+    assert tag(stubs.StubPipeline("translation"), "abc") == "stub/translation"
+
+
+def test_memory_miss_falls_back_to_sqlite(tmp_path):
+    path = tmp_path / "results.sqlite3"
+    first = ResultCache(max_entries=4, disk_path=path)
+    first.put("k", {"answer": [1, 2]})
+
+    # 새 프로세스처럼 메모리가 빈 캐시
+    second = ResultCache(max_entries=4, disk_path=path)
+    assert second.get("k") == (True, {"answer": [1, 2]})
+    assert second.disk_hits == 1
+    # 디스크에서 읽은 값은 메모리에도 올라감
+    assert second.get("k") == (True, {"answer": [1, 2]})
+    assert second.disk_hits == 1
+    assert second.hits == 2
+
+
+def test_memory_lru_evicts_oldest():
+    c = ResultCache(max_entries=2)
+    c.put("a", 1)
+    c.put("b", 2)
+    c.get("a")
+    c.put("c", 3)
+    assert c.get("b") == (False, None)
+    assert c.get("a") == (True, 1)
+
+
+def test_size_zero_disables_cache():
+    saved = cache._cache, cache._chunk_cache
+    try:
+        cache.configure_cache(max_entries=0)
+        assert not cache.get_cache().enabled
+        assert not cache.get_chunk_cache().enabled
+        calls = []
+        echo = _counting(calls)
+        echo("same text")
+        echo("same text")
+        assert calls == ["same text", "same text"]
+        assert cache.get_cache().stats()["entries"] == 0
+    finally:
+        cache._cache, cache._chunk_cache = saved
+
+
+def test_speculative_counters(result_cache):
+    calls = []
+    echo = _counting(calls)
+    with speculative():
+        echo("precomputed")
+        # 미리 실행 중 다시 읽은 것은 사용으로 세지 않음
+        echo("precomputed")
+    assert result_cache.speculative_stored == 1
+    assert result_cache.speculative_used == 0
+
+    with trace("echo") as run:
+        echo("precomputed")
+        echo("precomputed")
+    assert calls == ["precomputed"]
+    # 처음 꺼내 간 한 번만 셈
+    assert result_cache.speculative_used == 1
+    assert run.counters["speculative_hits"] == 1
+    assert run.counters["cache_hits"] == 2
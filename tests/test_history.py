@@ -0,0 +1,90 @@
+import json
+import sqlite3
+
+LONG_TEXT = "Lecture notes about climate policy and energy markets. " * 4
+
+
+def _count(history, table):
+    conn = sqlite3.connect(str(history.HISTORY_DB))
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_long_input_text_stored_once(history_db):
+    first = history_db.save_history("summarization", {"text": LONG_TEXT}, "summary")
+    second = history_db.save_history("sentiment", {"text": LONG_TEXT, "short": "hi"}, {"label": "POSITIVE"})
+    assert _count(history_db, "texts") == 1
+
+    entry = history_db.load_history(second)
+    assert entry["input"] == {"text": LONG_TEXT, "short": "hi"}
+    assert history_db.load_history(first)["input"]["text"] == LONG_TEXT
+
+
+def test_store_texts_keeps_short_strings_inline(history_db):
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(history_db._SCHEMA)
+    stored = history_db._store_texts(conn, {"q": "short", "pages": [LONG_TEXT, LONG_TEXT], "n": 3})
+    ref = stored["pages"][0]
+    assert stored["q"] == "short" and stored["n"] == 3
+    assert set(ref) == {history_db._TEXT_REF}
+    assert stored["pages"][1] == ref
+    assert conn.execute("SELECT COUNT(*) FROM texts").fetchone()[0] == 1
+    assert history_db._resolve_texts(conn, stored)["pages"] == [LONG_TEXT, LONG_TEXT]
+
+
+def test_metrics_saved_with_run(history_db):
+    run_id = history_db.save_history("qa", {"q": "x"}, "y", metrics={"wall_time": 0.5})
+    assert history_db.load_history(run_id)["metrics"] == {"wall_time": 0.5}
+
+
+def test_metrics_function_called_once(history_db):
+    calls = []
+
+    def final_metrics():
+        calls.append(1)
+        return {"stages": {"history_write": 0.01}}
+
+    run_id = history_db.save_history("summarization", {"text": LONG_TEXT}, "s", metrics=final_metrics)
+    assert calls == [1]
+    assert history_db.load_history(run_id)["metrics"] == {"stages": {"history_write": 0.01}}
+
+
+def test_before_id_pagination(history_db):
+    ids = [history_db.save_history("qa" if i % 2 else "summarization", {"i": i}, i) for i in range(7)]
+
+    page1 = history_db.list_history(limit=3)
+    assert [r["id"] for r in page1] == ids[::-1][:3]
+    page2 = history_db.list_history(limit=3, before_id=page1[-1]["id"])
+    assert [r["id"] for r in page2] == ids[::-1][3:6]
+    page3 = history_db.list_history(limit=3, before_id=page2[-1]["id"])
+    assert [r["id"] for r in page3] == ids[:1]
+
+    qa_ids = [r["id"] for r in history_db.list_history(limit=10, task="qa")]
+    assert qa_ids == [i for i in ids[::-1] if history_db.load_history(i)["task"] == "qa"]
+    assert len(qa_ids) == 3
+
+
+def test_import_legacy_history(history_db, tmp_path):
+    (tmp_path / "20240101_120000_summarization.json").write_text(
+        json.dumps({"input": {"text": LONG_TEXT}, "output": "old summary"}), encoding="utf-8"
+    )
+    (tmp_path / "20240102_090000_qa.json").write_text(
+        json.dumps({"task": "qa", "timestamp": "20240102_090000", "input": {"q": "why"}, "output": "because"}),
+        encoding="utf-8",
+    )
+    (tmp_path / "broken.json").write_text("{not json", encoding="utf-8")
+
+    # 처음 DB를 열 때 자동으로 가져옴
+    rows = history_db.list_history()
+    assert [(r["task"], r["timestamp"]) for r in rows] == [
+        ("qa", "20240102_090000"),
+        ("summarization", "20240101_120000"),
+    ]
+    entry = history_db.load_history(rows[1]["id"])
+    assert entry["input"] == {"text": LONG_TEXT} and entry["output"] == "old summary"
+
+    # 같은 파일은 다시 가져오지 않음
+    assert history_db.import_legacy_history() == 0
+    assert _count(history_db, "runs") == 2
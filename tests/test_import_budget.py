@@ -0,0 +1,8 @@
+import import_budget
+
+
+def test_main_import_within_budget():
+    report = import_budget.check_budget(import_budget._DEFAULT_BUDGET_MS)
+    assert report["heavy_loaded"] == [], f"import 단계에서 읽힌 라이브러리: {report['heavy_loaded']}"
+    assert report["import_ms"] <= report["budget_ms"], report["slowest_self_ms"]
+    assert report["ok"]
@@ -0,0 +1,65 @@
+from loaders import LargeTextFile, decode_text, detect_encoding
+
+ASCII_LINE = "plain ascii lecture note line\n"
+KOREAN_LINE = "한국어 강의 노트 문장입니다.\n"
+
+
+def _read(path, chunk_bytes):
+    large = LargeTextFile(path)
+    return large, "".join(large.iter_chunks(chunk_bytes))
+
+
+def test_switches_to_cp949_after_ascii_head(tmp_path):
+    # 판별에 쓰는 앞부분(64KB)은 ASCII뿐이라 utf-8로 시작하지만, 뒤에 cp949 한국어가 나옴
+    text = ASCII_LINE * 3000 + KOREAN_LINE * 50
+    path = tmp_path / "notes.txt"
+    path.write_bytes(text.encode("cp949"))
+
+    large = LargeTextFile(path)
+    assert large.encoding == "utf-8"
+    assert "".join(large.iter_chunks(16 * 1024)) == text
+    assert large.encoding == "cp949"
+    assert large.replaced_chars == 0
+
+
+def test_counts_replaced_chars(tmp_path):
+    # utf-8 한국어 파일 중간의 읽을 수 없는 바이트 3개는 U+FFFD로 바꾸고 셈
+    data = (KOREAN_LINE * 200).encode("utf-8") + b"bad \xff byte \xfe and \xff\n" + (KOREAN_LINE * 200).encode("utf-8")
+    path = tmp_path / "broken.txt"
+    path.write_bytes(data)
+
+    large, text = _read(path, 4096)
+    assert large.encoding == "utf-8"
+    assert large.replaced_chars == 3
+    assert text.count("�") == 3
+    assert text.startswith(KOREAN_LINE) and text.endswith(KOREAN_LINE)
+
+
+def test_multibyte_char_split_across_blocks(tmp_path):
+    text = KOREAN_LINE * 100
+    path = tmp_path / "utf8.txt"
+    path.write_bytes(text.encode("utf-8"))
+
+    # 블록 크기가 3의 배수가 아니라 한글 글자가 블록 경계에서 잘림
+    large, read = _read(path, 1000)
+    assert read == text
+    assert large.replaced_chars == 0
+
+
+def test_crlf_newlines_normalized(tmp_path):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes((ASCII_LINE.replace("\n", "\r\n") * 500).encode("ascii"))
+    _large, text = _read(path, 1000)
+    assert text == ASCII_LINE * 500
+
+
+def test_decode_text_checks_whole_file():
+    data = (ASCII_LINE * 3000 + KOREAN_LINE).encode("cp949")
+    assert detect_encoding(data[:1024]) == "utf-8"
+    assert decode_text(data) == ASCII_LINE * 3000 + KOREAN_LINE
+
+
+def test_decode_text_mostly_broken_falls_back_to_latin1():
+    data = bytes(range(0x80, 0x100)) * 4
+    assert detect_encoding(data) == "latin-1"
+    assert decode_text(data) == data.decode("latin-1")